@@ -1,9 +1,9 @@
-import flet as ft
 import time
+_PROCESS_START = time.perf_counter()  # Referencia para time-to-first-paint
+import flet as ft
 import os
 import ctypes
 import sys
-<<<<<<< HEAD
 import threading
 import certifi 
 import io 
@@ -18,7 +18,6 @@ from ui.styles import SSA_BG, SSA_WHITE, SSA_GREY, SSA_GREEN, SSA_BORDER
 from ui.notification_center import NotificationCenter 
 from services.session_monitor import SessionMonitor
 from services.download_watcher import DownloadWatcherService 
-from services.timecard_service import TimecardService 
 from error_tracking import setup_global_exception_handler
 from services.cleanup_service import CleanupService
 from ui.emergency_handler import EmergencyHandler 
@@ -43,6 +42,9 @@ else:
 # 2. RUTA DE ASSETS
 assets_path = PathManager.get_assets_path()
 
+# pandas, selenium y azure-identity se importan al primer uso (ver startup_benchmark.py)
+print(f"⏱️ [Startup] Imports de módulo: {(time.perf_counter() - _PROCESS_START) * 1000:.0f}ms")
+
 def main(page: ft.Page):
     # --- 3. INICIALIZACIÓN DE CARPETAS LOCALES ---
     local_root = PathManager.get_local_data_dir()
@@ -57,28 +59,6 @@ def main(page: ft.Page):
 
     try:
         myappid = 'ssa.carol.dashboard.v2.prod' 
-=======
-import traceback
-from ui.dashboard_manager import DashboardManager
-from ui.styles import SSA_BG, SSA_WHITE, SSA_GREY, SSA_GREEN, SSA_BORDER
-from services.session_monitor import SessionMonitor
-
-# --- NUEVO: Manejo global de errores ---
-from error_tracking import setup_global_exception_handler, track_errors
-
-from runtime_paths import resource_path
-
-# --- PREPARACIÓN DE RUTAS ---
-assets_path = resource_path("assets")
-
-def main(page: ft.Page):
-    # --- NIVEL 3: Instalar Catch-All Global ---
-    setup_global_exception_handler()
-
-    # --- TRUCO WINDOWS (Icono en barra de tareas) ---
-    try:
-        myappid = 'ssa.carol.dashboard.v2.dev' 
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
     except Exception: pass
 
@@ -86,7 +66,6 @@ def main(page: ft.Page):
     page.theme_mode = ft.ThemeMode.LIGHT
     page.bgcolor = SSA_BG
     page.padding = 0 
-<<<<<<< HEAD
     page.window.width = 1200
     page.window.height = 850
     page.window_icon = "app_icon.ico" 
@@ -121,6 +100,7 @@ def main(page: ft.Page):
         )
 
         def on_report_downloaded(filepath, pc_number, location):
+            from services.timecard_service import TimecardService
             svc = TimecardService()
             if svc.upload_report(filepath, location, pc_number):
                 page.snack_bar = ft.SnackBar(ft.Text(f"✅ PC {pc_number}: Uploaded!"), bgcolor=SSA_GREEN)
@@ -231,40 +211,96 @@ def main(page: ft.Page):
         monitor = SessionMonitor(on_session_lost_callback=on_session_lost)
         app_state["monitor"] = monitor 
 
-        splash = ft.Container(content=ft.Column([ft.Image(src="Icono.png", width=80, height=80), ft.Text("C.A.R.O.L", size=40, weight="bold", color=SSA_GREY)], alignment=ft.MainAxisAlignment.CENTER, horizontal_alignment=ft.CrossAxisAlignment.CENTER), alignment=ft.alignment.center, expand=True, bgcolor=SSA_BG)
+        intro_logo = ft.Image(src="Icono.png", width=80, height=80, opacity=0, animate_opacity=1000)
+        intro_title = ft.Text("", size=30, weight=ft.FontWeight.BOLD, color=SSA_GREY, text_align=ft.TextAlign.CENTER, font_family="monospace", animate_opacity=500)
+        intro_subtitle = ft.Text("", size=20, weight=ft.FontWeight.W_500, color=SSA_GREEN, text_align=ft.TextAlign.CENTER)
+        splash = ft.Container(content=ft.Column([intro_logo, intro_title, intro_subtitle], alignment=ft.MainAxisAlignment.CENTER, horizontal_alignment=ft.CrossAxisAlignment.CENTER, spacing=20), alignment=ft.alignment.center, expand=True, bgcolor=SSA_BG, opacity=1, animate_opacity=800)
         
         page.add(ft.Stack([main_layout, splash], expand=True))
+        if not preserved_state:
+            print(f"⏱️ [Startup] Primer frame (time-to-first-paint): {(time.perf_counter() - _PROCESS_START) * 1000:.0f}ms")
 
-        time.sleep(0.5)
-        splash.visible = False
-        main_layout.visible = True
-        main_layout.opacity = 1
-        page.update()
-
-        monitor.start()
-
+        # La carga arranca ya, en paralelo con la animación (token, drive, Excels y primer escaneo)
         restored = False
         if preserved_state:
             restored = manager.restore_state_snapshot(preserved_state)
-        
+        manager.warm_up()
         if not restored:
             manager.start()
             manager.load_data(limit_dates=1)
 
+        def play_intro(ready):
+            """Animación de bienvenida; se corta en cuanto los datos están listos."""
+            intro_logo.opacity = 1; page.update()
+            if ready.wait(0.8): return
+            full_text = "Centralized Automation for Request Operations & Logic"; current_text = ""
+            for char in full_text:
+                current_text += char; intro_title.value = current_text + "|"; page.update()
+                if ready.wait(0.05): return
+            intro_title.value = current_text; page.update()
+            if ready.wait(0.2): return
+            sub_text = "By Global Business Services Mexico"; current_sub = ""
+            for char in sub_text:
+                current_sub += char; intro_subtitle.value = current_sub; page.update()
+                if ready.wait(0.06): return
+            if ready.wait(1.0): return
+            intro_title.opacity = 0; page.update()
+            if ready.wait(0.5): return
+            intro_title.value = "C.A.R.O.L"; intro_title.size = 40; intro_title.color = SSA_GREY; page.update()
+            intro_title.opacity = 1; page.update(); ready.wait(2.0)
+
+        if preserved_state:
+            # Reinicio en caliente: sin animación de bienvenida
+            time.sleep(0.5)
+        else:
+            # Si la coreografía termina antes que los datos, el dashboard muestra su propio progreso
+            play_intro(manager.data_ready)
+            splash.opacity = 0; page.update(); time.sleep(0.8)
+            print(f"⏱️ [Startup] Splash retirado a los {(time.perf_counter() - _PROCESS_START) * 1000:.0f}ms (datos {'listos' if manager.data_ready.is_set() else 'aún cargando'})")
+
+        splash.visible = False
+        main_layout.visible = True
+        main_layout.opacity = 1
+        page.update()
+
+        monitor.start()
+
     # --- REINICIO GLOBAL (SOFT REBOOT) ---
     def global_soft_reset():
         preserved_state = None
-        if app_state["manager"]:
-            try: preserved_state = app_state["manager"].get_state_snapshot()
-            except: pass
-            app_state["manager"].stop_polling()
-        
+        timings = {}
+        t0 = time.perf_counter()
+
+        # 1. Detener primero: el snapshot transfiere el store por referencia y nadie más debe mutarlo
+        if app_state["manager"]: app_state["manager"].stop_polling()
         if app_state["monitor"]: app_state["monitor"].stop()
         if app_state["watcher"]: app_state["watcher"].stop()
+        timings["stop"] = time.perf_counter()
+
+        if app_state["manager"]:
+            # Como al cerrar la ventana: se detiene el despacho y el historial pendiente se escribe
+            # antes de que la nueva instancia lo relea del disco
+            try:
+                app_state["manager"].notifier.stop()
+                app_state["manager"].notifier.flush_history()
+            except Exception as ex: print(f"⚠️ [SoftReset] No se pudo guardar el historial: {ex}")
+            try: preserved_state = app_state["manager"].get_state_snapshot()
+            except Exception as ex: print(f"⚠️ [SoftReset] No se pudo exportar estado: {ex}")
+        timings["snapshot"] = time.perf_counter()
 
         time.sleep(0.5)
         page.clean()
+        timings["teardown"] = time.perf_counter()
+
         build_app_ui(preserved_state=preserved_state)
+        timings["rebuild"] = time.perf_counter()
+
+        prev = t0
+        report = []
+        for phase, stamp in timings.items():
+            report.append(f"{phase}={(stamp - prev) * 1000:.1f}ms")
+            prev = stamp
+        print(f"⏱️ [SoftReset] {' '.join(report)} total={(prev - t0) * 1000:.1f}ms")
         
         try:
             msg = "System Reloaded (Instant Restore)" if preserved_state else "System Reloaded (Fresh Start)"
@@ -282,7 +318,10 @@ def main(page: ft.Page):
             page.window.visible = False
             page.update()
             
-            if app_state["manager"]: app_state["manager"].stop_polling()
+            if app_state["manager"]:
+                app_state["manager"].stop_polling()
+                app_state["manager"].notifier.stop()
+                app_state["manager"].notifier.flush_history()
             if app_state["monitor"]: app_state["monitor"].stop()
             if app_state["watcher"]: app_state["watcher"].stop()
 
@@ -293,212 +332,6 @@ def main(page: ft.Page):
     page.window.on_event = window_event
 
     build_app_ui()
-=======
-    page.window_width = 1200
-    page.window_height = 850
-    
-    # --- ICONO ---
-    icon_path_abs = os.path.join(assets_path, "app_icon.ico")
-    if os.path.exists(icon_path_abs): page.window_icon = icon_path_abs
-    else: page.window_icon = "Icono.png"
-
-    # =================================================================
-    #                       COMPONENTES HEADER
-    # =================================================================
-
-    user_name_small = ft.Text("", size=14, weight=ft.FontWeight.BOLD, color=SSA_GREY, font_family="monospace")
-
-    right_section = ft.Column(
-        [user_name_small], 
-        spacing=2, 
-        horizontal_alignment=ft.CrossAxisAlignment.END,
-        alignment=ft.MainAxisAlignment.CENTER
-    )
-
-    center_section = ft.Column([
-        ft.Text("C.A.R.O.L", size=28, weight=ft.FontWeight.BOLD, color=SSA_GREY),
-        ft.Text("Global Business Services", size=14, color=SSA_GREY)
-    ], spacing=2, horizontal_alignment=ft.CrossAxisAlignment.CENTER)
-
-    header = ft.Container(
-        padding=ft.padding.symmetric(horizontal=20, vertical=15),
-        bgcolor=SSA_WHITE,
-        border=ft.border.only(bottom=ft.BorderSide(1, SSA_BORDER)),
-        content=ft.Row(
-            [
-                ft.Image(src="logo.png", width=150, fit=ft.ImageFit.CONTAIN),
-                center_section,
-                right_section 
-            ],
-            alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
-            vertical_alignment=ft.CrossAxisAlignment.CENTER
-        )
-    )
-
-    # =================================================================
-    #                       ÁREA DE CONTENIDO
-    # =================================================================
-
-    welcome_large = ft.Text("", size=40, weight=ft.FontWeight.W_200, color=SSA_GREY, text_align=ft.TextAlign.CENTER)
-    loading_spinner = ft.ProgressRing(color=SSA_GREEN, width=50, height=50)
-    status_text = ft.Text("", color=SSA_GREY, text_align=ft.TextAlign.CENTER)
-    
-    loading_container = ft.Container(
-        content=ft.Column([
-            welcome_large,
-            ft.Container(height=20),
-            loading_spinner,
-            ft.Container(height=10), 
-            status_text
-        ], horizontal_alignment=ft.CrossAxisAlignment.CENTER, alignment=ft.MainAxisAlignment.CENTER), 
-        alignment=ft.alignment.center, 
-        expand=True, 
-        visible=False,
-        bgcolor=SSA_BG
-    )
-
-    tabs = ft.Tabs(
-        selected_index=0,
-        animation_duration=300,
-        expand=True,
-        indicator_color=SSA_GREEN,
-        label_color=SSA_GREEN,
-        unselected_label_color=ft.Colors.GREY_500,
-        divider_color=SSA_BORDER
-    )
-
-    # --- MANAGER ---
-    # Protegido por el catch global, pero su lógica interna usa @track_errors
-    manager = DashboardManager(page, tabs, loading_container, status_text, welcome_large, user_name_small)
-    
-    # Botones de Acción Global
-    calendar_button = manager.build_calendar_button()
-    close_cycle_button = manager.build_close_cycle_button() 
-    help_button = manager.build_help_button() # Nuevo Botón de Ayuda
-
-    content_area = ft.Stack(
-        [
-            tabs,
-            ft.Container(
-                content=ft.Row([close_cycle_button, calendar_button, help_button], spacing=10),
-                right=10, 
-                top=5
-            ),
-            loading_container
-        ],
-        expand=True
-    )
-
-    main_layout = ft.Column(
-        [header, content_area],
-        expand=True,
-        spacing=0,
-        visible=False,
-        opacity=0,
-        animate_opacity=1000
-    )
-
-    # =================================================================
-    #                 LÓGICA DE MONITOREO DE SESIÓN
-    # =================================================================
-
-    def handle_relogin(e, dialog_ref):
-        """Intenta reconectar y refrescar la aplicación."""
-        # Cerramos el diálogo modal
-        page.close(dialog_ref)
-        
-        # Mostramos cargando mientras se autentica
-        status_text.value = "Re-autenticando con Microsoft..."
-        loading_container.visible = True
-        page.update()
-
-        if monitor.force_relogin():
-            main_layout.disabled = False
-            page.update()
-            
-            # Reiniciamos carga de datos y notificamos éxito
-            manager.load_data(silent=True)
-            manager.notifier.send("Sesión Restaurada", "Se ha vuelto a conectar con éxito.", "success")
-        else:
-            # Si falla el relogin (ej. canceló el navegador), volvemos a mostrar la alerta
-            on_session_lost()
-
-    def on_session_lost():
-        """Se dispara cuando el monitor detecta que el token expiró."""
-        # Bloqueamos la UI principal para que el usuario no siga intentando acciones que fallarán
-        main_layout.disabled = True 
-        page.update()
-        
-        # Creamos y mostramos un diálogo MODAL (más efectivo que un banner)
-        relogin_dialog = ft.AlertDialog(
-            modal=True,
-            title=ft.Text("⚠️ Conexión Perdida"),
-            content=ft.Text(
-                "Tu sesión de Microsoft ha expirado o se ha perdido la conexión a internet.\n"
-                "Por favor, haz clic en 'Re-conectar' para autenticarte nuevamente y guardar tu trabajo."
-            ),
-            actions=[
-                ft.ElevatedButton(
-                    "Re-conectar", 
-                    on_click=lambda e: handle_relogin(e, relogin_dialog),
-                    bgcolor=SSA_GREEN,
-                    color=SSA_WHITE
-                ),
-            ],
-            actions_alignment=ft.MainAxisAlignment.END,
-        )
-        
-        page.open(relogin_dialog)
-        page.update()
-
-    # Inicializamos el Sentinel
-    monitor = SessionMonitor(on_session_lost_callback=on_session_lost)
-
-    # =================================================================
-    #                       SPLASH SCREEN
-    # =================================================================
-    
-    intro_logo = ft.Image(src="Icono.png", width=80, height=80, opacity=0, animate_opacity=1000)
-    intro_title = ft.Text("", size=30, weight=ft.FontWeight.BOLD, color=SSA_GREY, text_align=ft.TextAlign.CENTER, font_family="monospace", animate_opacity=500)
-    intro_subtitle = ft.Text("", size=20, weight=ft.FontWeight.W_500, color=SSA_GREEN, text_align=ft.TextAlign.CENTER)
-
-    splash_container = ft.Container(content=ft.Column([intro_logo, intro_title, intro_subtitle], alignment=ft.MainAxisAlignment.CENTER, horizontal_alignment=ft.CrossAxisAlignment.CENTER, spacing=20), alignment=ft.alignment.center, expand=True, bgcolor=SSA_BG, opacity=1, animate_opacity=800)
-    
-    page.add(ft.Stack([main_layout, splash_container], expand=True))
-
-    # Animación Intro
-    try:
-        # NIVEL 2: PROTECCIÓN DE CICLO DE VIDA (INIT)
-        intro_logo.opacity = 1; page.update(); time.sleep(0.8)
-        full_text = "Centralized Automation for Request Operations & Logic"; current_text = ""
-        for char in full_text: current_text += char; intro_title.value = current_text + "|"; page.update(); time.sleep(0.05) 
-        intro_title.value = current_text; page.update(); time.sleep(0.2)
-        sub_text = "By Global Business Services Mexico"; current_sub = ""
-        for char in sub_text: current_sub += char; intro_subtitle.value = current_sub; page.update(); time.sleep(0.06)
-        time.sleep(1.0); intro_title.opacity = 0; page.update(); time.sleep(0.5) 
-        intro_title.value = "C.A.R.O.L"; intro_title.size = 40; intro_title.color = SSA_GREY; page.update()
-        intro_title.opacity = 1; page.update(); time.sleep(2.0); splash_container.opacity = 0; page.update(); time.sleep(0.8)
-        splash_container.visible = False; main_layout.visible = True; page.update(); main_layout.opacity = 1; page.update()
-
-        # --- INICIO ---
-        manager.start()
-        monitor.start() # Iniciamos el vigilante de sesión
-        manager.load_data(limit_dates=1)
-        
-    except Exception as e:
-        # Captura errores fatales en la carga inicial
-        print(f"🔥 FATAL ERROR IN MAIN: {e}")
-        traceback.print_exc()
-        # Intentar reportar
-        try:
-            from services.error_logger_service import ErrorLoggerService
-            ErrorLoggerService().log_error(e, context_msg="Main Init Crash", user="System")
-        except: pass
-        
-        # UI de emergencia si es posible
-        page.clean()
-        page.add(ft.Text(f"CRITICAL ERROR:\n{str(e)}", color="red", size=20))
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
 
 if __name__ == "__main__":
     ft.app(target=main, assets_dir=assets_path)
\ No newline at end of file
@@ -1,17 +1,13 @@
 import os
 import sys
 import threading
-<<<<<<< HEAD
-=======
 import time
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from azure.identity import InteractiveBrowserCredential
 from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
 
-<<<<<<< HEAD
 # --- LÓGICA DE CARGA DE .ENV COMPATIBLE CON PYINSTALLER (EXE) ---
 if getattr(sys, 'frozen', False):
     application_path = sys._MEIPASS
@@ -21,21 +17,27 @@ else:
 load_dotenv(os.path.join(application_path, '.env'))
 # ----------------------------------------------------------------
 
+from services.path_manager import PathManager
+
+# Referencia para medir el tiempo de arranque hasta quedar autenticado
+_PROCESS_START = time.perf_counter()
+
 class MSGraphClient:
     """
     Cliente Graph con patrón Singleton y Thread-Safety.
     Gestiona la comunicación y rastrea el estado de la sesión de forma aislada por hilo.
-=======
-load_dotenv()
-
-class MSGraphClient:
-    """
-    Cliente Graph con patrón Singleton.
-    Gestiona la comunicación y rastrea el estado de la sesión (SOLID: SRP).
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
     """
     _instance = None
     _lock = threading.Lock()
+    # Límite de sub-peticiones por envelope de JSON batching
+    BATCH_MAX_REQUESTS = 20
+    # Renovación proactiva: el token se renueva en segundo plano REFRESH_AHEAD segundos antes de
+    # expirar (coincide con la ventana en la que MSAL canjea el refresh token)
+    REFRESH_AHEAD = 300
+    REFRESH_RETRY_SECONDS = 60
+    GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+    # Caché de tokens persistente (cifrado con DPAPI en Windows) compartida entre ejecuciones
+    TOKEN_CACHE_NAME = "carol_graph"
 
     def __new__(cls):
         with cls._lock:
@@ -51,39 +53,39 @@ class MSGraphClient:
         self.tenant_id = os.getenv('AZURE_TENANT_ID', 'common')
         self.scopes = ["User.Read", "Sites.Read.All", "Files.Read.All", "Sites.ReadWrite.All"]
         self.credential = None
-        self.access_token = None
-<<<<<<< HEAD
+        # (token, expires_on) se reemplaza en una sola asignación: las peticiones lo leen sin lock
+        self._token: tuple[str | None, int | None] = (None, None)
         
         # Estado Global
         self.is_session_valid = True
         self._token_lock = threading.Lock()
+        # Protege solo _refreshing/_last_refresh_attempt: nunca se retiene durante la red
+        self._refresh_lock = threading.Lock()
+        # Salud pasiva de la sesión: cualquier respuesta de Graph que no sea 401 prueba que
+        # la red y el token funcionan (SessionMonitor solo sondea tras un periodo de silencio)
+        self.last_success_at = 0.0
+        self._refreshing = False
+        self._last_refresh_attempt = 0.0
+        # Milisegundos desde el arranque del proceso hasta el primer token (None hasta entonces)
+        self.time_to_authenticated_ms = None
         
         # --- THREAD LOCAL STORAGE ---
         # Aquí guardamos variables que deben ser únicas para cada hilo (evita Race Conditions)
         self._thread_local = threading.local()
         
+        self._session = self._build_session()
+        # Callbacks notificados con la URL de cada 404 (invalidación de cachés de IDs)
+        self._not_found_listeners = []
         self._initialized = True
 
-    # --- PROPIEDADES THREAD-SAFE ---
-    @property
-    def last_error_code(self):
-        """Devuelve el código de error de la última petición ESTE hilo."""
-        return getattr(self._thread_local, 'last_error_code', 0)
+    def add_not_found_listener(self, callback):
+        if callback not in self._not_found_listeners: self._not_found_listeners.append(callback)
+
+    def _notify_not_found(self, url):
+        for callback in list(self._not_found_listeners):
+            try: callback(url)
+            except Exception as e: print(f"⚠️ Error en listener de 404: {e}")
 
-    @last_error_code.setter
-    def last_error_code(self, value):
-        self._thread_local.last_error_code = value
-=======
-        self._access_token_expires_on: int | None = None
-        
-        # --- NUEVOS ATRIBUTOS DE ESTADO ---
-        self.last_error_code = 0 
-        self.is_session_valid = True
-        
-        self._token_lock = threading.Lock()
-        self._session = self._build_session()
-        self._initialized = True
-    
     @property
     def session(self) -> requests.Session:
         """Shared HTTP session (connection pooling + retries)."""
@@ -107,64 +109,160 @@ class MSGraphClient:
         session.mount("http://", adapter)
         return session
 
+    @property
+    def access_token(self):
+        return self._token[0]
+
+    @access_token.setter
+    def access_token(self, value):
+        self._token = (value, self._token[1] if value else None)
+
     def _token_is_fresh(self, *, skew_seconds: int = 120) -> bool:
-        if not self.access_token:
+        token, expires_on = self._token
+        if not token:
             return False
-        if self._access_token_expires_on is None:
-            # If we don't know expiry, assume it's usable unless we saw 401.
-            return self.last_error_code != 401
-        return time.time() < (self._access_token_expires_on - skew_seconds)
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
+        if expires_on is None:
+            # Sin expiración conocida, el token es usable mientras la sesión no se haya marcado inválida.
+            return self.is_session_valid
+        return time.time() < (expires_on - skew_seconds)
 
-    def _get_token(self):
+    # --- PROPIEDADES THREAD-SAFE ---
+    @property
+    def last_error_code(self):
+        """Devuelve el código de error de la última petición ESTE hilo."""
+        return getattr(self._thread_local, 'last_error_code', 0)
+
+    @last_error_code.setter
+    def last_error_code(self, value):
+        self._thread_local.last_error_code = value
+
+    def token_expires_in(self):
+        """Segundos hasta que expire el token actual (None si no se conoce)."""
+        token, expires_on = self._token
+        if not token or expires_on is None: return None
+        return expires_on - time.time()
+
+    def refresh_token_ahead(self):
+        """
+        Si el token está por expirar, lo renueva en segundo plano. No toca _token_lock (la renovación
+        lo retiene durante la llamada de red): el llamador sigue con el token vigente sin esperar.
+        """
+        remaining = self.token_expires_in()
+        if remaining is None or remaining > self.REFRESH_AHEAD or not self.credential: return
+        with self._refresh_lock:
+            if self._refreshing or time.time() - self._last_refresh_attempt < self.REFRESH_RETRY_SECONDS: return
+            self._refreshing = True
+            self._last_refresh_attempt = time.time()
+        threading.Thread(target=self._background_refresh, daemon=True, name="TokenRefresh").start()
+
+    def _background_refresh(self):
+        t0 = time.perf_counter()
+        try:
+            self._get_token(force=True, interactive=False)
+            print(f"🔄 Token renovado en segundo plano ({(time.perf_counter() - t0) * 1000:.0f}ms, expira en {self.token_expires_in() or 0:.0f}s)")
+        except Exception as e:
+            print(f"⚠️ No se pudo renovar el token en segundo plano: {e}")
+        finally:
+            with self._refresh_lock: self._refreshing = False
+
+    # --- AUTENTICACIÓN ---
+    def _load_auth_record(self):
+        path = PathManager.get_auth_record_path()
+        try:
+            if os.path.exists(path):
+                from azure.identity import AuthenticationRecord
+                with open(path, 'r', encoding='utf-8') as f: return AuthenticationRecord.deserialize(f.read())
+        except Exception as e:
+            print(f"⚠️ Registro de autenticación ilegible, se pedirá login: {e}")
+        return None
+
+    def _save_auth_record(self, record):
+        path = PathManager.get_auth_record_path()
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f: f.write(record.serialize())
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el registro de autenticación: {e}")
+
+    def _build_credential(self):
+        """
+        Credencial con caché de tokens persistente + AuthenticationRecord de la última cuenta:
+        get_token() reutiliza el refresh token en silencio. disable_automatic_authentication hace
+        que, si se necesita interacción, se lance AuthenticationRequiredError en vez de abrir el
+        navegador desde cualquier hilo; el login interactivo lo decide _get_token.
+        azure-identity (y MSAL) se importan aquí y no al cargar el módulo: pesan en el arranque.
+        """
+        from azure.identity import InteractiveBrowserCredential, TokenCachePersistenceOptions
+        options = dict(client_id=self.client_id, tenant_id=self.tenant_id, disable_automatic_authentication=True)
+        record = self._load_auth_record()
+        if record: options["authentication_record"] = record
+        try:
+            return InteractiveBrowserCredential(cache_persistence_options=TokenCachePersistenceOptions(name=self.TOKEN_CACHE_NAME), **options)
+        except Exception as e:
+            # Sin almacenamiento cifrado disponible: caché solo en memoria (login en cada arranque)
+            print(f"⚠️ Caché de tokens persistente no disponible: {e}")
+            return InteractiveBrowserCredential(**options)
+
+    def _get_token(self, force=False, interactive=True, prompt=False):
+        """
+        Token de Graph. Por defecto silencioso (caché persistente) con login interactivo como respaldo.
+        prompt=True salta la caché y abre el navegador: es el camino de 'Reconnect', donde el token
+        cacheado (aún sin expirar) es justo el que Graph acaba de rechazar con 401.
+        """
+        if not force and not prompt and self._token_is_fresh():
+            return self.access_token
+        from azure.identity import AuthenticationRequiredError
         try:
             with self._token_lock:
-<<<<<<< HEAD
-                # Verificamos si el token actual sigue siendo válido (aprox)
-                # Nota: last_error_code aquí es engañoso si usamos thread local, 
-                # pero para 401 global usaremos una bandera simple si es necesario.
-                # Por ahora, confiamos en la regeneración si es null.
-                if self.access_token and self.is_session_valid:
-=======
-                if self._token_is_fresh(): 
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
+                if not force and not prompt and self._token_is_fresh():
                     return self.access_token
 
+                t0 = time.perf_counter()
                 if not self.credential:
+                    self.credential = self._build_credential()
+
+                token_data, mode = None, "silencioso"
+                if not prompt:
+                    try: token_data = self.credential.get_token(self.GRAPH_SCOPE)
+                    except AuthenticationRequiredError:
+                        if not interactive: raise
+                if token_data is None:
                     print("🔄 Preparando inicio de sesión interactivo...")
-                    self.credential = InteractiveBrowserCredential(
-                        client_id=self.client_id, tenant_id=self.tenant_id
-                    )
-                
-                token_data = self.credential.get_token("https://graph.microsoft.com/.default")
-                self.access_token = token_data.token
-<<<<<<< HEAD
+                    self._save_auth_record(self.credential.authenticate(scopes=[self.GRAPH_SCOPE]))
+                    token_data = self.credential.get_token(self.GRAPH_SCOPE)
+                    mode = "interactivo"
+
+                # azure-identity expone expires_on (epoch en segundos).
+                self._token = (token_data.token, getattr(token_data, "expires_on", None))
                 self.is_session_valid = True
+
+                if self.time_to_authenticated_ms is None:
+                    self.time_to_authenticated_ms = (time.perf_counter() - _PROCESS_START) * 1000
+                    print(f"⏱️ [Auth] Autenticado ({mode}) en {(time.perf_counter() - t0) * 1000:.0f}ms; "
+                          f"{self.time_to_authenticated_ms:.0f}ms desde el arranque")
+                elif mode == "interactivo":
+                    print(f"⏱️ [Auth] Login interactivo completado en {(time.perf_counter() - t0) * 1000:.0f}ms")
                 
                 # Reiniciamos error en el hilo actual por limpieza
                 self.last_error_code = 0
-=======
-                # azure-identity exposes expires_on (epoch seconds).
-                self._access_token_expires_on = getattr(token_data, "expires_on", None)
-                self.last_error_code = 0
-                self.is_session_valid = True
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                 return self.access_token
         except Exception as e:
-            self.is_session_valid = False
+            # Una renovación anticipada fallida no invalida un token que aún sirve
+            if not (force and self._token_is_fresh()): self.is_session_valid = False
             raise Exception(f"Error obteniendo token: {str(e)}")
 
     def _make_request(self, method, endpoint, json_data=None, return_raw=False, extra_headers=None):
-<<<<<<< HEAD
-        if not self.access_token: 
-=======
         if not self._token_is_fresh(): 
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             try: self._get_token()
             except: return None
+        else:
+            self.refresh_token_ahead()
 
+        token = self.access_token
+        if not token: return None
         headers = {
-            'Authorization': f'Bearer {self.access_token}',
+            'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
         }
         if extra_headers: headers.update(extra_headers)
@@ -172,28 +270,16 @@ class MSGraphClient:
         url = endpoint if endpoint.startswith("http") else f"https://graph.microsoft.com/v1.0{endpoint}"
         
         try:           
-<<<<<<< HEAD
-            if method == 'GET': response = requests.get(url, headers=headers, timeout=30)
-            elif method == 'PATCH': response = requests.patch(url, headers=headers, json=json_data, timeout=30)
-            elif method == 'POST': response = requests.post(url, headers=headers, json=json_data, timeout=30)
-            elif method == 'DELETE': response = requests.delete(url, headers=headers, timeout=30)
+            if method == 'GET': response = self._session.get(url, headers=headers, timeout=30)
+            elif method == 'PATCH': response = self._session.patch(url, headers=headers, json=json_data, timeout=30)
+            elif method == 'POST': response = self._session.post(url, headers=headers, json=json_data, timeout=30)
+            elif method == 'DELETE': response = self._session.delete(url, headers=headers, timeout=30)
             else: return None
             
             # --- GUARDADO SEGURO DEL CÓDIGO DE ESTADO ---
             # Esto ahora se guarda en self._thread_local.last_error_code
-=======
-            if method == 'GET':
-                response = self._session.get(url, headers=headers, timeout=30)
-            elif method == 'PATCH':
-                response = self._session.patch(url, headers=headers, json=json_data, timeout=30)
-            elif method == 'POST':
-                response = self._session.post(url, headers=headers, json=json_data, timeout=30)
-            elif method == 'DELETE':
-                response = self._session.delete(url, headers=headers, timeout=30)
-            else: return None
-            
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             self.last_error_code = response.status_code
+            if response.status_code != 401: self.last_success_at = time.time()
 
             if response.status_code in [200, 201, 204]:
                 return response if return_raw else (response.json() if response.content else {"success": True})
@@ -201,17 +287,12 @@ class MSGraphClient:
             elif response.status_code == 401:
                 print("⚠️ Token expirado detectado en request.")
                 self.is_session_valid = False
-<<<<<<< HEAD
                 # Intentar forzar refresh para la próxima
-                self.access_token = None 
-=======
-                # Force refresh next time.
-                self.access_token = None
-                self._access_token_expires_on = None
+                self._token = (None, None)
                 return None
-            else:
-                print(f"❌ ERROR GRAPH API {response.status_code}: {response.text}") # <--- Necesitamos ver esto
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
+            elif response.status_code == 404:
+                self._notify_not_found(url)
+                print(f"❌ ERROR GRAPH API 404: {response.text}")
                 return None
             else:
                 # Imprimimos el error para debug, pero NO para 412 (Precondition Failed)
@@ -231,11 +312,81 @@ class MSGraphClient:
     def patch(self, endpoint, json_data, extra_headers=None): return self._make_request('PATCH', endpoint, json_data, extra_headers=extra_headers)
     def post(self, endpoint, json_data, extra_headers=None): return self._make_request('POST', endpoint, json_data, extra_headers=extra_headers)
     def delete(self, endpoint, extra_headers=None): return self._make_request('DELETE', endpoint, extra_headers=extra_headers)
-<<<<<<< HEAD
-=======
     def get_raw(self, endpoint, extra_headers=None): return self._make_request('GET', endpoint, return_raw=True, extra_headers=extra_headers)
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
     
     def get_content(self, endpoint):
         response = self._make_request('GET', endpoint, return_raw=True)
-        return response.content if response and response.status_code == 200 else None
\ No newline at end of file
+        return response.content if response and response.status_code == 200 else None
+    def send_batch(self, sub_requests, max_workers=1):
+        """
+        Envía sub-peticiones con JSON batching (POST /$batch, máx. 20 por envelope).
+        Cada sub-petición es {"method", "url", "body"?, "headers"?, "depends_on"?}; depends_on es el
+        índice (o lista de índices) de sub-peticiones ANTERIORES de la misma lista: se traduce a
+        dependsOn y la cadena viaja siempre en el mismo envelope (si la previa falla, Graph responde 424).
+        Retorna una lista alineada con la entrada: la sub-respuesta ({"status", "headers", "body"})
+        o None si no hubo respuesta. Los 404 se notifican a los listeners igual que en _make_request.
+        Con max_workers > 1 los envelopes se envían en paralelo.
+        """
+        results = [None] * len(sub_requests)
+        envelopes = self._batch_envelopes(sub_requests)
+
+        def send_envelope(indices):
+            local_id = {global_idx: str(pos) for pos, global_idx in enumerate(indices)}
+            payload = {"requests": []}
+            for global_idx in indices:
+                sub = sub_requests[global_idx]
+                entry = {"id": local_id[global_idx], "method": sub['method'], "url": sub['url']}
+                if sub.get('body') is not None:
+                    entry["body"] = sub['body']
+                    entry["headers"] = {"Content-Type": "application/json", **sub.get('headers', {})}
+                elif sub.get('headers'):
+                    entry["headers"] = sub['headers']
+                deps = self._batch_deps(sub)
+                if deps: entry["dependsOn"] = [local_id[d] for d in deps]
+                payload["requests"].append(entry)
+
+            response = self.post("/$batch", payload)
+            if not response or 'responses' not in response: return
+            for sub_resp in response['responses']:
+                try: pos = int(sub_resp.get('id'))
+                except (TypeError, ValueError): continue
+                if not 0 <= pos < len(indices): continue
+                results[indices[pos]] = sub_resp
+                if sub_resp.get('status') == 404: self._notify_not_found(sub_requests[indices[pos]]['url'])
+
+        if max_workers > 1 and len(envelopes) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(envelopes))) as pool:
+                list(pool.map(send_envelope, envelopes))
+        else:
+            for indices in envelopes: send_envelope(indices)
+        return results
+
+    @staticmethod
+    def _batch_deps(sub):
+        deps = sub.get('depends_on')
+        if deps is None: return []
+        return list(deps) if isinstance(deps, (list, tuple)) else [deps]
+
+    def _batch_envelopes(self, sub_requests):
+        """Reparte los índices en envelopes de BATCH_MAX_REQUESTS sin separar una cadena depends_on."""
+        group_of, groups = {}, {}
+        for idx, sub in enumerate(sub_requests):
+            deps = self._batch_deps(sub)
+            if any(not 0 <= d < idx for d in deps):
+                raise ValueError(f"depends_on de la sub-petición {idx} debe apuntar a una anterior")
+            root = group_of[deps[0]] if deps else idx
+            if any(group_of[d] != root for d in deps):
+                raise ValueError(f"La sub-petición {idx} depende de cadenas distintas")
+            group_of[idx] = root
+            groups.setdefault(root, []).append(idx)
+
+        envelopes, current = [], []
+        for members in groups.values():
+            if len(members) > self.BATCH_MAX_REQUESTS:
+                raise ValueError(f"Cadena depends_on de {len(members)} sub-peticiones (máx. {self.BATCH_MAX_REQUESTS})")
+            if len(current) + len(members) > self.BATCH_MAX_REQUESTS:
+                envelopes.append(current)
+                current = []
+            current.extend(members)
+        if current: envelopes.append(current)
+        return envelopes
@@ -1,9 +1,12 @@
 import flet as ft
 import threading
+import queue
+import time
 import os
 import sys
 import json
 import uuid
+from collections import deque
 from datetime import datetime
 from plyer import notification
 from services.path_manager import PathManager
@@ -14,16 +17,44 @@ class NotificationManager:
     1. Notificaciones Nativas (Toast OS).
     2. SnackBar (Visual App).
     3. Historial Persistente (JSON) - CON FILTRO DE RELEVANCIA.
+
+    El historial se guarda en segundo plano (debounce de SAVE_DELAY, escritura atómica con
+    rename); el contador de no leídas se mantiene incrementalmente y el panel recibe solo
+    el cambio puntual (insertar / actualizar / quitar) en lugar de reconstruirse.
+
+    Pipeline: send() solo encola; un único hilo despacha. El primer evento de cada título
+    sale al instante; los que llegan dentro de COALESCE_WINDOW se agrupan en un resumen
+    ("12 new emails across 5 requests"). Los toasts nativos se limitan a NATIVE_MAX_PER_MINUTE.
     """
     # Usamos ruta dinámica por usuario para evitar conflictos en red
     MAX_HISTORY = 50 
+    SAVE_DELAY = 1.0
+    COALESCE_WINDOW = 2.0
+    NATIVE_MAX_PER_MINUTE = 6
+    _STOP = object()  # centinela de la cola de eventos
+
+    # Resúmenes por título: count = eventos (o unidades), items = elementos distintos afectados
+    SUMMARY_TEMPLATES = {
+        "New Email": "{count} new emails across {items} requests",
+        "New Item": "{count} new requests: {sample}",
+    }
 
     def __init__(self, page: ft.Page):
         self.page = page
         self.notification_center = None 
         # Cargar ruta desde PathManager
         self.HISTORY_FILE = PathManager.get_notifications_history_path()
+        self._history_lock = threading.RLock()
+        # Serializa tmp + rename: el Timer y un flush explícito pueden coincidir
+        self._write_lock = threading.Lock()
+        self._save_timer = None
+        self._stopped = False
         self.history = self._load_history()
+        self.unread_count = sum(1 for n in self.history if not n.get('read', False))
+
+        self._events = queue.Queue()
+        self._native_sent = deque()  # timestamps de toasts nativos del último minuto
+        threading.Thread(target=self._dispatch_loop, daemon=True, name="Notifier").start()
 
     def set_visual_center(self, center_instance):
         """Conecta con el componente visual para actualizar el badge."""
@@ -39,29 +70,109 @@ class NotificationManager:
         return []
 
     def _save_history(self):
-        try:
-            if len(self.history) > self.MAX_HISTORY:
-                self.history = self.history[:self.MAX_HISTORY]
-            
-            # Asegurar directorio antes de guardar
-            os.makedirs(os.path.dirname(self.HISTORY_FILE), exist_ok=True)
-            
-            with open(self.HISTORY_FILE, 'w') as f:
-                json.dump(self.history, f)
-            
-            self._update_badge()
-        except Exception as e:
-            print(f"Error guardando historial notificaciones: {e}")
+        """Programa el guardado: varias mutaciones seguidas producen una sola escritura."""
+        with self._history_lock:
+            if self._save_timer or self._stopped: return
+            self._save_timer = threading.Timer(self.SAVE_DELAY, self.flush_history)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush_history(self):
+        """Escribe el historial ya (tmp + rename: un cierre a mitad de escritura no lo corrompe)."""
+        with self._write_lock:
+            # El snapshot se toma dentro del lock de escritura: nunca gana una copia más vieja
+            with self._history_lock:
+                if self._save_timer: self._save_timer.cancel()
+                self._save_timer = None
+                snapshot = list(self.history)
+            try:
+                # Asegurar directorio antes de guardar
+                os.makedirs(os.path.dirname(self.HISTORY_FILE), exist_ok=True)
+                tmp_path = f"{self.HISTORY_FILE}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp_path, self.HISTORY_FILE)
+            except Exception as e:
+                print(f"Error guardando historial notificaciones: {e}")
+
+    def stop(self):
+        """
+        Detiene el hilo de despacho (soft reset / cierre). Las ráfagas aún agrupadas se descartan:
+        entregarlas después escribiría en el historial de una instancia ya reemplazada.
+        Llamar antes de flush_history().
+        """
+        with self._history_lock:
+            self._stopped = True
+            if self._save_timer: self._save_timer.cancel()
+            self._save_timer = None
+        self._events.put(self._STOP)
 
     def _update_badge(self):
         if self.notification_center:
-            unread = sum(1 for n in self.history if not n.get('read', False))
-            self.notification_center.update_badge(unread)
-            self.notification_center.refresh_list()
+            self.notification_center.update_badge(self.unread_count)
 
-    def send(self, title, message, type="info"):
+    def send(self, title, message, type="info", *, item=None, count=1):
         """
-        Envía notificación y decide inteligentemente si guardarla en el historial.
+        Encola una notificación (no bloquea). 'item' identifica el elemento afectado
+        (p. ej. la solicitud) y 'count' cuántas unidades representa, para los resúmenes.
+        """
+        if self._stopped: return
+        self._events.put({"title": title, "message": message, "type": type, "item": item, "count": max(1, int(count or 1))})
+
+    # --- DESPACHO (hilo único) ---
+    def _dispatch_loop(self):
+        pending = {}        # (título, tipo) -> ráfaga agregada
+        last_delivery = {}  # (título, tipo) -> último envío
+        while True:
+            now = time.time()
+            next_due = min((agg["due"] for agg in pending.values()), default=None)
+            try:
+                ev = self._events.get(timeout=None if next_due is None else max(0.05, next_due - now))
+            except queue.Empty:
+                ev = None
+            if ev is self._STOP:
+                dropped = sum(len(agg["events"]) for agg in pending.values())
+                if dropped: print(f"🧹 [Notifier] Detenido; {dropped} notificación(es) agrupadas descartadas.")
+                return
+
+            now = time.time()
+            if ev:
+                key = (ev["title"], ev["type"])
+                if key not in pending and now - last_delivery.get(key, 0) >= self.COALESCE_WINDOW:
+                    last_delivery[key] = now
+                    self._safe_deliver(ev["title"], ev["message"], ev["type"])
+                else:
+                    agg = pending.setdefault(key, {"events": [], "due": max(now, last_delivery.get(key, 0) + self.COALESCE_WINDOW)})
+                    agg["events"].append(ev)
+
+            for key in [k for k, agg in pending.items() if agg["due"] <= now]:
+                events = pending.pop(key)["events"]
+                last_delivery[key] = now
+                title, type = key
+                message = events[0]["message"] if len(events) == 1 else self._summarize(title, events)
+                self._safe_deliver(title, message, type)
+
+    def _summarize(self, title, events):
+        count = sum(ev["count"] for ev in events)
+        items = list(dict.fromkeys(ev["item"] or ev["message"] for ev in events))
+        sample = ", ".join(str(i) for i in items[:3]) + ("..." if len(items) > 3 else "")
+        template = self.SUMMARY_TEMPLATES.get(title, "{count} updates. Latest: {last}")
+        return template.format(count=count, items=len(items), sample=sample, last=events[-1]["message"])
+
+    def _safe_deliver(self, title, message, type):
+        try: self._deliver(title, message, type)
+        except Exception as e: print(f"⚠️ Error despachando notificación: {e}")
+
+    def _native_allowed(self):
+        now = time.time()
+        while self._native_sent and now - self._native_sent[0] > 60: self._native_sent.popleft()
+        if len(self._native_sent) >= self.NATIVE_MAX_PER_MINUTE: return False
+        self._native_sent.append(now)
+        return True
+
+    def _deliver(self, title, message, type="info"):
+        """
+        Muestra la notificación (o el resumen de una ráfaga) y decide si guardarla en el historial.
         """
         # --- FILTRO DE RELEVANCIA (LÓGICA NUEVA) ---
         # Solo guardamos en el historial lo que aporta valor a largo plazo (Novedades).
@@ -91,8 +202,17 @@ class NotificationManager:
                 "type": type,
                 "read": False
             }
-            self.history.insert(0, new_notif)
+            with self._history_lock:
+                self.history.insert(0, new_notif)
+                self.unread_count += 1
+                dropped = self.history[self.MAX_HISTORY:]
+                del self.history[self.MAX_HISTORY:]
+                self.unread_count -= sum(1 for n in dropped if not n.get('read', False))
             self._save_history()
+            self._update_badge()
+            if self.notification_center:
+                self.notification_center.insert_item(new_notif)
+                for n in dropped: self.notification_center.remove_item(n['id'])
 
         # --- FEEDBACK VISUAL (Siempre se ejecuta) ---
         # El usuario aún ve el popup momentáneo para saber que algo pasa, 
@@ -111,28 +231,50 @@ class NotificationManager:
             icon = ft.Icons.WARNING_AMBER_ROUNDED
             color = ft.Colors.ORANGE
 
-        threading.Thread(target=self._send_native, args=(title, message), daemon=True).start()
+        if self._native_allowed(): self._send_native(title, message)
         self._show_in_app_snackbar(title, message, icon, color)
 
     def mark_all_read(self):
-        for n in self.history:
-            n['read'] = True
+        with self._history_lock:
+            for n in self.history:
+                n['read'] = True
+            self.unread_count = 0
         self._save_history()
+        self._update_badge()
+        if self.notification_center: self.notification_center.refresh_list()
 
     def mark_as_read(self, notif_id):
-        for n in self.history:
-            if n['id'] == notif_id:
-                n['read'] = True
-                break
+        changed = None
+        with self._history_lock:
+            for n in self.history:
+                if n['id'] == notif_id:
+                    if not n.get('read', False):
+                        n['read'] = True
+                        self.unread_count -= 1
+                        changed = n
+                    break
+        if not changed: return
         self._save_history()
+        self._update_badge()
+        if self.notification_center: self.notification_center.update_item(changed)
 
     def delete_notification(self, notif_id):
-        self.history = [n for n in self.history if n['id'] != notif_id]
+        with self._history_lock:
+            removed = [n for n in self.history if n['id'] == notif_id]
+            if not removed: return
+            self.history = [n for n in self.history if n['id'] != notif_id]
+            self.unread_count -= sum(1 for n in removed if not n.get('read', False))
         self._save_history()
+        self._update_badge()
+        if self.notification_center: self.notification_center.remove_item(notif_id)
 
     def clear_all_history(self):
-        self.history = []
+        with self._history_lock:
+            self.history = []
+            self.unread_count = 0
         self._save_history()
+        self._update_badge()
+        if self.notification_center: self.notification_center.refresh_list()
 
     def _send_native(self, title, message):
         try:
@@ -1,8 +1,9 @@
 import os
 import time
-import pandas as pd
+import threading
 import warnings
 from services.adp_session import ADPSession
+from services.fs_watcher import DirectoryWatcher
 
 class ADPService:
     """
@@ -75,9 +76,12 @@ class ADPService:
         try:
             print(f"🚀 (Bot) Iniciando revisión para PC {pc_number}...")
             
+            t_download = time.perf_counter()
             downloaded = self._wait_for_download("Pay Processing", timeout=180)
+            download_s = time.perf_counter() - t_download
             
             if not downloaded: 
+                print(f"⏱️ (Bot) PC {pc_number}: sin descarga tras {download_s:.1f}s")
                 return False, "Timeout esperando descarga de Excel.", [], [], [], [], None
 
             print(f"📊 (Bot) Procesando archivo: {os.path.basename(downloaded)}")
@@ -86,6 +90,7 @@ class ADPService:
             detected_manager = None
             read_success = False
 
+            t_analysis = time.perf_counter()
             for _ in range(3):
                 if not os.path.exists(downloaded):
                     time.sleep(1)
@@ -97,6 +102,8 @@ class ADPService:
                     criticals = [f"Error Excel: {e}"]
                     time.sleep(1)
 
+            print(f"⏱️ (Bot) PC {pc_number}: descarga {download_s:.1f}s, análisis {time.perf_counter() - t_analysis:.1f}s")
+
             try: os.remove(downloaded)
             except: pass
 
@@ -114,26 +121,45 @@ class ADPService:
             return False, f"Excepción en Bot: {str(e)}", [], [], [], [], None
 
     def _wait_for_download(self, partial_name, timeout=180):
-        end_time = time.time() + timeout
-        while time.time() < end_time:
-            try:
-                files = os.listdir(self.download_dir)
-                candidates = [f for f in files if partial_name in f and not f.endswith('.crdownload') and not f.endswith('.tmp')]
-                if candidates:
-                    candidates.sort(key=lambda x: os.path.getmtime(os.path.join(self.download_dir, x)), reverse=True)
-                    full_path = os.path.join(self.download_dir, candidates[0])
-                    if (time.time() - os.path.getmtime(full_path)) < timeout and os.path.getsize(full_path) > 0:
-                        time.sleep(1.0)
-                        return full_path
-            except Exception: pass
-            time.sleep(1)
-        return None
+        """
+        Ruta del Excel descargado cuyo nombre contiene 'partial_name' (None si vence el timeout).
+        Usa el DirectoryWatcher compartido de la carpeta de descargas: el archivo se entrega en
+        cuanto Chrome lo renombra de .crdownload a su nombre final. Como antes, también sirve una
+        descarga de los últimos 'timeout' segundos que ya esté en la carpeta.
+        """
+        t0 = time.perf_counter()
+        found = []
+        ready = threading.Event()
+
+        def on_file(path):
+            if partial_name in os.path.basename(path) and not ready.is_set():
+                found.append(path)
+                ready.set()
+
+        # Suscribirse antes de revisar la carpeta: así no se pierde una descarga que termine en medio
+        watcher = DirectoryWatcher.get(self.download_dir)
+        watcher.subscribe(on_file)
+        try:
+            recent = [p for p, _ in sorted(watcher.scan(since=time.time() - timeout), key=lambda x: x[1], reverse=True)
+                      if partial_name in os.path.basename(p)]
+            if recent:
+                source, path = "ya existente", recent[0]
+            elif ready.wait(timeout):
+                source, path = watcher.mode, found[0]
+            else:
+                print(f"⏱️ (Bot) Sin descarga de '{partial_name}' tras {timeout}s ({watcher.mode})")
+                return None
+        finally:
+            watcher.unsubscribe(on_file)
+        print(f"⏱️ (Bot) Descarga '{os.path.basename(path)}' lista en {(time.perf_counter() - t0) * 1000:.0f}ms ({source})")
+        return path
 
     def _analyze_excel_logic(self, file_path):
         """
         Retorna: (success, criticals, warnings_dicts, compliance_dicts, all_employees_list, detected_manager_string)
         """
         try:
+            import pandas as pd  # Import diferido: solo se necesita al analizar el reporte
             with warnings.catch_warnings():
                 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
                 preview_df = pd.read_excel(file_path, header=None, nrows=10)
@@ -1,10 +1,6 @@
 import threading
 import time
 import os
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from services.cleanup_service import CleanupService  # Importamos el servicio
 import logging
 from services.path_manager import PathManager # Importamos el gestor de rutas
@@ -61,6 +57,11 @@ class ADPSession:
     def _launch_browser(self):
         """Lanza un nuevo proceso de Chrome con memoria persistente."""
         print("🔧 (Master) Inicializando nuevo navegador Chrome con Persistencia...")
+        # Selenium y webdriver-manager se importan solo cuando el bot realmente arranca
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+        from webdriver_manager.chrome import ChromeDriverManager
         
         if not os.path.exists(self.user_data_dir):
             try: os.makedirs(self.user_data_dir)
@@ -1,150 +1,125 @@
 import os
 import time
 import threading
-from datetime import datetime
+from services.fs_watcher import DirectoryWatcher
 
 class DownloadWatcherService:
     """
     Servicio que monitorea la carpeta de descargas del usuario buscando
     reportes específicos (PDFs) generados por ADP.
+
+    - Varios reportes esperados a la vez, indexados por número de PC.
+    - Reacciona a los eventos de DirectoryWatcher (rename/close-write, o sondeo si no hay watchdog):
+      el archivo se entrega en cuanto la descarga termina.
+    - Un PDF cuyo nombre contiene el PC va a ese PC; uno genérico (Punch Detail / Report)
+      se asigna a la espera más antigua.
     """
     def __init__(self, processing_callback=None):
         self.download_dir = os.path.join(os.path.expanduser("~"), "Downloads")
-        self._watching = False
-        self._target_pc = None
-        self._target_loc = None
-        # Guardamos el callback global por si se necesita, aunque TimecardView usará el suyo propio
-        self._callback = processing_callback 
-        self._monitor_thread = None
+        # Callback global (filepath, pc_number, location) para esperas sin callback propio
+        self._callback = processing_callback
+        self._expected = {}  # pc_key -> {"pc", "location", "callback", "armed_at", "armed_perf"}
+        self._claimed = set()  # archivos ya entregados (el escaneo inicial y un evento pueden coincidir)
+        # También cubre subscribe/unsubscribe: la decisión y la llamada son atómicas.
+        # Orden de locks: self._lock -> DirectoryWatcher._lock (el watcher llama a los
+        # suscriptores sin retener el suyo).
+        self._lock = threading.Lock()
+        self._fs = DirectoryWatcher.get(self.download_dir)
 
     def start(self):
         """
-        Método de compatibilidad para main.py. 
+        Método de compatibilidad para main.py.
         En la nueva arquitectura, el watcher se inicia realmente cuando la UI solicita 'expect_report'.
         """
         print("⚠️ [DownloadWatcher] Servicio inicializado en modo espera. Aguardando tarea de Timecard...")
 
+    @staticmethod
+    def _pc_key(pc_number):
+        return str(pc_number).replace("-", "").strip().lower()
+
     def expect_report(self, pc_number, location, on_found_callback=None):
         """
         Configura el watcher para esperar un reporte específico.
-        
+
         Args:
             pc_number (str): Número de PC a buscar.
             location (str): Ubicación (contexto).
-            on_found_callback (callable): Función a ejecutar al encontrar el archivo.
+            on_found_callback (callable): Función a ejecutar al encontrar el archivo (recibe la ruta).
         """
-        print(f"👀 Watcher ARMADO para PC: {pc_number}")
-        self._target_pc = str(pc_number)
-        self._target_loc = location
-        # Priorizamos el callback específico de la tarea, si no hay, usamos el global
-        self._callback = on_found_callback if on_found_callback else self._callback
-        self._watching = True
-        
-        # Reiniciar hilo si ya existe o iniciar uno nuevo
-        if self._monitor_thread and self._monitor_thread.is_alive():
-            return 
-            
-        self._monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
-        self._monitor_thread.start()
+        key = self._pc_key(pc_number)
+        armed_at = time.time()
+        with self._lock:
+            self._expected[key] = {
+                "pc": str(pc_number), "location": location, "callback": on_found_callback,
+                "armed_at": armed_at, "armed_perf": time.perf_counter(),
+            }
+            waiting = len(self._expected)
+            if waiting == 1: self._fs.subscribe(self._on_file_ready)
+        print(f"👀 Watcher ARMADO para PC: {pc_number} ({waiting} en espera)")
+
+        # Lo que haya terminado de descargarse entre el clic y la suscripción
+        for path, _ in sorted(self._fs.scan(since=armed_at), key=lambda x: x[1]):
+            self._on_file_ready(path)
+
+    def cancel(self, pc_number):
+        """Deja de esperar el reporte de un PC."""
+        with self._lock:
+            removed = self._expected.pop(self._pc_key(pc_number), None)
+            if removed and not self._expected: self._fs.unsubscribe(self._on_file_ready)
+
+    def pending(self):
+        """Números de PC en espera."""
+        with self._lock:
+            return [e["pc"] for e in self._expected.values()]
 
     def stop(self):
         """Detiene el monitoreo."""
-        self._watching = False
-        self._target_pc = None
+        with self._lock:
+            self._expected.clear()
+            self._fs.unsubscribe(self._on_file_ready)
         print("🛑 Watcher detenido.")
 
-    def _monitor_loop(self):
-        """Bucle principal de monitoreo."""
-        print("🕵️‍♂️ Iniciando vigilancia de descargas...")
-        
-        # Marcamos el tiempo de inicio para ignorar archivos viejos
-        start_time = time.time()
-        
-        while self._watching:
-            try:
-                # Buscar archivo candidato
-                found_path = self._scan_for_file(start_time)
-                
-                if found_path:
-                    print(f"🎯 ¡ARCHIVO ENCONTRADO! -> {found_path}")
-                    
-                    # Esperar un momento para asegurar que la descarga terminó (escritura finalizada)
-                    self._wait_for_write_finish(found_path)
-                    
-                    # Ejecutar callback
-                    if self._callback:
-                        try:
-                            self._callback(found_path)
-                        except Exception as e:
-                            print(f"❌ Error ejecutando callback del watcher: {e}")
-                    
-                    # Detener vigilancia una vez encontrado (One-shot)
-                    self._watching = False
-                    self._target_pc = None
-                    break
-                    
-            except Exception as e:
-                print(f"⚠️ Error en bucle de watcher: {e}")
-            
-            time.sleep(2) # Revisar cada 2 segundos
-
-    def _scan_for_file(self, start_timestamp):
-        """Busca archivos recientes que coincidan con el patrón esperado."""
-        if not self._target_pc: return None
-        
+    def _match(self, path):
+        """Retorna (pc_key, espera) del reporte al que corresponde el archivo, o (None, None)."""
+        name_lower = os.path.basename(path).lower()
+        if not name_lower.endswith('.pdf'): return None, None
+        try: mtime = os.path.getmtime(path)
+        except OSError: return None, None
+
+        # Criterio 1: Modificado DESPUÉS de que armamos la espera
+        armed = {k: e for k, e in self._expected.items() if mtime >= e["armed_at"] - 1}
+        # Criterio 2: el nombre contiene el PC
+        for key, entry in armed.items():
+            if key and key in name_lower: return key, entry
+        # Criterio 3: patrones comunes de reportes de ADP -> la espera más antigua
+        is_generic = ("punc" in name_lower and "detail" in name_lower) or "report" in name_lower
+        if is_generic and armed:
+            key = min(armed, key=lambda k: armed[k]["armed_at"])
+            return key, armed[key]
+        return None, None
+
+    def _on_file_ready(self, path):
+        with self._lock:
+            if path in self._claimed: return
+            key, entry = self._match(path)
+            if entry is None: return
+            del self._expected[key]
+            self._claimed.add(path)
+            if not self._expected: self._fs.unsubscribe(self._on_file_ready)
+
+        print(f"🎯 ¡ARCHIVO ENCONTRADO! PC {entry['pc']} -> {path}")
+        try:
+            lag_ms = max(0.0, (time.time() - os.path.getmtime(path)) * 1000)
+            waited = time.perf_counter() - entry["armed_perf"]
+            print(f"⏱️ [DownloadWatcher] Detectado {lag_ms:.0f}ms después de terminar la descarga ({self._fs.mode}); espera total {waited:.1f}s")
+        except OSError: pass
+
+        # El callback (subida a SharePoint) no debe bloquear el hilo del watcher
+        threading.Thread(target=self._dispatch, args=(entry, path), daemon=True).start()
+
+    def _dispatch(self, entry, path):
         try:
-            files = os.listdir(self.download_dir)
-            candidates = []
-            
-            for f in files:
-                # Ignorar archivos temporales o de sistema
-                if f.endswith('.crdownload') or f.endswith('.tmp') or f.startswith('~$'):
-                    continue
-                
-                full_path = os.path.join(self.download_dir, f)
-                if not os.path.isfile(full_path):
-                    continue
-
-                # Criterio 1: Modificado DESPUÉS de que armamos el watcher
-                mtime = os.path.getmtime(full_path)
-                if mtime < start_timestamp:
-                    continue
-                
-                # Criterio 2: Nombre coincide
-                name_lower = f.lower()
-                target_pc_clean = self._target_pc.replace("-", "") 
-                
-                # Patrones comunes de reportes de ADP
-                is_match = (
-                    ("punc" in name_lower and "detail" in name_lower) or 
-                    (target_pc_clean in name_lower) or
-                    ("report" in name_lower and ".pdf" in name_lower) 
-                )
-                
-                if is_match and f.lower().endswith('.pdf'):
-                    candidates.append((full_path, mtime))
-            
-            # Si hay candidatos, devolver el más reciente
-            if candidates:
-                candidates.sort(key=lambda x: x[1], reverse=True)
-                return candidates[0][0]
-                
+            if entry["callback"]: entry["callback"](path)
+            elif self._callback: self._callback(path, entry["pc"], entry["location"])
         except Exception as e:
-            pass
-            
-        return None
-
-    def _wait_for_write_finish(self, file_path, timeout=5):
-        """Espera a que el tamaño del archivo se estabilice (descarga completa)."""
-        start_size = -1
-        retries = 0
-        while retries < timeout:
-            try:
-                current_size = os.path.getsize(file_path)
-                if current_size == start_size and current_size > 0:
-                    return # Tamaño estable
-                start_size = current_size
-            except:
-                pass
-            time.sleep(1)
-            retries += 1
\ No newline at end of file
+            print(f"❌ Error ejecutando callback del watcher: {e}")
@@ -0,0 +1,138 @@
+import bisect
+import unicodedata
+from collections import Counter
+from services.list_mirror import ListMirror
+
+
+def normalize_text(s) -> str:
+    """Minúsculas y sin acentos (NFD sin marcas combinantes)."""
+    if not s: return ""
+    s = "".join(ch for ch in unicodedata.normalize("NFD", str(s)) if unicodedata.category(ch) != "Mn")
+    return s.lower().strip()
+
+
+class EmployeeDirectory(ListMirror):
+    """
+    Copia local de la lista 'Employee Information' con índice de prefijos.
+
+    - Carga inicial paginada (items/delta) y refresco incremental con el deltaLink (ver ListMirror).
+    - Índice token -> {sp_id} sobre nombre, apellido, Employee ID y File Number,
+      normalizado sin acentos; la búsqueda por prefijo usa bisect sobre los tokens ordenados.
+    - Conteos exactos por Pay Group y Status (facetas) mantenidos con cada cambio.
+    Una instancia por lista en todo el proceso (ver get()).
+    """
+
+    LABEL = "EmployeeDirectory"
+
+    def __init__(self, site_id, list_id, col_map):
+        super().__init__(site_id, list_id)
+        self.c = col_map
+
+        self._tokens_by_id: dict[str, set] = {}
+        self._ids_by_token: dict[str, set] = {}
+        self._sorted_tokens: list[str] = []
+        self._tokens_dirty = False
+        self._facets = {"pay_group": Counter(), "status": Counter()}
+
+    # ------------------------------- Índice ---------------------------------
+
+    def _clear_locked(self):
+        self._tokens_by_id.clear()
+        self._ids_by_token.clear()
+        self._sorted_tokens = []
+        self._tokens_dirty = False
+        self._facets = {"pay_group": Counter(), "status": Counter()}
+
+    def _tokens_for(self, fields):
+        c = self.c
+        tokens = set()
+        for key in ("FIRST_NAME", "LAST_NAME"):
+            tokens.update(t for t in normalize_text(fields.get(c[key])).replace("-", " ").split() if t)
+        for key in ("EE_ID", "FILE_NUMBER"):
+            val = normalize_text(fields.get(c[key]))
+            if val: tokens.add(val)
+        return tokens
+
+    def _facet_values(self, fields):
+        return fields.get(self.c['PAY_GROUP']), fields.get(self.c['EMPLOYEE_STATUS'])
+
+    def _upsert_locked(self, sp_id, fields):
+        tokens = self._tokens_for(fields)
+        self._tokens_by_id[sp_id] = tokens
+        for t in tokens:
+            bucket = self._ids_by_token.get(t)
+            if bucket is None:
+                self._ids_by_token[t] = bucket = set()
+                self._tokens_dirty = True
+            bucket.add(sp_id)
+
+        pg, st = self._facet_values(fields)
+        if pg: self._facets["pay_group"][pg] += 1
+        if st: self._facets["status"][st] += 1
+
+    def _remove_locked(self, sp_id, fields):
+        for t in self._tokens_by_id.pop(sp_id, ()):
+            bucket = self._ids_by_token.get(t)
+            if bucket is None: continue
+            bucket.discard(sp_id)
+            if not bucket:
+                del self._ids_by_token[t]
+                self._tokens_dirty = True
+
+        pg, st = self._facet_values(fields)
+        for facet, val in (("pay_group", pg), ("status", st)):
+            if not val: continue
+            self._facets[facet][val] -= 1
+            if self._facets[facet][val] <= 0: del self._facets[facet][val]
+
+    def _ids_with_prefix_locked(self, prefix):
+        if self._tokens_dirty:
+            self._sorted_tokens = sorted(self._ids_by_token)
+            self._tokens_dirty = False
+        ids = set()
+        start = bisect.bisect_left(self._sorted_tokens, prefix)
+        for token in self._sorted_tokens[start:]:
+            if not token.startswith(prefix): break
+            ids |= self._ids_by_token[token]
+        return ids
+
+    # ------------------------------- Consultas ------------------------------
+
+    def search(self, query: str = "", pay_group: str = None, status: str = None):
+        """
+        Retorna los ítems crudos (con 'fields') que cumplen la consulta, ordenados por apellido/nombre.
+        Cada token de la consulta debe ser prefijo de algún token indexado del empleado.
+        """
+        q_tokens = [t for t in normalize_text(query).replace("-", " ").split() if t]
+        with self._lock:
+            if q_tokens:
+                ids = None
+                for t in q_tokens:
+                    matched = self._ids_with_prefix_locked(t)
+                    ids = matched if ids is None else ids & matched
+                    if not ids: return []
+            else:
+                ids = set(self._items)
+
+            c = self.c
+            results = []
+            for sp_id in ids:
+                item = self._items[sp_id]
+                fields = item.get('fields') or {}
+                pg, st = self._facet_values(fields)
+                if pay_group and pg != pay_group: continue
+                if status and st != status: continue
+                if len(q_tokens) >= 2:
+                    # Mismo criterio que la búsqueda remota: "nombre apellido" o "apellido nombre"
+                    fn, ln = normalize_text(fields.get(c['FIRST_NAME'])), normalize_text(fields.get(c['LAST_NAME']))
+                    a, b = q_tokens[0], q_tokens[1]
+                    if not ((fn.startswith(a) and ln.startswith(b)) or (ln.startswith(a) and fn.startswith(b))): continue
+                results.append(item)
+
+        results.sort(key=lambda i: (normalize_text(i['fields'].get(c['LAST_NAME'])), normalize_text(i['fields'].get(c['FIRST_NAME']))))
+        return results
+
+    def facet_counts(self):
+        """{'pay_group': {valor: n}, 'status': {valor: n}} exactos sobre toda la lista."""
+        with self._lock:
+            return {k: dict(v) for k, v in self._facets.items()}
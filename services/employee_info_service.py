@@ -1,15 +1,18 @@
 import os
 import json
-import unicodedata
 import datetime
 from ms_graph_client import MSGraphClient
+from services.history_log import HistoryLog
+from services.employee_directory import EmployeeDirectory, normalize_text
+from services.facet_service import FacetService
+from services.sharepoint_resolver import SharePointResolver
 
 
 class EmployeeInfoService:
     """
     Servicio de información de empleados contra la lista 'Employee Information'.
 
-    - Resuelve list_id por displayName.
+    - Resuelve list_id por displayName (perezoso, vía SharePointResolver).
     - Descubre columnas dinámicamente y mapea internal_name -> displayName.
     - Filtra inteligentemente columnas de sistema.
     - Oculta Change History de la vista general.
@@ -54,32 +57,46 @@ class EmployeeInfoService:
         "_ComplianceTag", "_ComplianceFlags", "_ComplianceTagUserId", "_ComplianceTagWrittenTime"
     }
 
+    # Entradas de Change History que se muestran en el selector "Time Machine"
+    HISTORY_LIMIT = 20
+
     def __init__(self):
         self.client = MSGraphClient()
+        self._history = HistoryLog()
+        self._facet_service = None
         self.site_id = os.getenv('SHAREPOINT_SITE_ID')
         self.list_display_name = "Employee Information"
-        self.list_id = self._resolve_list_id_by_name(self.list_display_name)
-        # Mapa de columnas y sus metadatos para filtrado inteligente
-        self.columns_map, self.columns_meta = self._load_columns_metadata()
+        # Sin llamadas bloqueantes: list_id y columnas se resuelven bajo demanda
+        # (y se precargan en segundo plano) a través del resolver compartido.
+        self._resolver = SharePointResolver()
+        self._columns_cache = None
+        self._resolver.prefetch_list(self.list_display_name, self.site_id, with_columns=True)
 
     # --------------------- Resolución de lista y columnas -------------------
 
-    def _resolve_list_id_by_name(self, display_name: str) -> str:
-        resp = self.client.get(
-            f"/sites/{self.site_id}/lists?$filter=displayName eq '{display_name}'&$top=1"
-        )
-        items = resp.get("value", []) if resp else []
-        if not items:
-            raise RuntimeError(f"SharePoint list '{display_name}' not found")
-        return items[0]["id"]
+    @property
+    def list_id(self) -> str:
+        list_id = self._resolver.get_list_id(self.list_display_name, self.site_id)
+        if not list_id:
+            raise RuntimeError(f"SharePoint list '{self.list_display_name}' not found")
+        return list_id
+
+    @property
+    def columns_map(self) -> dict:
+        return self._load_columns_metadata()[0]
+
+    @property
+    def columns_meta(self) -> dict:
+        return self._load_columns_metadata()[1]
 
     def _load_columns_metadata(self) -> tuple:
-        resp = self.client.get(
-            f"/sites/{self.site_id}/lists/{self.list_id}/columns?$select=name,displayName,readOnly,calculated&$top=200"
-        )
+        raw_cols = self._resolver.get_columns(self.list_id, self.site_id)
+        if self._columns_cache and self._columns_cache[0] is raw_cols:
+            return self._columns_cache[1]
+
         cols = {}
         meta = {}
-        for c in (resp.get("value") or []):
+        for c in raw_cols:
             name = c.get("name")
             cols[name] = c.get("displayName") or name
             meta[name] = {
@@ -88,54 +105,40 @@ class EmployeeInfoService:
             }
         
         cols["Title"] = "Employee ID"
+        self._columns_cache = (raw_cols, (cols, meta))
         return cols, meta
 
     # -------------------------------- Búsqueda & Filtros --------------------
 
+    @property
+    def facets(self) -> FacetService:
+        if self._facet_service is None: self._facet_service = FacetService(self)
+        return self._facet_service
+
     def get_unique_pay_groups(self):
-        """Obtiene una lista única de Pay Groups escaneando una muestra de empleados."""
-        # Field_5 es Pay Group según COL_MAP
-        pg_field = self.COL_MAP['PAY_GROUP']
-        endpoint = f"/sites/{self.site_id}/lists/{self.list_id}/items?expand=fields($select={pg_field})&$top=1000"
-        try:
-            r = self.client.get(endpoint)
-            items = r.get("value") or []
-            unique = set()
-            for i in items:
-                val = i.get("fields", {}).get(pg_field)
-                if val: unique.add(val)
-            return sorted(list(unique))
-        except Exception as e:
-            print(f"Warning fetching pay groups: {e}")
-            return []
+        """Lista única de Pay Groups sobre la lista completa (ver FacetService)."""
+        return FacetService.sorted_values(self.facets.get_facets()["pay_group"])
 
     def get_unique_statuses(self):
-        """Obtiene una lista única de Status (Active, Terminated, etc.) escaneando una muestra."""
-        st_field = self.COL_MAP['EMPLOYEE_STATUS'] # field_4
-        endpoint = f"/sites/{self.site_id}/lists/{self.list_id}/items?expand=fields($select={st_field})&$top=1000"
-        try:
-            r = self.client.get(endpoint)
-            items = r.get("value") or []
-            unique = set()
-            for i in items:
-                val = i.get("fields", {}).get(st_field)
-                if val: unique.add(val)
-            return sorted(list(unique))
-        except Exception as e:
-            print(f"Warning fetching statuses: {e}")
-            return []
+        """Lista única de Status (Active, Terminated, etc.) sobre la lista completa."""
+        return FacetService.sorted_values(self.facets.get_facets()["status"])
 
     def _esc(self, s: str) -> str:
         return s.replace("'", "''")
 
     def _norm(self, s: str) -> str:
-        if not s: return ""
-        s = "".join(ch for ch in unicodedata.normalize("NFD", str(s)) if unicodedata.category(ch) != "Mn")
-        return s.lower().strip()
+        return normalize_text(s)
+
+    @property
+    def directory(self) -> EmployeeDirectory:
+        """Copia local indexada de la lista (compartida por todas las instancias)."""
+        return EmployeeDirectory.get(self.site_id, self.list_id, self.COL_MAP)
 
     def search_employee(self, query: str, pay_group_filter: str = None, status_filter: str = None):
         """
         Busca empleados.
+        Usa el índice local si ya está sincronizado; si no, consulta SharePoint
+        (y dispara la carga del índice para las siguientes búsquedas).
         Retorna: (lista_resultados, limite_alcanzado_bool)
         """
         # Permitir búsqueda vacía SOLO si hay filtro activo (Pay Group o Status)
@@ -147,6 +150,21 @@ class EmployeeInfoService:
             return [], False
 
         q = query.strip() if query else ""
+
+        if self.directory.ensure_loaded():
+            raw_items = self.directory.search(
+                q if has_query else "",
+                pay_group=pay_group_filter.strip() if has_pg_filter else None,
+                status=status_filter.strip() if has_st_filter else None
+            )
+            results = [self._map_employee_item(i) for i in raw_items[:self.SEARCH_LIMIT]]
+            return results, len(raw_items) > self.SEARCH_LIMIT
+
+        return self._search_employee_remote(q, has_query, pay_group_filter if has_pg_filter else None, status_filter if has_st_filter else None)
+
+    def _search_employee_remote(self, q, has_query, pay_group_filter, status_filter):
+        """Búsqueda contra SharePoint con $filter (fallback mientras el índice local carga)."""
+        has_pg_filter, has_st_filter = bool(pay_group_filter), bool(status_filter)
         c = self.COL_MAP
         found = {}
 
@@ -241,7 +259,7 @@ class EmployeeInfoService:
         )
 
         raw_history = f.get(c["CHANGE_HISTORY"], "")
-        change_history = self._parse_change_history(raw_history)
+        change_history = self._parse_change_history(raw_history, self.HISTORY_LIMIT)
 
         return {
             "id": f.get(c["EE_ID"], "N/A"),
@@ -278,49 +296,49 @@ class EmployeeInfoService:
         }
         return {"needs_confirmation": needs_conf, "grouped": grouped}
 
-    def _parse_change_history(self, raw):
+    def _parse_change_history(self, raw, limit=None):
+        """Parsea solo las últimas 'limit' entradas (None = todas)."""
         if not raw: return {"parsed": [], "raw": ""}
         s = str(raw)
         try:
-            data = json.loads(s)
             timeline = []
-            if isinstance(data, dict): data = data.get("history") or data.get("changes") or []
-            if isinstance(data, list):
-                for ev in data:
-                    timeline.append({
-                        "date": ev.get("date") or ev.get("timestamp"),
-                        "user": ev.get("user") or ev.get("by"),
-                        "field": ev.get("field") or ev.get("column"),
-                        "old": ev.get("old") or ev.get("from"),
-                        "new": ev.get("new") or ev.get("to"),
-                    })
-            timeline.sort(key=lambda x: x.get("date", ""), reverse=True)
+            for ev in HistoryLog.read_recent(s, limit):
+                timeline.append({
+                    "date": ev.get("date") or ev.get("timestamp"),
+                    "user": ev.get("user") or ev.get("by"),
+                    "field": ev.get("field") or ev.get("column"),
+                    "old": ev.get("old") or ev.get("from"),
+                    "new": ev.get("new") or ev.get("to"),
+                })
+            timeline.sort(key=lambda x: x.get("date") or "", reverse=True)
             return {"parsed": timeline, "raw": s}
         except Exception: return {"parsed": [], "raw": s}
 
     # ------------------------------ Update & Append -------------------------
 
-    def append_history_entry(self, current_raw_json, user_display_name, field_label, old_value, new_value):
-        history_list = []
-        if current_raw_json:
-            try:
-                data = json.loads(str(current_raw_json))
-                if isinstance(data, dict):
-                    history_list = data.get("history") or data.get("changes") or []
-                elif isinstance(data, list):
-                    history_list = data
-            except:
-                pass 
-        
-        new_event = {
+    def _build_history_event(self, user_display_name, field_label, old_value, new_value):
+        return {
             "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "user": user_display_name,
             "field": field_label,
             "old": str(old_value),
             "new": str(new_value)
         }
-        history_list.append(new_event)
-        return json.dumps({"history": history_list})
+
+    def update_field_with_history(self, sp_item_id: str, field_internal_name: str, new_value,
+                                  user_display_name, field_label, old_value):
+        """
+        Escribe el campo y su evento de historial en un solo PATCH protegido por eTag.
+        La fusión se hace sobre el historial vigente en SharePoint (no sobre la copia local).
+        Retorna el historial resultante o None si falló.
+        """
+        new_event = self._build_history_event(user_display_name, field_label, old_value, new_value)
+        endpoint = f"/sites/{self.site_id}/lists/{self.list_id}/items/{sp_item_id}"
+        new_raw = self._history.append(endpoint, self.COL_MAP["CHANGE_HISTORY"], new_event,
+                                       extra_fields={field_internal_name: new_value}, wrapper="history")
+        if new_raw is not None:
+            self.directory.apply_local_update(sp_item_id, {field_internal_name: new_value, self.COL_MAP["CHANGE_HISTORY"]: new_raw})
+        return new_raw
 
     def update_employee_fields(self, sp_item_id: str, updates: dict):
         endpoint = f"/sites/{self.site_id}/lists/{self.list_id}/items/{sp_item_id}/fields"
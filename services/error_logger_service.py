@@ -2,14 +2,12 @@ import os
 import hashlib
 import traceback
 import json
+import queue
 import threading
-<<<<<<< HEAD
 import time
 from datetime import datetime
+from urllib.parse import quote
 
-=======
-from datetime import datetime
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
 # Importamos desde el módulo raíz porque main.py agrega la raíz al path
 try:
     from ms_graph_client import MSGraphClient
@@ -18,51 +16,76 @@ except ImportError:
     import sys
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     from ms_graph_client import MSGraphClient
+from services.sharepoint_resolver import SharePointResolver
+from services.offline_journal import OfflineJournal
+from services.path_manager import PathManager
 
 class ErrorLoggerService:
     """
     Servicio dedicado a la telemetría de errores (SoC).
     Responsabilidad: Registrar errores en SharePoint List 'AppErrorLog'.
-<<<<<<< HEAD
-    Patrón: Singleton implícito + Resolución Dinámica de ID + Cola Offline.
-=======
-    Patrón: Singleton (gestionado implícitamente) + Lógica de Reintento Offline.
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
+    Patrón: Singleton + Resolución Dinámica de ID + Journal Offline (JSON Lines).
+
+    - log_error solo encola (cola acotada); un único hilo escritor sube a SharePoint.
+    - El escritor agrega por firma (conteo, primera/última vez) y sube cada FLUSH_INTERVAL
+      segundos en $batch: un PATCH del contador por firma conocida, un POST por firma nueva.
+    - Por encima de RATE_PER_MINUTE eventos se muestrea 1 de cada SAMPLE_EVERY (con peso
+      SAMPLE_EVERY en el contador), salvo la primera ocurrencia de cada firma; si la cola
+      se llena, el evento se descarta y se cuenta.
     """
     
     LIST_NAME = "AppErrorLog"
-    OFFLINE_FILE = "pending_errors.json"
+    LEGACY_OFFLINE_FILE = "pending_errors.json"
+    OFFLINE_MAX_BYTES = 2_000_000
+    OFFLINE_RETRY_INTERVAL = 120
+
+    QUEUE_MAX = 500
+    FLUSH_INTERVAL = 10.0
+    RATE_PER_MINUTE = 60
+    SAMPLE_EVERY = 10
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(ErrorLoggerService, cls).__new__(cls)
+                cls._instance._initialized = False
+        return cls._instance
 
     def __init__(self):
+        if self._initialized: return
         self.client = MSGraphClient()
         self.site_id = os.getenv('SHAREPOINT_SITE_ID')
-<<<<<<< HEAD
         self.app_version = "v1.1" 
         self.list_id = None # Aquí guardaremos el GUID real de la lista
+
+        self._queue = queue.Queue(maxsize=self.QUEUE_MAX)
+        self._flush_requested = threading.Event()
+        self._flushed = threading.Event()
+        self._item_ids = {}  # firma -> item id en AppErrorLog (evita re-consultar)
+        self._rate_lock = threading.Lock()
+        self._window_start, self._window_count = time.time(), 0
+        self._window_signatures = set()
+        self.stats = {"queued": 0, "sampled_out": 0, "dropped": 0, "uploaded": 0}
+        self._journal = OfflineJournal(PathManager.get_error_journal_path(), self.OFFLINE_MAX_BYTES, reducer=self._reduce_offline)
+        self._initialized = True
         
         # Inicialización en segundo plano para no bloquear el arranque de la UI
-        threading.Thread(target=self._init_service, daemon=True).start()
-
-    def _init_service(self):
-        """Tarea de arranque: Resolver ID y vaciar cola."""
-        if self._resolve_list_id():
-            self._flush_offline_queue()
+        threading.Thread(target=self._writer_loop, daemon=True, name="ErrorLogger").start()
 
     def _resolve_list_id(self):
         """
         CRÍTICO: Busca el GUID de la lista usando su nombre visible.
         La API de Graph a veces falla si usas el nombre directamente en la URL.
+        La resolución se comparte (y se cachea en disco) vía SharePointResolver.
         """
         try:
             if self.list_id: return True
             
-            # Buscamos la lista por su nombre visible (Display Name)
-            # Nota: filter=displayName eq 'Name' es más seguro
-            endpoint = f"/sites/{self.site_id}/lists?filter=displayName eq '{self.LIST_NAME}'&select=id,name"
-            data = self.client.get(endpoint)
-            
-            if data and 'value' in data and len(data['value']) > 0:
-                self.list_id = data['value'][0]['id']
+            self.list_id = SharePointResolver().get_list_id(self.LIST_NAME, self.site_id)
+            if self.list_id:
                 print(f"✅ [Logger] Conectado exitosamente a la lista: {self.list_id}")
                 return True
             else:
@@ -74,35 +97,10 @@ class ErrorLoggerService:
 
     def log_error(self, exception, context_msg="", user="Unknown"):
         """
-        Punto de entrada principal. 
-        Guarda en local INMEDIATAMENTE y luego intenta subir a la nube.
+        Punto de entrada principal. No bloquea: arma el payload y lo encola para el escritor.
         """
         try:
-            # 1. Preparar datos
-            tb_str = "".join(traceback.format_exception(None, exception, exception.__traceback__))
-            error_msg = f"{context_msg}: {str(exception)}" if context_msg else str(exception)
-            
             # Firma única para agrupar errores repetidos
-=======
-        # Versión hardcoded o desde env
-        self.app_version = "v1.0" 
-        
-        # Intentar enviar errores pendientes al iniciar (en segundo plano)
-        threading.Thread(target=self._flush_offline_queue, daemon=True).start()
-
-    def log_error(self, exception, context_msg="", user="Unknown"):
-        """
-        Punto de entrada principal para registrar un error.
-        No lanza excepciones (Fail-Safe).
-        """
-        try:
-            # 1. Preparar datos del error
-            tb_str = "".join(traceback.format_exception(None, exception, exception.__traceback__))
-            error_msg = f"{context_msg}: {str(exception)}" if context_msg else str(exception)
-            
-            # Generar firma única (Hash) basada en el tipo de error y el lugar donde ocurrió
-            # Esto agrupa errores idénticos aunque ocurran en momentos distintos
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             if exception.__traceback__:
                 tb_last = traceback.extract_tb(exception.__traceback__)[-1]
                 signature_base = f"{type(exception).__name__}|{tb_last.filename}:{tb_last.lineno}"
@@ -111,20 +109,31 @@ class ErrorLoggerService:
                 
             error_signature = hashlib.md5(signature_base.encode()).hexdigest()
 
+            weight = self._admit(error_signature)
+            if not weight:
+                self.stats["sampled_out"] += 1
+                return
+
+            # 1. Preparar datos
+            tb_str = "".join(traceback.format_exception(None, exception, exception.__traceback__))
+            error_msg = f"{context_msg}: {str(exception)}" if context_msg else str(exception)
+
             payload = {
                 "Title": error_signature,
-<<<<<<< HEAD
                 "ErrorMessage": error_msg[:250], 
                 "StackTrace": tb_str[:1500], # Aumenté un poco el límite
                 "LastUser": str(user),
                 "AppVersion": self.app_version,
-                "OccurrenceCount": 1,
+                "OccurrenceCount": weight,
                 "Timestamp": datetime.now().isoformat()
             }
 
-            # 2. Intentar subir a SharePoint
-            # Lanzamos hilo para no congelar la UI si internet está lento
-            threading.Thread(target=self._worker_log_to_sharepoint, args=(payload,), daemon=True).start()
+            # 2. Encolar para el hilo escritor (nunca bloquea la UI)
+            try:
+                self._queue.put_nowait(payload)
+                self.stats["queued"] += 1
+            except queue.Full:
+                self.stats["dropped"] += 1
                 
         except Exception as e:
             # Si falla el propio logger, imprimimos en consola de emergencia
@@ -133,166 +142,183 @@ class ErrorLoggerService:
             with open("panic.log", "a") as f:
                 f.write(f"{datetime.now()}: {str(e)}\n")
 
-    def _worker_log_to_sharepoint(self, payload):
-        """Lógica de subida usando el ID resuelto."""
-        try:
-            # Asegurarnos de tener el ID
-            if not self.list_id:
-                if not self._resolve_list_id():
-                    self._save_offline(payload)
-                    return
+    def _admit(self, signature):
+        """
+        Limitador por ventana de 1 minuto. Retorna el peso del evento (0 = descartado por muestreo).
+        La primera ocurrencia de cada firma en la ventana siempre pasa.
+        """
+        with self._rate_lock:
+            now = time.time()
+            if now - self._window_start >= 60:
+                if self._window_count > self.RATE_PER_MINUTE:
+                    print(f"⚠️ [Logger] Tormenta de errores: {self._window_count} eventos en 1 min (muestreo 1/{self.SAMPLE_EVERY}).")
+                self._window_start, self._window_count = now, 0
+                self._window_signatures.clear()
+            self._window_count += 1
+            if signature not in self._window_signatures:
+                self._window_signatures.add(signature)
+                return 1
+            excess = self._window_count - self.RATE_PER_MINUTE
+            if excess <= 0: return 1
+            return self.SAMPLE_EVERY if excess % self.SAMPLE_EVERY == 0 else 0
 
-            signature = payload['Title']
-            
-            # A. Buscar error existente
-            # Usamos self.list_id en lugar de self.LIST_NAME
-            endpoint = f"/sites/{self.site_id}/lists/{self.list_id}/items?filter=fields/Title eq '{signature}'"
-=======
-                "ErrorMessage": error_msg[:250], # Cortar para evitar límites simples
-                "StackTrace": tb_str[:1000],     # Cortar para evitar límites
-                "LastUser": str(user),
-                "AppVersion": self.app_version,
-                "OccurrenceCount": 1
-            }
+    def flush(self, timeout=3.0):
+        """Fuerza la subida de lo agregado (p. ej. antes de un cierre por crash). Retorna True si terminó."""
+        self._flushed.clear()
+        self._flush_requested.set()
+        return self._flushed.wait(timeout)
+
+    # ------------------------------- Hilo escritor --------------------------
+
+    def _writer_loop(self):
+        """Único hilo que escribe en SharePoint. Arranca resolviendo el ID y vaciando la cola offline."""
+        self._migrate_legacy_offline_file()
+        if self._resolve_list_id():
+            self._flush_offline_queue()
+
+        pending = {}  # firma -> payload agregado
+        last_flush = last_offline_retry = time.time()
+        while True:
+            try:
+                payload = self._queue.get(timeout=0.5)
+                self._aggregate(pending, payload)
+                # Vaciamos lo que ya esté en cola sin esperar (las tormentas llegan juntas)
+                while True:
+                    try: self._aggregate(pending, self._queue.get_nowait())
+                    except queue.Empty: break
+            except queue.Empty:
+                pass
+
+            forced = self._flush_requested.is_set()
+            if pending and (forced or time.time() - last_flush >= self.FLUSH_INTERVAL):
+                batch, pending = pending, {}
+                try: self._upload_batch(batch)
+                except Exception as e:
+                    print(f"⚠️ [Logger] Fallo subida a SP: {e}. Guardando offline.")
+                    self._save_offline(list(batch.values()))
+                last_flush = time.time()
+            if time.time() - last_offline_retry >= self.OFFLINE_RETRY_INTERVAL:
+                last_offline_retry = time.time()
+                if self.list_id or self._resolve_list_id(): self._flush_offline_queue()
+            if forced:
+                self._flush_requested.clear()
+                self._flushed.set()
+
+    @staticmethod
+    def _aggregate(pending, payload):
+        signature = payload['Title']
+        agg = pending.get(signature)
+        count = int(payload.get('OccurrenceCount') or 1)
+        if agg is None:
+            pending[signature] = {**payload, "OccurrenceCount": count,
+                                  "FirstSeen": payload.get('FirstSeen') or payload.get('Timestamp'),
+                                  "LastSeen": payload.get('LastSeen') or payload.get('Timestamp')}
+            return
+        # El mensaje/usuario más reciente gana; el contador se acumula
+        agg.update({k: payload[k] for k in ("ErrorMessage", "LastUser", "AppVersion") if payload.get(k)})
+        agg["OccurrenceCount"] += count
+        agg["LastSeen"] = payload.get('LastSeen') or payload.get('Timestamp') or agg["LastSeen"]
+
+    def _upload_batch(self, batch):
+        """
+        Sube las firmas agregadas en dos round trips:
+        1) $batch de lectura del contador actual (GET por ID si ya lo conocemos; por Title si no).
+        2) $batch de escritura: PATCH del contador acumulado o POST de la firma nueva.
+        Lo que falle queda en la cola offline.
+        """
+        if not self.list_id and not self._resolve_list_id():
+            self._save_offline(list(batch.values()))
+            return
+
+        items_url = f"/sites/{self.site_id}/lists/{self.list_id}/items"
+        headers = {"Prefer": "HonorNonIndexedQueriesWarningMayFailRandomly"}
+        signatures = list(batch)
+        lookups = []
+        for sig in signatures:
+            item_id = self._item_ids.get(sig)
+            if item_id:
+                lookups.append({"method": "GET", "url": f"{items_url}/{item_id}?$select=id&expand=fields($select=OccurrenceCount)"})
+                continue
+            filter_expr = quote(f"fields/Title eq '{sig}'", safe="/'")
+            lookups.append({"method": "GET", "headers": headers,
+                            "url": f"{items_url}?$filter={filter_expr}&$select=id&expand=fields($select=OccurrenceCount)&$top=1"})
 
-            # 2. Intentar enviar a SharePoint
-            if self.client.is_session_valid:
-                threading.Thread(target=self._worker_log_to_sharepoint, args=(payload,), daemon=True).start()
+        writes, owners, failed = [], [], []
+        for sig, sub in zip(signatures, self.client.send_batch(lookups)):
+            agg = batch[sig]
+            status = (sub or {}).get('status')
+            body = (sub or {}).get('body') or {}
+            if status == 404 and self._item_ids.get(sig):
+                # El ítem fue borrado en SharePoint: se vuelve a crear
+                self._item_ids.pop(sig, None)
+                existing = None
+            elif status == 200:
+                existing = body if 'fields' in body else ((body.get('value') or [None])[0])
             else:
-                self._save_offline(payload)
-                
-        except Exception as e:
-            # Si falla el logger, solo imprimimos en consola local para no ciclar
-            print(f"❌ CRITICAL: Falló el sistema de logs: {e}")
+                failed.append(agg)
+                continue
 
-    def _worker_log_to_sharepoint(self, payload):
-        """Lógica de Upsert (Actualizar si existe, Crear si no)."""
-        try:
-            signature = payload['Title']
-            
-            # A. Buscar si ya existe este error
-            endpoint = f"/sites/{self.site_id}/lists/{self.LIST_NAME}/items?$expand=fields&$filter=fields/Title eq '{signature}'"
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
-            headers = {"Prefer": "HonorNonIndexedQueriesWarningMayFailRandomly"}
-            
-            existing = self.client.get(endpoint, extra_headers=headers)
-            
-            if existing and 'value' in existing and len(existing['value']) > 0:
-<<<<<<< HEAD
-                # B. EXISTE -> Actualizar contador
-=======
-                # B. EXISTE -> Actualizar (PATCH)
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
-                item_id = existing['value'][0]['id']
-                current_fields = existing['value'][0].get('fields', {})
-                current_count = current_fields.get('OccurrenceCount', 1) or 1
-                
-                patch_payload = {
-                    "OccurrenceCount": int(current_count) + 1,
-                    "LastUser": payload['LastUser'],
-<<<<<<< HEAD
-                    "ErrorMessage": payload['ErrorMessage'], # Actualizar mensaje
-                    "AppVersion": self.app_version
-                }
-                
-                self.client.patch(f"/sites/{self.site_id}/lists/{self.list_id}/items/{item_id}/fields", patch_payload)
-                print(f"☁️ [Logger] Error actualizado en SharePoint (x{int(current_count) + 1})")
-            
+            if existing:
+                self._item_ids[sig] = existing['id']
+                current_count = int(existing.get('fields', {}).get('OccurrenceCount') or 1)
+                writes.append({"method": "PATCH", "url": f"{items_url}/{existing['id']}/fields",
+                               "body": {"OccurrenceCount": current_count + agg["OccurrenceCount"], "LastUser": agg['LastUser'],
+                                        "ErrorMessage": agg['ErrorMessage'], "AppVersion": self.app_version}})
             else:
-                # C. NO EXISTE -> Crear nuevo
                 # Quitamos campos que no son columnas de SP para evitar error 400
-                sp_payload = {
-                    "Title": payload['Title'],
-                    "ErrorMessage": payload['ErrorMessage'],
-                    "StackTrace": payload['StackTrace'],
-                    "LastUser": payload['LastUser'],
-                    "AppVersion": payload['AppVersion'],
-                    "OccurrenceCount": 1
-                }
-                
-                create_payload = {"fields": sp_payload}
-                resp = self.client.post(f"/sites/{self.site_id}/lists/{self.list_id}/items", create_payload)
-                
-                if resp and 'id' in resp:
-                    print(f"☁️ [Logger] Nuevo error registrado en SharePoint.")
-                else:
-                    raise Exception("La API no devolvió ID de creación.")
+                writes.append({"method": "POST", "url": items_url, "body": {"fields": {
+                    "Title": sig, "ErrorMessage": agg['ErrorMessage'], "StackTrace": agg['StackTrace'],
+                    "LastUser": agg['LastUser'], "AppVersion": agg['AppVersion'], "OccurrenceCount": agg["OccurrenceCount"]}}})
+            owners.append(sig)
+        if not writes:
+            self._save_offline(failed)
+            return
 
-        except Exception as e:
-            print(f"⚠️ [Logger] Fallo subida a SP: {e}. Guardando offline.")
-            self._save_offline(payload)
-
-    def _save_offline(self, payload):
-        """Guarda en JSON estructurado para reintento futuro."""
-=======
-                    "ErrorMessage": payload['ErrorMessage'] # Actualizamos mensaje por si varió un poco
-                }
-                
-                self.client.patch(f"/sites/{self.site_id}/lists/{self.LIST_NAME}/items/{item_id}/fields", patch_payload)
-                print(f"📝 Error registrado (Count: {int(current_count) + 1})")
-            
+        uploaded = 0
+        for sig, sub in zip(owners, self.client.send_batch(writes)):
+            body = (sub or {}).get('body') or {}
+            if sub and sub.get('status') in (200, 201):
+                if body.get('id') and sub.get('status') == 201: self._item_ids[sig] = body['id']
+                uploaded += batch[sig]["OccurrenceCount"]
             else:
-                # C. NO EXISTE -> Crear (POST)
-                # Graph requiere envolver los campos personalizados en 'fields'
-                create_payload = {"fields": payload}
-                self.client.post(f"/sites/{self.site_id}/lists/{self.LIST_NAME}/items", create_payload)
-                print(f"📝 Nuevo tipo de error registrado en SharePoint.")
+                failed.append(batch[sig])
+        self._save_offline(failed)
+        self.stats["uploaded"] += uploaded
+        print(f"☁️ [Logger] {len(owners)} firma(s) / {uploaded} ocurrencia(s) registradas en SharePoint.")
 
-        except Exception as e:
-            print(f"⚠️ No se pudo subir el log a SharePoint: {e}")
-            self._save_offline(payload)
+    def _save_offline(self, payloads):
+        """Añade al journal offline (una escritura + fsync por lote)."""
+        self._journal.append([p for p in payloads if p])
 
-    def _save_offline(self, payload):
-        """Guarda el error en disco si no hay internet."""
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
-        try:
-            queue = []
-            if os.path.exists(self.OFFLINE_FILE):
-                with open(self.OFFLINE_FILE, 'r') as f:
-                    try: queue = json.load(f)
-                    except: pass
-            
-            queue.append(payload)
-            
-            with open(self.OFFLINE_FILE, 'w') as f:
-                json.dump(queue, f)
-<<<<<<< HEAD
-        except: pass
+    @classmethod
+    def _reduce_offline(cls, records):
+        """Compactación por tamaño: un registro por firma con el contador acumulado."""
+        pending = {}
+        for payload in records: cls._aggregate(pending, payload)
+        return list(pending.values())
 
-    def _flush_offline_queue(self):
-        """Reintenta subir la cola."""
-        if not os.path.exists(self.OFFLINE_FILE) or not self.list_id: return
-=======
-            print("💾 Error guardado localmente (Offline).")
-        except:
-            pass
+    def _migrate_legacy_offline_file(self):
+        """El formato anterior (lista JSON completa reescrita en cada error) pasa al journal una sola vez."""
+        if not os.path.exists(self.LEGACY_OFFLINE_FILE): return
+        try:
+            with open(self.LEGACY_OFFLINE_FILE, 'r') as f: legacy = json.load(f)
+            if isinstance(legacy, list): self._save_offline(legacy)
+            os.remove(self.LEGACY_OFFLINE_FILE)
+        except Exception as e:
+            print(f"⚠️ [Logger] No se pudo migrar {self.LEGACY_OFFLINE_FILE}: {e}")
 
     def _flush_offline_queue(self):
-        """Intenta subir errores guardados localmente."""
-        if not os.path.exists(self.OFFLINE_FILE): return
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
-        
+        """Sube el journal offline agregado por firma y lo compacta si la subida terminó."""
+        if not self.list_id or self._journal.is_empty(): return
+        records, offset = self._journal.snapshot()
         try:
-            with open(self.OFFLINE_FILE, 'r') as f:
-                queue = json.load(f)
-            
-            if not queue: return
-            
-<<<<<<< HEAD
-            print(f"🔄 [Logger] Procesando {len(queue)} errores offline...")
-            
-            # Vaciar archivo
-            with open(self.OFFLINE_FILE, 'w') as f:
-                json.dump([], f)
-=======
-            print(f"🔄 Sincronizando {len(queue)} errores offline...")
-            
-            # Limpiamos el archivo primero para evitar bucles si falla de nuevo
-            os.remove(self.OFFLINE_FILE)
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
-            
-            for payload in queue:
-                self._worker_log_to_sharepoint(payload)
-                
-        except Exception:
-            pass
\ No newline at end of file
+            if records:
+                print(f"🔄 [Logger] Procesando {len(records)} errores offline...")
+                pending = {}
+                for payload in records: self._aggregate(pending, payload)
+                # Lo que vuelva a fallar se re-anexa al journal (después del offset) dentro de _upload_batch
+                self._upload_batch(pending)
+            self._journal.commit(offset)
+        except Exception as e:
+            print(f"⚠️ [Logger] Fallo subiendo la cola offline: {e}")
+            self._journal.release()
@@ -0,0 +1,76 @@
+import time
+import threading
+from collections import Counter
+
+
+class FacetService:
+    """
+    Valores distintos (con conteo) de Pay Group y Status de 'Employee Information'.
+
+    - Si el directorio local ya está sincronizado, los conteos salen de memoria.
+    - Si no, se recorre la lista completa (siguiendo @odata.nextLink) con una proyección
+      $select de solo esas dos columnas, calculando ambas facetas en una sola pasada.
+    - El resultado se cachea por lista durante FACET_TTL segundos.
+    """
+
+    FACET_TTL = 300
+    PAGE_SIZE = 999
+
+    _cache = {}  # {list_id: (timestamp, facets)}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, employee_service):
+        self.employee_service = employee_service
+        self.client = employee_service.client
+
+    def get_facets(self, force=False):
+        """Retorna {'pay_group': {valor: n}, 'status': {valor: n}}."""
+        svc = self.employee_service
+        list_id = svc.list_id
+        with self._cache_lock:
+            cached = self._cache.get(list_id)
+        if cached and not force and time.time() - cached[0] < self.FACET_TTL:
+            return cached[1]
+
+        if svc.directory.is_ready:
+            facets = svc.directory.facet_counts()
+        else:
+            facets = self._scan_facets()
+            if facets is None: return cached[1] if cached else {"pay_group": {}, "status": {}}
+
+        with self._cache_lock:
+            self._cache[list_id] = (time.time(), facets)
+        return facets
+
+    def _scan_facets(self):
+        svc = self.employee_service
+        pg_field, st_field = svc.COL_MAP['PAY_GROUP'], svc.COL_MAP['EMPLOYEE_STATUS']
+        endpoint = (
+            f"/sites/{svc.site_id}/lists/{svc.list_id}/items"
+            f"?$select=id&expand=fields($select={pg_field},{st_field})&$top={self.PAGE_SIZE}"
+        )
+        t0 = time.perf_counter()
+        pay_groups, statuses = Counter(), Counter()
+        scanned = 0
+        data = self.client.get(endpoint)
+        if data is None:
+            print("⚠️ [Facets] No se pudieron leer las facetas de empleados.")
+            return None
+        while data:
+            for item in data.get('value', []):
+                f = item.get('fields', {})
+                if f.get(pg_field): pay_groups[f[pg_field]] += 1
+                if f.get(st_field): statuses[f[st_field]] += 1
+                scanned += 1
+            next_link = data.get('@odata.nextLink')
+            if not next_link: break
+            data = self.client.get(next_link)
+            if data is None:
+                print("⚠️ [Facets] Página perdida al recorrer la lista. Facetas descartadas.")
+                return None
+        print(f"⏱️ [Facets] {scanned} empleados escaneados en {(time.perf_counter() - t0) * 1000:.0f}ms")
+        return {"pay_group": dict(pay_groups), "status": dict(statuses)}
+
+    @staticmethod
+    def sorted_values(counts: dict):
+        return sorted(counts.keys(), key=lambda v: str(v))
@@ -0,0 +1,191 @@
+import os
+import time
+import threading
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    HAS_WATCHDOG = True
+except ImportError:
+    FileSystemEventHandler = object
+    HAS_WATCHDOG = False
+    print("⚠️ 'watchdog' not found. Download folders will be polled.")
+
+
+class _EventBridge(FileSystemEventHandler):
+    """Traduce los eventos de watchdog a DirectoryWatcher (solo archivos)."""
+
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory: self.watcher._on_changed(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory: self.watcher._on_changed(event.src_path)
+
+    def on_closed(self, event):
+        # close-write (inotify): la escritura terminó
+        if not event.is_directory: self.watcher._on_ready(event.src_path)
+
+    def on_moved(self, event):
+        # '.crdownload' -> nombre final: el navegador renombra solo cuando la descarga está completa
+        if not event.is_directory: self.watcher._on_ready(event.dest_path)
+
+
+class DirectoryWatcher:
+    """
+    Vigilancia compartida de una carpeta (una instancia por ruta; ver get()).
+
+    Los suscriptores reciben la ruta de cada archivo TERMINADO:
+    - Con watchdog: al instante en un rename a nombre final o un close-write; si solo llegan
+      created/modified, cuando el archivo deja de cambiar durante SETTLE_SECONDS.
+    - Sin watchdog (o si el observer no arranca): sondeo con os.scandir cada POLL_INTERVAL;
+      un archivo está terminado cuando su (mtime, tamaño) no cambió entre dos sondeos.
+    Los temporales de descarga (.crdownload, .part, ...) se ignoran. Un mismo archivo no se
+    notifica dos veces mientras no cambie. El observer vive solo mientras haya suscriptores.
+    Los callbacks corren en el hilo del watcher: deben ser rápidos (delegar el trabajo pesado).
+    """
+
+    POLL_INTERVAL = 1.0
+    SETTLE_SECONDS = 0.5
+    TEMP_SUFFIXES = ('.crdownload', '.tmp', '.part', '.partial', '.download')
+
+    _instances = {}
+    _registry_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, directory):
+        key = os.path.normcase(os.path.abspath(directory))
+        with cls._registry_lock:
+            if key not in cls._instances: cls._instances[key] = cls(key)
+            return cls._instances[key]
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._observer = None
+        self._generation = 0
+        self._settle_timers = {}
+        self._notified = {}  # ruta -> (mtime, tamaño) ya notificado
+
+    @property
+    def mode(self):
+        return "events" if self._observer else "polling"
+
+    # ------------------------------ Suscripción -----------------------------
+
+    def subscribe(self, callback):
+        with self._lock:
+            if callback not in self._subscribers: self._subscribers.append(callback)
+            if len(self._subscribers) == 1: self._start_locked()
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers: self._subscribers.remove(callback)
+            if not self._subscribers: self._stop_locked()
+
+    def scan(self, since=0.0):
+        """Archivos terminados (no temporales) modificados desde 'since': [(ruta, mtime)]."""
+        return [(path, sig[0]) for path, sig in self._snapshot().items() if sig[0] >= since and sig[1] > 0]
+
+    # ------------------------------- Ciclo de vida --------------------------
+
+    def _start_locked(self):
+        self._generation += 1
+        if HAS_WATCHDOG:
+            try:
+                observer = Observer()
+                observer.schedule(_EventBridge(self), self.directory, recursive=False)
+                observer.daemon = True
+                observer.start()
+                self._observer = observer
+                print(f"👀 [FSWatcher] Eventos del sistema activos en {self.directory}")
+                return
+            except Exception as e:
+                print(f"⚠️ [FSWatcher] Observer no disponible, se usa sondeo: {e}")
+        threading.Thread(target=self._poll_loop, args=(self._generation,), daemon=True).start()
+        print(f"👀 [FSWatcher] Sondeo cada {self.POLL_INTERVAL}s en {self.directory}")
+
+    def _stop_locked(self):
+        self._generation += 1  # el hilo de sondeo de la generación anterior termina solo
+        if self._observer:
+            try: self._observer.stop()
+            except Exception: pass
+            self._observer = None
+        for timer in self._settle_timers.values(): timer.cancel()
+        self._settle_timers.clear()
+
+    # --------------------------------- Eventos ------------------------------
+
+    def _is_temp(self, path):
+        name = os.path.basename(path).lower()
+        return name.startswith('~$') or name.startswith('.') or name.endswith(self.TEMP_SUFFIXES)
+
+    def _on_changed(self, path):
+        """created/modified: se espera a que el archivo deje de cambiar."""
+        if self._is_temp(path): return
+        with self._lock:
+            previous = self._settle_timers.pop(path, None)
+            if previous: previous.cancel()
+            timer = threading.Timer(self.SETTLE_SECONDS, self._on_settled, args=(path,))
+            timer.daemon = True
+            self._settle_timers[path] = timer
+            timer.start()
+
+    def _on_settled(self, path):
+        with self._lock: self._settle_timers.pop(path, None)
+        self._on_ready(path)
+
+    def _on_ready(self, path):
+        if self._is_temp(path): return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        if stat.st_size <= 0: return
+        sig = (stat.st_mtime, stat.st_size)
+        with self._lock:
+            pending = self._settle_timers.pop(path, None)
+            if pending: pending.cancel()
+            if self._notified.get(path) == sig: return
+            self._notified[path] = sig
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try: callback(path)
+            except Exception as e: print(f"⚠️ [FSWatcher] Error en suscriptor: {e}")
+
+    # --------------------------------- Sondeo -------------------------------
+
+    def _snapshot(self):
+        files = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not entry.is_file() or self._is_temp(entry.path): continue
+                    try:
+                        stat = entry.stat()
+                        files[entry.path] = (stat.st_mtime, stat.st_size)
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"⚠️ [FSWatcher] No se pudo leer {self.directory}: {e}")
+        return files
+
+    def _poll_loop(self, generation):
+        previous = self._snapshot()
+        changed = set()
+        while self._generation == generation:
+            time.sleep(self.POLL_INTERVAL)
+            if self._generation != generation: break
+            current = self._snapshot()
+            for path, sig in current.items():
+                if previous.get(path) != sig: changed.add(path)
+                elif path in changed:
+                    # Sin cambios desde el sondeo anterior: escritura terminada
+                    changed.discard(path)
+                    self._on_ready(path)
+            changed &= set(current)
+            previous = current
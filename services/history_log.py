@@ -0,0 +1,112 @@
+import json
+from ms_graph_client import MSGraphClient
+
+
+class HistoryLog:
+    """
+    Historial sobre una columna de texto de SharePoint, guardado como UN documento JSON.
+
+    - El formato no cambia: lista JSON o {"history": [...]} (se respeta el que ya tenga la
+      columna). Los clientes ya desplegados hacen json.loads de la columna entera; si no
+      pudieran leerla, reescribirían una lista de un solo evento y borrarían el historial.
+    - Las columnas en JSON Lines (escritas por versiones intermedias) se leen y se
+      reescriben como lista al siguiente evento.
+    - La escritura relee la columna con su eTag y hace PATCH con If-Match; si otro
+      escritor ganó la carrera (412) se vuelve a fusionar sobre el valor nuevo.
+    - Un valor que no se puede interpretar no se sobrescribe nunca.
+    """
+
+    MAX_MERGE_RETRIES = 3
+
+    def __init__(self):
+        self.client = MSGraphClient()
+
+    # ------------------------------ Codificación ----------------------------
+
+    @staticmethod
+    def _decode(raw):
+        """Retorna (contenedor, lista de eventos) o (None, None) si no es un historial legible."""
+        s = str(raw or "").strip()
+        if not s: return None, []
+        try:
+            data = json.loads(s)
+        except ValueError:
+            return None, HistoryLog._decode_lines(s)
+        if isinstance(data, list): return None, data
+        if isinstance(data, dict):
+            key = "changes" if "changes" in data and "history" not in data else "history"
+            events = data.get(key) or []
+            return (data, key), events if isinstance(events, list) else None
+        return None, None
+
+    @staticmethod
+    def _decode_lines(s):
+        """JSON Lines (una entrada por línea; la primera puede ser el blob legado)."""
+        events = []
+        for line in s.split("\n"):
+            if not line.strip(): continue
+            try: data = json.loads(line)
+            except ValueError: return None
+            if isinstance(data, dict) and ("history" in data or "changes" in data):
+                data = data.get("history") or data.get("changes") or []
+            if isinstance(data, list): events.extend(data)
+            else: events.append(data)
+        return events
+
+    @staticmethod
+    def append_entry(raw, entry: dict, wrapper=None):
+        """
+        Nuevo valor de la columna con 'entry' al final, conservando su forma (lista o dict).
+        Una columna vacía se crea como lista, o como {wrapper: [...]} si se indica.
+        Retorna None si el valor actual no es un historial legible.
+        """
+        container, events = HistoryLog._decode(raw)
+        if events is None: return None
+        events = events + [entry]
+        if container:
+            data, key = container
+            return json.dumps({**data, key: events}, ensure_ascii=False)
+        if wrapper and not str(raw or "").strip(): return json.dumps({wrapper: events}, ensure_ascii=False)
+        return json.dumps(events, ensure_ascii=False)
+
+    @staticmethod
+    def read_recent(raw, limit=20) -> list:
+        """Las últimas 'limit' entradas (más reciente primero); None = todas."""
+        _, events = HistoryLog._decode(raw)
+        if not events: return []
+        recent = events[-limit:] if limit else events
+        return [e for e in reversed(recent) if isinstance(e, dict)]
+
+    # ------------------------------- Escritura ------------------------------
+
+    def append(self, item_endpoint: str, column: str, entry: dict, extra_fields: dict = None, wrapper=None):
+        """
+        Añade 'entry' a la columna del ítem ({item_endpoint} = .../lists/{list}/items/{id}).
+        extra_fields se escribe en el mismo PATCH, protegido por el mismo eTag.
+        wrapper: clave del dict con que se crea una columna vacía (ver append_entry).
+        Retorna el valor final de la columna o None si no se pudo escribir.
+        """
+        for attempt in range(self.MAX_MERGE_RETRIES):
+            current = self.client.get(f"{item_endpoint}?$select=id,eTag&$expand=fields($select={column})")
+            if current is None:
+                print(f"⚠️ [History] No se pudo leer el historial actual ({column}).")
+                return None
+
+            fields = current.get("fields", {})
+            etag = current.get("eTag") or fields.get("@odata.etag")
+            new_raw = self.append_entry(fields.get(column), entry, wrapper)
+            if new_raw is None:
+                print(f"❌ [History] {column} no es un historial JSON legible; no se sobrescribe.")
+                return None
+
+            payload = dict(extra_fields or {})
+            payload[column] = new_raw
+            headers = {"If-Match": etag} if etag else None
+            if self.client.patch(f"{item_endpoint}/fields", payload, extra_headers=headers) is not None:
+                return new_raw
+
+            if self.client.last_error_code != 412: return None
+            print(f"🔄 [History] Escritura concurrente detectada. Fusionando de nuevo ({attempt + 1}/{self.MAX_MERGE_RETRIES})...")
+
+        print(f"❌ [History] No se pudo añadir la entrada tras {self.MAX_MERGE_RETRIES} intentos.")
+        return None
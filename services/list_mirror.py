@@ -0,0 +1,138 @@
+import time
+import threading
+from ms_graph_client import MSGraphClient
+
+
+class ListMirror:
+    """
+    Base para copias locales de listas de SharePoint sincronizadas por delta.
+
+    - Primera sincronización: items/delta completo (siguiendo @odata.nextLink).
+    - Siguientes: solo los cambios desde el último @odata.deltaLink; si el deltaLink
+      es rechazado se recarga todo.
+    - Las subclases mantienen sus índices en _clear_locked / _upsert_locked / _remove_locked
+      (siempre invocados con self._lock tomado).
+    Una instancia por lista en todo el proceso (ver get()).
+    """
+
+    REFRESH_SECONDS = 60
+    PAGE_SIZE = 999
+    LABEL = "ListMirror"
+
+    _instances = {}
+    _registry_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, site_id, list_id, *args):
+        with ListMirror._registry_lock:
+            key = (cls.__name__, list_id)
+            if key not in ListMirror._instances:
+                ListMirror._instances[key] = cls(site_id, list_id, *args)
+            return ListMirror._instances[key]
+
+    def __init__(self, site_id, list_id):
+        self.client = MSGraphClient()
+        self.site_id = site_id
+        self.list_id = list_id
+        self._items: dict[str, dict] = {}
+
+        self._delta_link = None
+        self._last_sync = 0.0
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._ready = threading.Event()
+
+    # ------------------------------- Sincronización -------------------------
+
+    @property
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def _initial_endpoint(self):
+        return f"/sites/{self.site_id}/lists/{self.list_id}/items/delta?expand=fields&$top={self.PAGE_SIZE}"
+
+    def ensure_loaded(self, wait_seconds=0):
+        """Dispara la carga/refresco en segundo plano si toca; opcionalmente espera a que esté lista."""
+        if not self.is_ready or time.time() - self._last_sync > self.REFRESH_SECONDS:
+            threading.Thread(target=self.sync, daemon=True).start()
+        if wait_seconds: self._ready.wait(wait_seconds)
+        return self.is_ready
+
+    def sync(self, wait=False):
+        """
+        Carga completa la primera vez; después solo el delta. Retorna True si quedó sincronizada.
+        Con wait=True espera a que termine una sincronización en curso y aplica el delta de todos modos.
+        """
+        if not self._sync_lock.acquire(blocking=wait): return self.is_ready
+        try:
+            t0 = time.perf_counter()
+            full = self._delta_link is None
+            data = self.client.get(self._delta_link or self._initial_endpoint())
+            if data is None and not full:
+                # deltaLink expirado o rechazado: recarga completa
+                print(f"⚠️ [{self.LABEL}] Delta rechazado. Recargando lista completa...")
+                self._delta_link = None
+                full = True
+                data = self.client.get(self._initial_endpoint())
+            if data is None: return self.is_ready
+
+            changes, delta_link = [], None
+            while data:
+                changes.extend(data.get('value', []))
+                delta_link = data.get('@odata.deltaLink') or delta_link
+                next_link = data.get('@odata.nextLink')
+                if not next_link: break
+                data = self.client.get(next_link)
+                if data is None: return self.is_ready  # página perdida: no avanzamos el deltaLink
+
+            with self._lock:
+                if full:
+                    self._items.clear()
+                    self._clear_locked()
+                for item in changes:
+                    if item.get('deleted'): self._remove_item_locked(item.get('id'))
+                    else: self._upsert_item_locked(item)
+                self._delta_link = delta_link
+                self._last_sync = time.time()
+            self._ready.set()
+
+            ms = (time.perf_counter() - t0) * 1000
+            label = "completa" if full else "delta"
+            print(f"⏱️ [{self.LABEL}] Sync {label}: {len(changes)} cambios, {len(self._items)} ítems en {ms:.0f}ms")
+            return True
+        except Exception as e:
+            print(f"⚠️ [{self.LABEL}] Error sincronizando: {e}")
+            return self.is_ready
+        finally:
+            self._sync_lock.release()
+
+    def apply_local_update(self, item_id, fields: dict):
+        """Refleja una escritura propia sin esperar al próximo delta."""
+        with self._lock:
+            item = self._items.get(item_id)
+            if not item: return
+            updated = dict(item)
+            updated['fields'] = {**item.get('fields', {}), **fields}
+            self._upsert_item_locked(updated)
+
+    def get_item(self, item_id):
+        with self._lock:
+            return self._items.get(item_id)
+
+    # ------------------------------- Índices --------------------------------
+
+    def _upsert_item_locked(self, item):
+        item_id = item.get('id')
+        if not item_id: return
+        if item_id in self._items: self._remove_item_locked(item_id)
+        self._items[item_id] = item
+        self._upsert_locked(item_id, item.get('fields') or {})
+
+    def _remove_item_locked(self, item_id):
+        item = self._items.pop(item_id, None)
+        if item is None: return
+        self._remove_locked(item_id, item.get('fields') or {})
+
+    def _clear_locked(self): pass
+    def _upsert_locked(self, item_id, fields): pass
+    def _remove_locked(self, item_id, fields): pass
@@ -1,7 +1,7 @@
-import pandas as pd
 import io
 import os
 from ms_graph_client import MSGraphClient
+from services.sharepoint_resolver import SharePointResolver
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,23 +14,10 @@ class LocationService:
         self.file_path = os.getenv('LOCATIONS_FILE_PATH', 'General/locations.xlsx')
         self.valid_locations = set()
         self.locations_db = [] # Lista para guardar objetos {code, display}
-        self.drive_id = None
 
     def _get_drive_id(self):
-        if self.drive_id: return self.drive_id
-        
-        endpoint = f"/sites/{self.site_id}/drives"
-        drives = self.client.get(endpoint)
-        
-        if not drives: return None
-
-        for drive in drives.get('value', []):
-            if drive['name'] in ["Documents", "Shared Documents", "Documentos"]:
-                self.drive_id = drive['id']
-                return self.drive_id
-        
-        self.drive_id = drives['value'][0]['id']
-        return self.drive_id
+        # Sin copia en la instancia: el resolver cachea el ID y lo invalida ante un 404
+        return SharePointResolver().get_drive_id(self.site_id)
 
     def load_locations(self):
         """Descarga el Excel desde SharePoint y extrae Código (Col A) y Nombre (Col B)."""
@@ -51,12 +38,8 @@ class LocationService:
             return
 
         try:
-            # Leemos el Excel desde los bytes en memoria
-<<<<<<< HEAD
-=======
-            # CAMBIO CRÍTICO: Especificamos sheet_name="Locations" para robustez.
-            # Esto permite agregar otras hojas al Excel sin romper la lógica.
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
+            # Leemos el Excel desde los bytes en memoria (pandas se importa al primer uso: pesa en el arranque)
+            import pandas as pd
             df = pd.read_excel(io.BytesIO(content_bytes), sheet_name="Locations")
             
             self.valid_locations = set()
@@ -97,7 +80,6 @@ class LocationService:
         except Exception as e:
             print(f"❌ Error procesando el Excel de ubicaciones: {e}")
 
-<<<<<<< HEAD
     def get_locations_for_generation(self):
         """
         Lee el Excel completo para generar las timecards.
@@ -115,6 +97,7 @@ class LocationService:
 
         try:
             # Leemos buscando encabezados específicos
+            import pandas as pd
             df = pd.read_excel(io.BytesIO(content_bytes), sheet_name="Locations")
             
             # Normalizar columnas (strip spaces)
@@ -155,8 +138,6 @@ class LocationService:
             print(f"❌ Error leyendo ubicaciones para generación: {e}")
             return []
 
-=======
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
     def is_valid(self, location_code):
         if not location_code: return False
         # Si la lista está vacía (error de carga), asumimos todo válido para no bloquear trabajo
@@ -0,0 +1,120 @@
+import os
+import json
+import threading
+
+
+class OfflineJournal:
+    """
+    Journal append-only en disco (JSON Lines) para registros pendientes de subir.
+
+    - append() escribe un lote de líneas y hace fsync una sola vez por lote.
+    - snapshot() devuelve los registros y el offset leído; commit(offset) compacta el
+      archivo descartando ese prefijo (lo añadido después del snapshot se conserva).
+    - Si el archivo supera max_bytes se compacta: primero con 'reducer' (p. ej. agregar
+      por firma) y, si aún no cabe, descartando los registros más antiguos. Mientras haya
+      un snapshot sin commit la compactación se pospone (el offset debe seguir siendo válido).
+    - Una línea final truncada (caída a mitad de escritura) se ignora al leer.
+    Seguro entre hilos del mismo proceso (un lock por instancia).
+    """
+
+    def __init__(self, path, max_bytes=1_000_000, reducer=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.reducer = reducer
+        self._lock = threading.Lock()
+        self._snapshot_open = False
+
+    # ------------------------------- Escritura ------------------------------
+
+    def append(self, records):
+        if not records: return
+        data = self._encode(records)
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                if self._ends_truncated_locked(): data = b"\n" + data
+                with open(self.path, 'ab') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if not self._snapshot_open and os.path.getsize(self.path) > self.max_bytes: self._enforce_cap_locked()
+            except Exception as e:
+                print(f"⚠️ [Journal] No se pudo escribir en {os.path.basename(self.path)}: {e}")
+
+    def commit(self, offset):
+        """Descarta los registros hasta 'offset' (ya subidos) reescribiendo solo el resto."""
+        with self._lock:
+            self._snapshot_open = False
+            try:
+                if not os.path.exists(self.path): return
+                with open(self.path, 'rb') as f:
+                    f.seek(offset)
+                    tail = f.read()
+                self._rewrite_locked(tail)
+                if len(tail) > self.max_bytes: self._enforce_cap_locked()
+            except Exception as e:
+                print(f"⚠️ [Journal] No se pudo compactar {os.path.basename(self.path)}: {e}")
+
+    # -------------------------------- Lectura -------------------------------
+
+    def snapshot(self):
+        """
+        Retorna (registros, offset). El offset apunta al final de la última línea completa.
+        Tras subir los registros hay que llamar a commit(offset) (o release() si la subida falló).
+        """
+        with self._lock:
+            self._snapshot_open = True
+            return self._read_locked()
+
+    def release(self):
+        """Cierra un snapshot sin descartar nada."""
+        with self._lock:
+            self._snapshot_open = False
+
+    def is_empty(self):
+        with self._lock:
+            return not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+
+    # ------------------------------- Internos -------------------------------
+
+    def _read_locked(self):
+        if not os.path.exists(self.path): return [], 0
+        with open(self.path, 'rb') as f: raw = f.read()
+        end = raw.rfind(b"\n") + 1  # sin la línea truncada final (si la hay)
+        records = []
+        for line in raw[:end].splitlines():
+            if not line.strip(): continue
+            try: records.append(json.loads(line))
+            except ValueError: continue
+        return records, end
+
+    def _ends_truncated_locked(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0: return False
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def _rewrite_locked(self, data: bytes):
+        if not data:
+            if os.path.exists(self.path): os.remove(self.path)
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _encode(self, records):
+        return "".join(json.dumps(r, separators=(",", ":"), ensure_ascii=False, default=str) + "\n" for r in records).encode('utf-8')
+
+    def _enforce_cap_locked(self):
+        records, _ = self._read_locked()
+        before = len(records)
+        if self.reducer: records = self.reducer(records)
+        data = self._encode(records)
+        while records and len(data) > self.max_bytes:
+            records = records[len(records) // 4 or 1:]  # descarta el cuarto más antiguo
+            data = self._encode(records)
+        self._rewrite_locked(data)
+        print(f"🧹 [Journal] {os.path.basename(self.path)} compactado: {before} -> {len(records)} registros.")
@@ -63,4 +63,23 @@ class PathManager:
     @staticmethod
     def get_notifications_history_path():
         """Ruta local para historial de notificaciones"""
-        return os.path.join(PathManager.get_local_data_dir(), "notifications_history.json")
\ No newline at end of file
+        return os.path.join(PathManager.get_local_data_dir(), "notifications_history.json")
+    @staticmethod
+    def get_pending_writes_path(queue_name):
+        """Ruta local para escrituras a SharePoint aún no enviadas (write-behind)"""
+        return os.path.join(PathManager.get_local_data_dir(), f"pending_writes_{queue_name}.json")
+
+    @staticmethod
+    def get_error_journal_path():
+        """Ruta local para el journal (JSON Lines) de errores pendientes de subir"""
+        return os.path.join(PathManager.get_local_data_dir(), "pending_errors.jsonl")
+
+    @staticmethod
+    def get_auth_record_path():
+        """Ruta local para el AuthenticationRecord (cuenta del último login; sin secretos)"""
+        return os.path.join(PathManager.get_local_data_dir(), "auth_record.json")
+
+    @staticmethod
+    def get_sharepoint_ids_cache_path():
+        """Ruta local para el caché de IDs de SharePoint (listas, columnas, drives)"""
+        return os.path.join(PathManager.get_local_data_dir(), "sharepoint_ids_cache.json")
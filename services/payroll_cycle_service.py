@@ -1,24 +1,16 @@
 import os
-<<<<<<< HEAD
 import threading
 from datetime import datetime, timedelta, timezone
 from ms_graph_client import MSGraphClient
+from services.sharepoint_resolver import SharePointResolver
 # NUEVOS IMPORTS para la generación automática
 from services.location_service import LocationService
 from services.timecard_service import TimecardService
-=======
-from datetime import datetime, timedelta, timezone
-from ms_graph_client import MSGraphClient
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
 
 class PayrollCycleService:
     """
     Servicio dedicado a la gestión del ciclo de vida de la nómina.
-<<<<<<< HEAD
     Responsabilidad (SRP): Calcular fechas, cerrar ciclo y generar nuevos ítems de seguimiento.
-=======
-    Responsabilidad (SRP): Calcular fechas y actualizar la lista de configuración en SharePoint.
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
     """
     def __init__(self):
         self.client = MSGraphClient()
@@ -26,6 +18,10 @@ class PayrollCycleService:
         # Nombre exacto de la lista de configuración
         self.config_list_name = "Config_Payroll_Date" 
 
+    @property
+    def config_list_ref(self):
+        return SharePointResolver().list_ref(self.config_list_name, self.site_id)
+
     def get_pay_group_from_env(self) -> str:
         """
         Extrae el PayGroup (ej: 'VGH-VGI') basado en la ruta de carpetas configurada.
@@ -52,18 +48,13 @@ class PayrollCycleService:
         except ValueError:
             return datetime.now() # Fallback seguro
 
-    def execute_cycle_closure(self, current_date_str: str, next_date_str: str, closing_user_name: str):
+    def execute_cycle_closure(self, current_date_str: str, next_date_str: str, closing_user_name: str,
+                              on_generation_progress=None, on_generation_done=None):
         """
-<<<<<<< HEAD
         Orquesta el cierre del ciclo actual y la apertura del siguiente.
-        La generación de Timecards se dispara de forma ASÍNCRONA (Fire & Forget)
-        para no bloquear la interfaz de usuario.
-=======
-        Orquesta el cierre del ciclo actual y la apertura del siguiente MANUALMENTE seleccionado.
-        1. Busca el ítem del ciclo actual.
-        2. Actualiza (Cierra) el ciclo actual.
-        3. Crea el nuevo ciclo con la fecha provista por el usuario.
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
+        La generación de Timecards corre en segundo plano para no bloquear la UI;
+        on_generation_progress(done, total) y on_generation_done(date, report) permiten a la UI
+        mostrar el avance y el resultado final (creadas / omitidas / fallidas).
         """
         print(f"🔄 Iniciando cierre de ciclo: {current_date_str} -> Siguiente: {next_date_str}")
         pay_group = self.get_pay_group_from_env()
@@ -73,7 +64,7 @@ class PayrollCycleService:
 
         # 1. Buscar el ítem correspondiente al ciclo actual
         endpoint_query = (
-            f"/sites/{self.site_id}/lists/{self.config_list_name}/items"
+            f"/sites/{self.site_id}/lists/{self.config_list_ref}/items"
             f"?expand=fields&$filter=fields/PayGroup eq '{pay_group}' and fields/ActiveDate eq '{current_date_str}'"
         )
         headers = {"Prefer": "HonorNonIndexedQueriesWarningMayFailRandomly"}
@@ -91,7 +82,7 @@ class PayrollCycleService:
                 "ClosingTime": now_iso,
                 "ClosingUser": closing_user_name
             }
-            patch_url = f"/sites/{self.site_id}/lists/{self.config_list_name}/items/{current_item_id}/fields"
+            patch_url = f"/sites/{self.site_id}/lists/{self.config_list_ref}/items/{current_item_id}/fields"
             if not self.client.patch(patch_url, close_payload):
                 return {"success": False, "message": "Failed to update closing info in SharePoint."}
             print(f"✅ Ciclo {current_date_str} cerrado correctamente.")
@@ -106,11 +97,10 @@ class PayrollCycleService:
                 "ActiveDate": next_date_str
             }
         }
-        create_url = f"/sites/{self.site_id}/lists/{self.config_list_name}/items"
+        create_url = f"/sites/{self.site_id}/lists/{self.config_list_ref}/items"
         create_result = self.client.post(create_url, create_payload)
         
         if create_result and 'id' in create_result:
-<<<<<<< HEAD
             # --- INTEGRACIÓN ASÍNCRONA: Generación Automática de Timecards ---
             # Definimos la tarea que correrá en segundo plano
             def background_gen_task(date_str):
@@ -123,14 +113,20 @@ class PayrollCycleService:
                     locs_for_gen = loc_service.get_locations_for_generation()
                     
                     if locs_for_gen:
-                        # B. Crear filas masivamente
-                        count = tc_service.generate_cycle_timecards(date_str, locs_for_gen)
-                        print(f"✅ [Background] Generación finalizada: {count} timecards creadas.")
+                        # B. Crear filas masivamente (batch + paralelo, idempotente)
+                        report = tc_service.generate_cycle_timecards(date_str, locs_for_gen, progress_callback=on_generation_progress)
+                        print(f"✅ [Background] Generación finalizada: {report['created']} timecards creadas.")
                     else:
                         print("⚠️ [Background] No locations found for generation.")
+                        report = {"total": 0, "created": 0, "skipped": 0, "failed": [], "error": "No locations found for generation."}
                         
                 except Exception as e:
                     print(f"❌ [Background] Error crítico en generación automática: {e}")
+                    report = {"total": 0, "created": 0, "skipped": 0, "failed": [], "error": str(e)}
+
+                if on_generation_done:
+                    try: on_generation_done(date_str, report)
+                    except Exception as cb_err: print(f"⚠️ [Background] Error notificando resultado: {cb_err}")
 
             # Lanzamos el hilo "Fire & Forget"
             threading.Thread(target=background_gen_task, args=(next_date_str,), daemon=True).start()
@@ -139,11 +135,6 @@ class PayrollCycleService:
             return {
                 "success": True, 
                 "message": f"Closed {current_date_str}. Created {next_date_str}. (Generating cards in background...)",
-=======
-            return {
-                "success": True, 
-                "message": f"Closed {current_date_str}. Created {next_date_str}.",
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                 "next_cycle": next_date_str
             }
         else:
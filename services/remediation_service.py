@@ -1,38 +1,56 @@
 import os
+import time
+import threading
 import urllib.parse
 from ms_graph_client import MSGraphClient
-<<<<<<< HEAD
 from services.error_logger_service import ErrorLoggerService
-=======
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
+from services.sharepoint_resolver import SharePointResolver
+from services.tracker_index import TrackerIndex
 
 class RemediationService:
+    # Operaciones masivas: envelopes $batch en paralelo
+    BULK_CONCURRENCY = 4
+    BULK_ACTIONS = ("block", "relocate", "change_cycle")
+
     def __init__(self, reader):
         self.client = MSGraphClient()
         self.reader = reader 
         self.site_id = os.getenv('SHAREPOINT_SITE_ID')
         self.list_name = "Email Conversation Tracker"
-<<<<<<< HEAD
         self.logger = ErrorLoggerService()
-=======
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
+        # El índice del tracker se carga en segundo plano para que la primera acción no espere
+        threading.Thread(target=TrackerIndex.ready, args=(self.site_id,), daemon=True).start()
 
-    def _find_tracker_item_id(self, conversation_id):
+    @property
+    def list_ref(self):
+        return SharePointResolver().list_ref(self.list_name, self.site_id)
+
+    def _find_tracker_item(self, conversation_id):
+        """Ítem del tracker (con fields) por ConversationID: índice local, o $filter remoto si no está listo."""
         if not conversation_id: return None
-        safe_id = conversation_id.replace("'", "''") 
-        endpoint = f"/sites/{self.site_id}/lists/{self.list_name}/items?filter=fields/Title eq '{safe_id}'"
+        index = TrackerIndex.ready(self.site_id)
+        if index is not None: return index.find_by_conversation(conversation_id)
+        endpoint = f"{self._tracker_query_url(conversation_id)}&$top=1"
         headers = {"Prefer": "HonorNonIndexedQueriesWarningMayFailRandomly"}
         data = self.client.get(endpoint, extra_headers=headers)
         if data and 'value' in data and len(data['value']) > 0:
-            return data['value'][0]['id']
+            return data['value'][0]
         return None
 
+    def _find_tracker_item_id(self, conversation_id):
+        item = self._find_tracker_item(conversation_id)
+        return item['id'] if item else None
+
+    def _note_tracker_write(self, item_id, fields):
+        """Refleja en el índice local una escritura propia confirmada."""
+        index = TrackerIndex.for_site(self.site_id)
+        if index: index.apply_local_update(item_id, fields)
+
     def _clean_sharepoint_path(self, full_path):
         clean = full_path.replace("/Shared Documents/", "").strip("/")
         clean = clean.replace("Shared Documents/", "")
         return clean
 
-<<<<<<< HEAD
     def _log_logical_error(self, message, method_name):
         print(f"❌ Error Lógico: {message}")
         fake_exception = Exception(message)
@@ -42,17 +60,118 @@ class RemediationService:
         if override: return override.strip("/")
         return os.getenv('TARGET_FOLDER_PATH').strip("/")
 
+    # --- CACHÉ RUTA -> ID Y OPERACIONES EN LOTE ---
+
+    def _drive_path_url(self, drive_id, path):
+        return f"/sites/{self.site_id}/drives/{drive_id}/root:/{urllib.parse.quote(path.strip('/'))}"
+
+    def _tracker_query_url(self, conversation_id):
+        safe_id = conversation_id.replace("'", "''")
+        filter_expr = urllib.parse.quote(f"fields/Title eq '{safe_id}'", safe="/'")
+        return f"/sites/{self.site_id}/lists/{urllib.parse.quote(self.list_ref)}/items?$filter={filter_expr}&expand=fields"
+
+    def _lookup_tracker_and_paths(self, conversation_id, paths):
+        """
+        Un solo round trip ($batch): ítem del tracker (con fields) + IDs de las rutas que
+        no estén en el caché ruta->ID. Si el índice local del tracker está listo, el ítem
+        sale de memoria y el $batch solo lleva las rutas.
+        Retorna (tracker_item | None, {ruta: id | None}).
+        """
+        resolver = SharePointResolver()
+        drive_id = self.reader._get_drive_id()
+        resolved = {}
+        sub_requests, slots = [], []
+
+        tracker_item = None
+        index = TrackerIndex.ready(self.site_id) if conversation_id else None
+        if index is not None:
+            tracker_item = index.find_by_conversation(conversation_id)
+        elif conversation_id:
+            sub_requests.append({"method": "GET", "url": self._tracker_query_url(conversation_id),
+                                 "headers": {"Prefer": "HonorNonIndexedQueriesWarningMayFailRandomly"}})
+            slots.append(("tracker", None))
+        for path in paths:
+            if not path or path in resolved: continue
+            cached = resolver.get_cached_path_id(path, self.site_id)
+            if cached: resolved[path] = cached; continue
+            resolved[path] = None
+            sub_requests.append({"method": "GET", "url": f"{self._drive_path_url(drive_id, path)}?$select=id"})
+            slots.append(("path", path))
+
+        if sub_requests:
+            for (kind, path), sub in zip(slots, self.client.send_batch(sub_requests)):
+                body = (sub or {}).get('body') or {}
+                if (sub or {}).get('status') != 200: continue
+                if kind == "tracker":
+                    values = body.get('value') or []
+                    tracker_item = values[0] if values else None
+                elif body.get('id'):
+                    resolved[path] = body['id']
+                    resolver.remember_path(path, body['id'], self.site_id)
+        return tracker_item, resolved
+
+    def _create_folder_chain(self, base_path, names):
+        """
+        Crea en un solo $batch las carpetas faltantes base_path/names[0]/names[1]/...
+        Cada creación direcciona a su padre por ruta y depende de la anterior (dependsOn).
+        Con conflictBehavior=fail: si la carpeta ya existe (409) se retorna None y el llamador
+        relee la ruta; "rename" crearía 'LOC 1' y el caché asociaría la ruta 'LOC' a otra carpeta.
+        Retorna el ID de la última carpeta o None.
+        """
+        drive_id = self.reader._get_drive_id()
+        if not drive_id or not names: return None
+        sub_requests = []
+        parent = base_path.strip("/")
+        for idx, name in enumerate(names):
+            sub_requests.append({
+                "method": "POST",
+                "url": f"{self._drive_path_url(drive_id, parent)}:/children",
+                "body": {"name": str(name), "folder": {}, "@microsoft.graph.conflictBehavior": "fail"},
+                "depends_on": idx - 1 if idx else None,
+            })
+            parent = f"{parent}/{name}"
+
+        responses = self.client.send_batch(sub_requests)
+        resolver = SharePointResolver()
+        path, last_id = base_path.strip("/"), None
+        for idx, name in enumerate(names):
+            path = f"{path}/{name}"
+            sub = responses[idx] or {}
+            body = sub.get('body') or {}
+            if sub.get('status') not in (200, 201) or not body.get('id') or body.get('name') != str(name): return None
+            last_id = body['id']
+            resolver.remember_path(path, last_id, self.site_id)
+        return last_id
+
+    def _move_and_update_tracker(self, folder_id, new_parent_id, item_id, tracker_fields):
+        """
+        Un solo round trip ($batch): mover la carpeta y actualizar el tracker.
+        El PATCH del tracker depende del movimiento (dependsOn): si el movimiento falla, Graph
+        responde 424 y el tracker no se toca. Retorna (move_ok, fields_ok).
+        """
+        drive_id = self.reader._get_drive_id()
+        moving = bool(folder_id and new_parent_id)
+        sub_requests = []
+        if moving:
+            sub_requests.append({"method": "PATCH", "url": f"/sites/{self.site_id}/drives/{drive_id}/items/{folder_id}",
+                                 "body": {"parentReference": {"id": new_parent_id}}})
+        sub_requests.append({"method": "PATCH", "url": f"/sites/{self.site_id}/lists/{urllib.parse.quote(self.list_ref)}/items/{item_id}/fields",
+                             "body": tracker_fields, "depends_on": 0 if moving else None})
+        responses = self.client.send_batch(sub_requests)
+        ok = [bool(r) and r.get('status') in (200, 201, 204) for r in responses]
+        move_ok = ok[0] if moving else False
+        if move_ok: SharePointResolver().forget_item(folder_id)
+        elif moving and (responses[0] or {}).get('status') == 404:
+            # El ID destino pudo salir del caché ruta->ID persistido y ya no existir (carpeta borrada)
+            print("🔄 [Remediation] Destino no encontrado. Se descarta su ID cacheado.")
+            SharePointResolver().forget_item(new_parent_id)
+        if ok[-1]: self._note_tracker_write(item_id, tracker_fields)
+        return move_ok, ok[-1]
+
     def get_folders_in_location(self, date_folder_name, location_code, root_path_override=None):
         print(f"📂 Listando carpetas en: {date_folder_name}/{location_code}")
         drive_id = self.reader._get_drive_id()
         root_path = self._get_root_path(root_path_override)
-=======
-    def get_folders_in_location(self, date_folder_name, location_code):
-        """Devuelve una lista de nombres de carpetas dentro de una Ubicación/Fecha específica."""
-        print(f"📂 Listando carpetas en: {date_folder_name}/{location_code}")
-        drive_id = self.reader._get_drive_id()
-        root_path = os.getenv('TARGET_FOLDER_PATH').strip("/")
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         target_path = f"{root_path}/{date_folder_name}/{location_code}"
         endpoint = f"/sites/{self.site_id}/drives/{drive_id}/root:/{target_path}:/children"
         data = self.client.get(endpoint)
@@ -64,107 +183,78 @@ class RemediationService:
                     folders.append({"name": item['name'], "id": item['id']})
         return folders
 
-<<<<<<< HEAD
     def delete_location_if_empty(self, date_folder, location_code, root_path_override=None):
         try:
             drive_id = self.reader._get_drive_id()
             root_path = self._get_root_path(root_path_override)
             loc_path = f"{root_path}/{date_folder}/{location_code}"
             
-            endpoint = f"/sites/{self.site_id}/drives/{drive_id}/root:/{loc_path}:/children"
-            data = self.client.get(endpoint)
-            
-            if data and 'value' in data and len(data['value']) == 0:
-                print(f"🧹 Ubicación {location_code} está vacía. Eliminando carpeta...")
-=======
-    # --- LÓGICA DE LIMPIEZA AUTOMÁTICA (SoC) ---
-    def delete_location_if_empty(self, date_folder, location_code):
-        """
-        Verifica si una carpeta de ubicación quedó vacía y la elimina.
-        Útil para mantener SharePoint limpio tras mover o borrar solicitudes.
-        """
-        try:
-            drive_id = self.reader._get_drive_id()
-            root_path = os.getenv('TARGET_FOLDER_PATH').strip("/")
-            # Ruta a la carpeta de la ubicación (ej: Emails/20251212/847)
-            loc_path = f"{root_path}/{date_folder}/{location_code}"
-            
-            # 1. Obtener contenido de la carpeta de ubicación
-            endpoint = f"/sites/{self.site_id}/drives/{drive_id}/root:/{loc_path}:/children"
-            data = self.client.get(endpoint)
-            
-            # 2. Si no hay ítems, borrar la carpeta
-            if data and 'value' in data and len(data['value']) == 0:
+            # Una sola lectura: el facet 'folder' trae childCount junto con el ID
+            folder_meta = self.client.get(f"{self._drive_path_url(drive_id, loc_path)}?$select=id,folder")
+            if folder_meta and folder_meta.get('folder', {}).get('childCount') == 0:
                 print(f"🧹 Ubicación {location_code} está vacía. Eliminando carpeta...")
-                # Necesitamos el ID de la carpeta para borrarla de forma segura
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
-                folder_meta = self.client.get(f"/sites/{self.site_id}/drives/{drive_id}/root:/{loc_path}")
-                if folder_meta and 'id' in folder_meta:
-                    delete_url = f"/sites/{self.site_id}/drives/{drive_id}/items/{folder_meta['id']}"
-                    if self.client.delete(delete_url):
-                        print(f"✅ Carpeta de ubicación {location_code} eliminada exitosamente.")
-                        return True
+                delete_url = f"/sites/{self.site_id}/drives/{drive_id}/items/{folder_meta['id']}"
+                if self.client.delete(delete_url):
+                    SharePointResolver().forget_item(folder_meta['id'])
+                    print(f"✅ Carpeta de ubicación {location_code} eliminada exitosamente.")
+                    return True
             return False
         except Exception as e:
-<<<<<<< HEAD
             self._log_logical_error(f"Fallo en limpieza: {e}", "delete_location_if_empty")
             return False
 
     def block_and_delete(self, folder_id, conversation_id, date_folder=None, location_code=None, root_path_override=None):
-=======
-            print(f"⚠️ Error en limpieza de carpeta: {e}")
-            return False
-
-    def block_and_delete(self, folder_id, conversation_id, date_folder=None, location_code=None):
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         print(f"\n--- ACCIÓN: BLOCK & DELETE ---")
         success_list = False
         success_folder = False
         item_id = self._find_tracker_item_id(conversation_id)
         
         if item_id:
-            patch_url = f"/sites/{self.site_id}/lists/{self.list_name}/items/{item_id}/fields"
-            if self.client.patch(patch_url, {"Include": "NO"}): success_list = True
-<<<<<<< HEAD
+            patch_url = f"/sites/{self.site_id}/lists/{self.list_ref}/items/{item_id}/fields"
+            if self.client.patch(patch_url, {"Include": "NO"}):
+                success_list = True
+                self._note_tracker_write(item_id, {"Include": "NO"})
         else:
             self._log_logical_error(f"Tracker Item ID no encontrado para ConvID: {conversation_id}", "block_and_delete")
-=======
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             
         if folder_id:
             drive_id = self.reader._get_drive_id() 
             delete_url = f"/sites/{self.site_id}/drives/{drive_id}/items/{folder_id}"
             if self.client.delete(delete_url): success_folder = True
         
-<<<<<<< HEAD
         if (success_folder or success_list) and date_folder and location_code:
             self.delete_location_if_empty(date_folder, location_code, root_path_override)
             
         return success_folder or success_list
 
+    def _predict_parent_path(self, folder_id, date_folder, root_path_override):
+        """Ruta <root>/<fecha> donde vive la carpeta, sin red (índice del reader o parámetros)."""
+        entry = self.reader.get_folder_entry(folder_id) if folder_id else None
+        if entry and entry.path:
+            parts = entry.path.strip("/").split("/")
+            if len(parts) >= 3: return "/".join(parts[:-2])
+        if date_folder: return f"{self._get_root_path(root_path_override)}/{date_folder}"
+        return None
+
     def relocate_folder(self, folder_id, target_location_code, conversation_id, old_date_folder=None, old_location_code=None, root_path_override=None):
+        """
+        Mueve la carpeta a otra ubicación del mismo ciclo.
+        Round trip 1: tracker + ID del padre destino (en $batch, o desde el caché ruta->ID).
+        Round trip 2: mover carpeta + actualizar tracker (en $batch).
+        Solo si la carpeta de ubicación destino no existe se añade un $batch de creación.
+        """
         print(f"\n--- ACCIÓN: RELOCATE a {target_location_code} ---")
-        item_id = self._find_tracker_item_id(conversation_id)
-        if not item_id: 
+        date_path = self._predict_parent_path(folder_id, old_date_folder, root_path_override)
+        predicted_parent = f"{date_path}/{target_location_code}" if date_path and folder_id else None
+
+        tracker_item, resolved = self._lookup_tracker_and_paths(conversation_id, [predicted_parent])
+        if not tracker_item: 
             self._log_logical_error(f"Tracker Item no encontrado (ConvID: {conversation_id})", "relocate_folder")
             return False
-=======
-        # Intentar limpieza si se proveen los datos de ruta
-        if (success_folder or success_list) and date_folder and location_code:
-            self.delete_location_if_empty(date_folder, location_code)
-            
-        return success_folder or success_list
-
-    def relocate_folder(self, folder_id, target_location_code, conversation_id, old_date_folder=None, old_location_code=None):
-        print(f"\n--- ACCIÓN: RELOCATE a {target_location_code} ---")
-        item_id = self._find_tracker_item_id(conversation_id)
-        if not item_id: return False
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         
-        item_data = self.client.get(f"/sites/{self.site_id}/lists/{self.list_name}/items/{item_id}?expand=fields")
-        fields = item_data.get('fields', {})
+        item_id = tracker_item['id']
+        fields = tracker_item.get('fields', {})
         current_active_path = fields.get('ActiveFolderPath')
-<<<<<<< HEAD
         if not current_active_path: 
             self._log_logical_error("ActiveFolderPath vacío en SharePoint List", "relocate_folder")
             return False
@@ -173,72 +263,61 @@ class RemediationService:
         if len(parts) < 2: 
             self._log_logical_error(f"ActiveFolderPath mal formado: {current_active_path}", "relocate_folder")
             return False
-=======
-        if not current_active_path: return False
-        
-        parts = current_active_path.strip("/").split("/")
-        if len(parts) < 2: return False
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         
         parts[-2] = str(target_location_code)
         new_active_path = "/" + "/".join(parts)
         
-        new_parent_path_parts = parts[:-1]
-        grandparent_path_parts = parts[:-2]
-        relative_new_parent_path = self._clean_sharepoint_path("/".join(new_parent_path_parts))
-        relative_grandparent_path = self._clean_sharepoint_path("/".join(grandparent_path_parts))
+        relative_new_parent_path = self._clean_sharepoint_path("/".join(parts[:-1]))
+        relative_grandparent_path = self._clean_sharepoint_path("/".join(parts[:-2]))
         
-        success_move = False
+        new_parent_id = None
         if folder_id:
-            drive_id = self.reader._get_drive_id()
-            parent_endpoint = f"/sites/{self.site_id}/drives/{drive_id}/root:/{relative_new_parent_path}"
-            parent_data = self.client.get(parent_endpoint)
-            new_parent_id = None
-            if parent_data and 'id' in parent_data:
-                new_parent_id = parent_data['id']
-            else:
-                grandparent_endpoint = f"/sites/{self.site_id}/drives/{drive_id}/root:/{relative_grandparent_path}"
-                gp_data = self.client.get(grandparent_endpoint)
-                if gp_data and 'id' in gp_data:
-                    create_payload = {"name": str(target_location_code), "folder": {}, "@microsoft.graph.conflictBehavior": "rename"}
-                    create_url = f"/sites/{self.site_id}/drives/{drive_id}/items/{gp_data['id']}/children"
-                    create_resp = self.client.post(create_url, create_payload)
-                    if create_resp and 'id' in create_resp: new_parent_id = create_resp['id']
-            
-            if new_parent_id:
-                move_payload = {"parentReference": {"id": new_parent_id}}
-                if self.client.patch(f"/sites/{self.site_id}/drives/{drive_id}/items/{folder_id}", move_payload):
-                    success_move = True
-<<<<<<< HEAD
-            else:
+            new_parent_id = resolved.get(predicted_parent) if predicted_parent and predicted_parent.lower() == relative_new_parent_path.lower() else None
+            if not new_parent_id:
+                new_parent_id = SharePointResolver().get_item_id_by_path(relative_new_parent_path, self.site_id)
+            if not new_parent_id:
+                new_parent_id = self._create_folder_chain(relative_grandparent_path, [target_location_code])
+            # 409: la carpeta sí existía (el GET anterior falló de forma transitoria o la creó otra sesión)
+            if not new_parent_id:
+                new_parent_id = SharePointResolver().get_item_id_by_path(relative_new_parent_path, self.site_id)
+            if not new_parent_id:
                 self._log_logical_error("No se pudo determinar o crear el ID del folder padre destino", "relocate_folder")
-=======
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
+                return False
 
-        patch_url = f"/sites/{self.site_id}/lists/{self.list_name}/items/{item_id}/fields"
         update_payload = {"LocationCode": str(target_location_code), "ActiveFolderPath": new_active_path}
-        final_success = self.client.patch(patch_url, update_payload)
+        success_move, final_success = self._move_and_update_tracker(folder_id, new_parent_id, item_id, update_payload)
+        if folder_id and not success_move:
+            self._log_logical_error(f"No se pudo mover la carpeta {folder_id}", "relocate_folder")
+            return False
         
-<<<<<<< HEAD
         if final_success and old_date_folder and old_location_code:
             self.delete_location_if_empty(old_date_folder, old_location_code, root_path_override)
             
         return final_success
 
     def change_request_cycle(self, folder_id, target_date, location_code, conversation_id, old_date, root_path_override=None):
+        """
+        Mueve la solicitud a otro ciclo (<root>/<fecha>/<ubicación>).
+        Round trip 1: tracker + IDs de destino (ubicación y fecha) en $batch.
+        Si faltan carpetas, se crean fecha y ubicación en un único $batch encadenado.
+        Round trip final: mover carpeta + actualizar tracker (en $batch).
+        """
         print(f"\n--- ACCIÓN: CHANGE CYCLE a {target_date} ---")
         
         if not location_code or location_code == "???" or location_code == "None":
             self._log_logical_error(f"Location Code inválido ('{location_code}'). Usando fallback 'Unassigned'.", "change_request_cycle")
             location_code = "Unassigned"
 
-        item_id = self._find_tracker_item_id(conversation_id)
-        if not item_id: 
+        root_path = self._get_root_path(root_path_override)
+        predicted_date = f"{root_path}/{target_date}"
+        predicted_loc = f"{predicted_date}/{location_code}"
+        tracker_item, resolved = self._lookup_tracker_and_paths(conversation_id, [predicted_loc, predicted_date] if folder_id else [])
+        if not tracker_item: 
             self._log_logical_error(f"No se encontró el ítem en la lista de rastreo (ConvID: {conversation_id})", "change_request_cycle")
             return False
         
-        item_data = self.client.get(f"/sites/{self.site_id}/lists/{self.list_name}/items/{item_id}?expand=fields")
-        fields = item_data.get('fields', {})
+        item_id = tracker_item['id']
+        fields = tracker_item.get('fields', {})
         current_active_path = fields.get('ActiveFolderPath')
         
         if not current_active_path: 
@@ -253,125 +332,36 @@ class RemediationService:
         parts[-3] = str(target_date)
         new_active_path = "/" + "/".join(parts)
         
-        new_loc_parent_path_parts = parts[:-1]
-        relative_new_loc_path = self._clean_sharepoint_path("/".join(new_loc_parent_path_parts))
-        
-        new_date_parent_path_parts = parts[:-2]
-        relative_new_date_path = self._clean_sharepoint_path("/".join(new_date_parent_path_parts))
-        
-        root_parent_path_parts = parts[:-3]
-        relative_root_path = self._clean_sharepoint_path("/".join(root_parent_path_parts))
-
-=======
-        # Limpiar carpeta vieja si se movió con éxito
-        if final_success and old_date_folder and old_location_code:
-            self.delete_location_if_empty(old_date_folder, old_location_code)
-            
-        return final_success
+        relative_new_loc_path = self._clean_sharepoint_path("/".join(parts[:-1]))
+        relative_new_date_path = self._clean_sharepoint_path("/".join(parts[:-2]))
+        relative_root_path = self._clean_sharepoint_path("/".join(parts[:-3]))
 
-    def change_request_cycle(self, folder_id, target_date, location_code, conversation_id, old_date):
-        """Mueve la solicitud a un ciclo (carpeta de fecha) diferente."""
-        print(f"\n--- ACCIÓN: CHANGE CYCLE a {target_date} ---")
-        item_id = self._find_tracker_item_id(conversation_id)
-        if not item_id: return False
-        
-        # 1. Obtener path actual
-        item_data = self.client.get(f"/sites/{self.site_id}/lists/{self.list_name}/items/{item_id}?expand=fields")
-        fields = item_data.get('fields', {})
-        current_active_path = fields.get('ActiveFolderPath')
-        if not current_active_path: return False
-        
-        # Estructura esperada path: /.../DateFolder/LocationCode/RequestName
-        parts = current_active_path.strip("/").split("/")
-        if len(parts) < 3: return False
-        
-        # Reemplazamos la parte de la fecha (antepenúltimo elemento)
-        parts[-3] = str(target_date)
-        new_active_path = "/" + "/".join(parts)
-        
-        # El nuevo padre es la carpeta de Ubicación dentro de la Nueva Fecha
-        new_parent_path_parts = parts[:-1]
-        relative_new_parent_path = self._clean_sharepoint_path("/".join(new_parent_path_parts))
-        
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
-        success_move = False
+        new_parent_id = None
         if folder_id:
-            drive_id = self.reader._get_drive_id()
-            
-<<<<<<< HEAD
-            parent_endpoint = f"/sites/{self.site_id}/drives/{drive_id}/root:/{relative_new_loc_path}"
-=======
-            # Verificamos si existe el destino (Date/Loc)
-            parent_endpoint = f"/sites/{self.site_id}/drives/{drive_id}/root:/{relative_new_parent_path}"
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
-            parent_data = self.client.get(parent_endpoint)
-            new_parent_id = None
-            
-            if parent_data and 'id' in parent_data:
-                new_parent_id = parent_data['id']
-            else:
-<<<<<<< HEAD
-                date_endpoint = f"/sites/{self.site_id}/drives/{drive_id}/root:/{relative_new_date_path}"
-                date_data = self.client.get(date_endpoint)
-                
-                date_folder_id = None
-                
-                if date_data and 'id' in date_data:
-                    date_folder_id = date_data['id']
+            resolver = SharePointResolver()
+            def known(path, predicted):
+                if predicted.lower() == path.lower() and resolved.get(predicted): return resolved[predicted]
+                return resolver.get_item_id_by_path(path, self.site_id)
+
+            new_parent_id = known(relative_new_loc_path, predicted_loc)
+            if not new_parent_id:
+                if known(relative_new_date_path, predicted_date):
+                    new_parent_id = self._create_folder_chain(relative_new_date_path, [location_code])
                 else:
-                    root_endpoint = f"/sites/{self.site_id}/drives/{drive_id}/root:/{relative_root_path}"
-                    root_data = self.client.get(root_endpoint)
-                    
-                    if root_data and 'id' in root_data:
-                        create_date_payload = {"name": str(target_date), "folder": {}, "@microsoft.graph.conflictBehavior": "fail"}
-                        create_date_url = f"/sites/{self.site_id}/drives/{drive_id}/items/{root_data['id']}/children"
-                        create_date_resp = self.client.post(create_date_url, create_date_payload)
-                        if create_date_resp and 'id' in create_date_resp:
-                            date_folder_id = create_date_resp['id']
-                    
-                if date_folder_id:
-                    create_loc_payload = {"name": str(location_code), "folder": {}, "@microsoft.graph.conflictBehavior": "fail"}
-                    create_loc_url = f"/sites/{self.site_id}/drives/{drive_id}/items/{date_folder_id}/children"
-                    create_resp = self.client.post(create_loc_url, create_loc_payload)
-=======
-                # Si no existe la carpeta Loc en la nueva Fecha, intentamos crearla
-                # Obtenemos la carpeta de Fecha (abuelo)
-                grandparent_path_parts = parts[:-2]
-                relative_grandparent_path = self._clean_sharepoint_path("/".join(grandparent_path_parts))
-                gp_data = self.client.get(f"/sites/{self.site_id}/drives/{drive_id}/root:/{relative_grandparent_path}")
-                
-                if gp_data and 'id' in gp_data:
-                    create_payload = {"name": str(location_code), "folder": {}, "@microsoft.graph.conflictBehavior": "open"}
-                    create_url = f"/sites/{self.site_id}/drives/{drive_id}/items/{gp_data['id']}/children"
-                    create_resp = self.client.post(create_url, create_payload)
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
-                    if create_resp and 'id' in create_resp: 
-                        new_parent_id = create_resp['id']
+                    new_parent_id = self._create_folder_chain(relative_root_path, [target_date, location_code])
+            # 409: la carpeta ya existía; se relee por ruta
+            if not new_parent_id: new_parent_id = resolver.get_item_id_by_path(relative_new_loc_path, self.site_id)
             
-            if new_parent_id:
-<<<<<<< HEAD
-=======
-                # Movemos la carpeta
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
-                move_payload = {"parentReference": {"id": new_parent_id}}
-                if self.client.patch(f"/sites/{self.site_id}/drives/{drive_id}/items/{folder_id}", move_payload):
-                    success_move = True
-            else:
-<<<<<<< HEAD
+            if not new_parent_id:
                 self._log_logical_error("No se pudo determinar ni crear el ID de la carpeta destino", "change_request_cycle")
                 return False
 
-=======
-                print("❌ No se pudo encontrar ni crear la estructura del nuevo ciclo.")
-                return False
-
-        # Actualizamos la lista
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
-        patch_url = f"/sites/{self.site_id}/lists/{self.list_name}/items/{item_id}/fields"
         update_payload = {"ActiveFolderPath": new_active_path}
-        final_success = self.client.patch(patch_url, update_payload)
+        success_move, final_success = self._move_and_update_tracker(folder_id, new_parent_id, item_id, update_payload)
+        if folder_id and not success_move:
+            self._log_logical_error(f"No se pudo mover la carpeta {folder_id}", "change_request_cycle")
+            return False
         
-<<<<<<< HEAD
         if final_success and old_date:
             self.delete_location_if_empty(old_date, location_code, root_path_override)
             
@@ -382,18 +372,6 @@ class RemediationService:
         if not target_folder_id: 
             self._log_logical_error("Target Folder ID nulo", "merge_folders")
             return False
-=======
-        # Limpieza
-        if final_success and old_date:
-            self.delete_location_if_empty(old_date, location_code)
-            
-        return final_success
-
-    def merge_folders(self, source_folder_id, target_folder_id, target_folder_name, source_conversation_id, target_location_code, date_folder, source_location_code):
-        """Fusiona contenido y limpia origen."""
-        print(f"\n--- ACCIÓN: MERGE ---")
-        if not target_folder_id: return False
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
 
         drive_id = self.reader._get_drive_id()
         children_url = f"/sites/{self.site_id}/drives/{drive_id}/items/{source_folder_id}/children"
@@ -404,27 +382,218 @@ class RemediationService:
                 payload = {"parentReference": {"id": target_folder_id}, "name": item['name'], "@microsoft.graph.conflictBehavior": "rename"}
                 self.client.patch(f"/sites/{self.site_id}/drives/{drive_id}/items/{item['id']}", payload)
 
-        source_item_id = self._find_tracker_item_id(source_conversation_id)
-        if source_item_id:
-            source_data = self.client.get(f"/sites/{self.site_id}/lists/{self.list_name}/items/{source_item_id}?expand=fields")
-            old_path = source_data.get('fields', {}).get('ActiveFolderPath')
+        source_item = self._find_tracker_item(source_conversation_id)
+        if source_item:
+            source_item_id = source_item['id']
+            old_path = source_item.get('fields', {}).get('ActiveFolderPath')
             if old_path:
                 parts = old_path.strip("/").split("/")
                 if len(parts) >= 2:
                     parts[-2] = str(target_location_code)
                     parts[-1] = str(target_folder_name)
                     new_path = "/" + "/".join(parts)
-                    self.client.patch(f"/sites/{self.site_id}/lists/{self.list_name}/items/{source_item_id}/fields", {"ActiveFolderPath": new_path, "LocationCode": str(target_location_code)})
-<<<<<<< HEAD
+                    new_fields = {"ActiveFolderPath": new_path, "LocationCode": str(target_location_code)}
+                    if self.client.patch(f"/sites/{self.site_id}/lists/{self.list_ref}/items/{source_item_id}/fields", new_fields):
+                        self._note_tracker_write(source_item_id, new_fields)
         else:
              self._log_logical_error(f"No se encontró item tracker origen (ConvID: {source_conversation_id}) para actualizar path", "merge_folders")
 
         self.client.delete(f"/sites/{self.site_id}/drives/{drive_id}/items/{source_folder_id}")
         self.delete_location_if_empty(date_folder, source_location_code, root_path_override)
-=======
+        return True
 
-        # Borrar carpeta origen y luego verificar si la carpeta "Location" quedó vacía
-        self.client.delete(f"/sites/{self.site_id}/drives/{drive_id}/items/{source_folder_id}")
-        self.delete_location_if_empty(date_folder, source_location_code)
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
-        return True
\ No newline at end of file
+    # --- OPERACIONES MASIVAS ---
+
+    def bulk_remediate(self, requests, action, target_location=None, target_date=None, root_path_override=None):
+        """
+        Aplica la misma acción ('block', 'relocate' o 'change_cycle') a muchas solicitudes.
+        requests: [{'id', 'conversation_id', 'date_folder', 'location_code'}] (formato de requests_data_cache).
+        1) Plan: ítem del tracker de cada solicitud (índice local o $batch) y su ruta destino.
+        2) Carpetas destino: IDs desde el caché ruta->ID o en $batch; las que falten se crean una sola vez.
+        3) Ejecución: movimientos/borrados + PATCH del tracker en envelopes $batch concurrentes.
+        4) Limpieza: una sola pasada sobre las ubicaciones de origen que quedaron vacías.
+        Retorna {"succeeded": [ids], "failed": {id: motivo}}.
+        """
+        result = {"succeeded": [], "failed": {}}
+        requests = [r for r in requests if r and r.get('id')]
+        if not requests: return result
+        if action not in self.BULK_ACTIONS or (action == "relocate" and not target_location) or (action == "change_cycle" and not target_date):
+            self._log_logical_error(f"Acción masiva inválida: {action} (loc={target_location}, fecha={target_date})", "bulk_remediate")
+            result["failed"] = {r['id']: "Acción inválida" for r in requests}
+            return result
+
+        print(f"\n--- ACCIÓN MASIVA: {action.upper()} ({len(requests)} solicitudes) ---")
+        t0 = time.perf_counter()
+        tracker_items = self._bulk_tracker_items([r.get('conversation_id') for r in requests])
+        plans = []
+        for req in requests:
+            plan, reason = self._plan_bulk_item(req, tracker_items.get(req.get('conversation_id')), action, target_location, target_date)
+            if plan: plans.append(plan)
+            else: result["failed"][req['id']] = reason
+
+        folder_ids = self._ensure_folders([p["parent_path"] for p in plans if p["parent_path"] and p["folder_id"]])
+        outcome = self._execute_bulk_plans(plans, action, folder_ids)
+        for plan in plans:
+            req_id = plan["req"]['id']
+            if outcome.get(req_id) is True: result["succeeded"].append(req_id)
+            else: result["failed"][req_id] = outcome.get(req_id) or "Sin respuesta de SharePoint"
+
+        done = set(result["succeeded"])
+        locations = [(r.get('date_folder'), r.get('location_code')) for r in requests if r['id'] in done]
+        cleaned = self._delete_locations_if_empty([l for l in locations if l[0] and l[1]], root_path_override)
+
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"⏱️ [Remediation] {action}: {len(result['succeeded'])} ok, {len(result['failed'])} fallidas, "
+              f"{cleaned} ubicación(es) vacías eliminadas en {ms:.0f}ms")
+        for req_id, reason in result["failed"].items():
+            self._log_logical_error(f"{action} masivo falló para {req_id}: {reason}", "bulk_remediate")
+        return result
+
+    def _bulk_tracker_items(self, conversation_ids):
+        """{conversation_id: ítem del tracker | None}. Índice local (un solo delta si faltan) o $batch remoto."""
+        conv_ids = [c for c in dict.fromkeys(conversation_ids) if c]
+        if not conv_ids: return {}
+        index = TrackerIndex.ready(self.site_id)
+        if index is not None:
+            items = {c: index.find_by_conversation(c, refresh_on_miss=False) for c in conv_ids}
+            missing = [c for c, item in items.items() if item is None]
+            if missing and index.sync(wait=True):
+                items.update({c: index.find_by_conversation(c, refresh_on_miss=False) for c in missing})
+            return items
+
+        headers = {"Prefer": "HonorNonIndexedQueriesWarningMayFailRandomly"}
+        sub_requests = [{"method": "GET", "url": self._tracker_query_url(c), "headers": headers} for c in conv_ids]
+        items = {}
+        for conv, sub in zip(conv_ids, self.client.send_batch(sub_requests, max_workers=self.BULK_CONCURRENCY)):
+            values = ((sub or {}).get('body') or {}).get('value') or [] if (sub or {}).get('status') == 200 else []
+            items[conv] = values[0] if values else None
+        return items
+
+    def _plan_bulk_item(self, req, tracker_item, action, target_location, target_date):
+        """Retorna (plan, None) o (None, motivo). El plan no hace llamadas de red."""
+        plan = {"req": req, "folder_id": req['id'], "item_id": None, "fields": None, "parent_path": None}
+        if action == "block":
+            # Igual que block_and_delete: sin ítem en el tracker igual se borra la carpeta
+            if tracker_item: plan.update(item_id=tracker_item['id'], fields={"Include": "NO"})
+            return plan, None
+
+        if not tracker_item: return None, "Tracker Item no encontrado"
+        active_path = tracker_item.get('fields', {}).get('ActiveFolderPath')
+        parts = active_path.strip("/").split("/") if active_path else []
+        if action == "relocate":
+            if len(parts) < 2: return None, f"ActiveFolderPath mal formado: {active_path}"
+            parts[-2] = str(target_location)
+            fields = {"LocationCode": str(target_location), "ActiveFolderPath": "/" + "/".join(parts)}
+        else:
+            if len(parts) < 3: return None, f"ActiveFolderPath mal formado: {active_path}"
+            parts[-3] = str(target_date)
+            fields = {"ActiveFolderPath": "/" + "/".join(parts)}
+        plan.update(item_id=tracker_item['id'], fields=fields, parent_path=self._clean_sharepoint_path("/".join(parts[:-1])))
+        return plan, None
+
+    def _resolve_paths(self, paths):
+        """{ruta: id | None}: caché ruta->ID y, para el resto, GETs en $batch concurrentes."""
+        resolver = SharePointResolver()
+        resolved = {p: resolver.get_cached_path_id(p, self.site_id) for p in dict.fromkeys(paths) if p}
+        missing = [p for p, item_id in resolved.items() if not item_id]
+        if not missing: return resolved
+        drive_id = self.reader._get_drive_id()
+        sub_requests = [{"method": "GET", "url": f"{self._drive_path_url(drive_id, p)}?$select=id"} for p in missing]
+        for path, sub in zip(missing, self.client.send_batch(sub_requests, max_workers=self.BULK_CONCURRENCY)):
+            body = (sub or {}).get('body') or {}
+            if (sub or {}).get('status') == 200 and body.get('id'):
+                resolved[path] = body['id']
+                resolver.remember_path(path, body['id'], self.site_id)
+        return resolved
+
+    def _ensure_folders(self, paths):
+        """{ruta: id} de las carpetas destino. Las que falten se crean una vez (con su carpeta padre si hace falta)."""
+        wanted = list(dict.fromkeys(p for p in paths if p))
+        parents = [p.rsplit("/", 1)[0] for p in wanted if "/" in p]
+        ids = self._resolve_paths(wanted + parents)
+        resolver = SharePointResolver()
+        for path in wanted:
+            if ids.get(path) or "/" not in path: continue
+            parent, leaf = path.rsplit("/", 1)
+            if ids.get(parent):
+                ids[path] = self._create_folder_chain(parent, [leaf])
+            elif "/" in parent:
+                grandparent, parent_leaf = parent.rsplit("/", 1)
+                ids[path] = self._create_folder_chain(grandparent, [parent_leaf, leaf])
+                ids[parent] = resolver.get_cached_path_id(parent, self.site_id)
+            # Si otra sesión la creó entre medio, la creación falla: se relee por ruta
+            if not ids[path]: ids[path] = resolver.get_item_id_by_path(path, self.site_id)
+            if not ids[path]: print(f"❌ No se pudo determinar ni crear la carpeta destino: {path}")
+        return ids
+
+    def _execute_bulk_plans(self, plans, action, folder_ids):
+        """
+        Envía todas las operaciones en $batch concurrentes. Retorna {req_id: True | motivo}.
+        En relocate/change_cycle el PATCH del tracker depende del movimiento de su carpeta
+        (send_batch mantiene el par en el mismo envelope): si el movimiento falla, el tracker no se toca.
+        """
+        drive_id = self.reader._get_drive_id()
+        list_url = f"/sites/{self.site_id}/lists/{urllib.parse.quote(self.list_ref)}/items"
+        outcome, sub_requests, owners = {}, [], []
+        for plan in plans:
+            req_id, folder_id = plan["req"]['id'], plan["folder_id"]
+            folder_url = f"/sites/{self.site_id}/drives/{drive_id}/items/{folder_id}"
+            move_idx = None
+            if action == "block":
+                # Igual que block_and_delete: borrado y marca del tracker son independientes
+                sub_requests.append({"method": "DELETE", "url": folder_url})
+                owners.append((plan, "folder"))
+            elif folder_id:
+                new_parent_id = folder_ids.get(plan["parent_path"])
+                if not new_parent_id:
+                    outcome[req_id] = "Carpeta destino no disponible"
+                    continue
+                move_idx = len(sub_requests)
+                sub_requests.append({"method": "PATCH", "url": folder_url, "body": {"parentReference": {"id": new_parent_id}}})
+                owners.append((plan, "folder"))
+            if plan["item_id"]:
+                sub_requests.append({"method": "PATCH", "url": f"{list_url}/{plan['item_id']}/fields", "body": plan["fields"], "depends_on": move_idx})
+                owners.append((plan, "tracker"))
+
+        resolver = SharePointResolver()
+        for (plan, kind), sub in zip(owners, self.client.send_batch(sub_requests, max_workers=self.BULK_CONCURRENCY)):
+            req_id = plan["req"]['id']
+            status = (sub or {}).get('status')
+            ok = status in (200, 201, 204)
+            if ok and kind == "folder": resolver.forget_item(plan["folder_id"])
+            if ok and kind == "tracker": self._note_tracker_write(plan["item_id"], plan["fields"])
+            if not ok and kind == "folder" and action != "block" and status == 404:
+                # ID destino obsoleto en el caché ruta->ID (carpeta borrada por otro usuario)
+                resolver.forget_item(folder_ids.get(plan["parent_path"]))
+            if ok:
+                outcome.setdefault(req_id, True)
+            elif not isinstance(outcome.get(req_id), str):
+                # El primer fallo es el motivo (un 424 del tracker solo refleja el del movimiento)
+                outcome[req_id] = f"{'Carpeta' if kind == 'folder' else 'Tracker'}: HTTP {status}" if status else "Sin respuesta de SharePoint"
+        return outcome
+
+    def _delete_locations_if_empty(self, locations, root_path_override=None):
+        """Versión en lote de delete_location_if_empty: un $batch de lectura y uno de borrado. Retorna cuántas eliminó."""
+        try:
+            drive_id = self.reader._get_drive_id()
+            root_path = self._get_root_path(root_path_override)
+            paths = list(dict.fromkeys(f"{root_path}/{date_folder}/{loc}" for date_folder, loc in locations))
+            if not paths: return 0
+            reads = [{"method": "GET", "url": f"{self._drive_path_url(drive_id, p)}?$select=id,folder"} for p in paths]
+            empty_ids = []
+            for sub in self.client.send_batch(reads, max_workers=self.BULK_CONCURRENCY):
+                body = (sub or {}).get('body') or {}
+                if (sub or {}).get('status') == 200 and body.get('folder', {}).get('childCount') == 0: empty_ids.append(body['id'])
+            if not empty_ids: return 0
+
+            print(f"🧹 {len(empty_ids)} ubicación(es) vacías. Eliminando carpetas...")
+            deletes = [{"method": "DELETE", "url": f"/sites/{self.site_id}/drives/{drive_id}/items/{i}"} for i in empty_ids]
+            deleted = 0
+            for folder_id, sub in zip(empty_ids, self.client.send_batch(deletes, max_workers=self.BULK_CONCURRENCY)):
+                if sub and sub.get('status') == 204:
+                    SharePointResolver().forget_item(folder_id)
+                    deleted += 1
+            return deleted
+        except Exception as e:
+            self._log_logical_error(f"Fallo en limpieza masiva: {e}", "_delete_locations_if_empty")
+            return 0
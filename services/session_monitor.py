@@ -6,8 +6,14 @@ class SessionMonitor:
     """
     Componente Sentinel mejorado (SoC).
     Responsabilidad única: Vigilar la salud del token de MS Graph.
-    Detecta activamente fallos en hilos secundarios.
+
+    - Pasivo: usa el resultado del tráfico real (MSGraphClient.last_success_at y la bandera
+      is_session_valid); cada ciclo del bucle es local, sin red.
+    - Solo si no hubo respuestas de Graph durante QUIET_PERIOD se envía una sonda /me.
+    - Renueva el token en segundo plano antes de que expire (MSGraphClient.refresh_token_ahead).
     """
+    QUIET_PERIOD = 60
+
     def __init__(self, on_session_lost_callback):
         self.client = MSGraphClient()
         self.on_session_lost = on_session_lost_callback
@@ -15,13 +21,8 @@ class SessionMonitor:
         self._consecutive_failures = 0
         self._max_failures = 1 # Disparo inmediato al detectar sesión muerta
 
-<<<<<<< HEAD
-    def start(self, interval=5): # <--- CAMBIO: Intervalo reducido a 5s para detección rápida
-        """Monitorea la sesión con mayor frecuencia (cada 5 segundos)."""
-=======
-    def start(self, interval=60):
-        """Monitorea la sesión con mayor frecuencia (cada minuto)."""
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
+    def start(self, interval=5):
+        """Revisa la sesión cada 'interval' segundos (chequeos locales; la red solo tras QUIET_PERIOD)."""
         if self.is_running: return
         self.is_running = True
         threading.Thread(target=self._watch_loop, args=(interval,), daemon=True).start()
@@ -30,6 +31,7 @@ class SessionMonitor:
         self.is_running = False
 
     def _watch_loop(self, interval):
+        last_probe = 0.0
         while self.is_running:
             # Primero: Chequeo de banderas pasivas (¿falló el poller?)
             if not self.client.is_session_valid:
@@ -37,17 +39,21 @@ class SessionMonitor:
                 self._handle_failure()
                 if not self.is_running: break
 
-            # Segundo: Chequeo activo (Ping a Microsoft)
-            try:
-                # Una llamada ultra rápida a Graph
-                status = self.client.get("/me")
-                if status and 'error' not in status:
-                    self._consecutive_failures = 0
-                    self.client.is_session_valid = True
-                else:
+            # Segundo: renovación anticipada del token (en segundo plano)
+            self.client.refresh_token_ahead()
+
+            # Tercero: sonda activa solo si no hubo tráfico real reciente
+            if time.time() - max(self.client.last_success_at, last_probe) >= self.QUIET_PERIOD:
+                last_probe = time.time()
+                try:
+                    status = self.client.get("/me?$select=id")
+                    if status and 'error' not in status:
+                        self._consecutive_failures = 0
+                        self.client.is_session_valid = True
+                    else:
+                        self._handle_failure()
+                except Exception:
                     self._handle_failure()
-            except Exception:
-                self._handle_failure()
             
             time.sleep(interval)
 
@@ -61,13 +67,13 @@ class SessionMonitor:
                 self.on_session_lost()
 
     def force_relogin(self):
-        """Limpia el estado e invoca login interactivo."""
+        """Limpia el estado e invoca login interactivo (la caché devolvería el token que recibió el 401)."""
         self.client.access_token = None
         self.client.credential = None
         self.client.last_error_code = 0
         try:
-            # Forzamos la obtención del token (esto abrirá el navegador)
-            self.client._get_token()
+            # Forzamos login interactivo: abre el navegador y reemplaza el token cacheado
+            self.client._get_token(prompt=True)
             self._consecutive_failures = 0
             self.client.is_session_valid = True
             self.is_running = True # Reiniciar monitoreo
@@ -0,0 +1,304 @@
+import os
+import json
+import time
+import threading
+from urllib.parse import unquote
+from ms_graph_client import MSGraphClient
+from services.path_manager import PathManager
+
+
+class SharePointResolver:
+    """
+    Resolución compartida (Singleton) de identificadores de SharePoint por sitio.
+
+    - drive_id de la biblioteca de documentos, list_id por displayName,
+      metadatos de columnas por list_id y ruta de carpeta -> item id.
+    - Caché en memoria + disco (sharepoint_ids_cache.json). El archivo lleva CACHE_VERSION:
+      si el formato cambia, se descarta completo.
+    - Las columnas cacheadas se sirven al instante; si superan COLUMNS_TTL se revalidan
+      en segundo plano (stale-while-revalidate).
+    - Invalidación por 404: MSGraphClient notifica cada 404 y se descarta el ID cacheado
+      que aparezca en la URL, de modo que la siguiente consulta lo vuelve a resolver.
+    """
+
+    CACHE_VERSION = 1
+    COLUMNS_TTL = 24 * 3600
+    COLUMNS_SELECT = "name,displayName,readOnly,calculated"
+    DRIVE_NAMES = ["Documents", "Shared Documents", "Documentos"]
+    MAX_CACHED_PATHS = 5000
+    SAVE_DELAY = 2.0
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(SharePointResolver, cls).__new__(cls)
+                cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized: return
+        self.client = MSGraphClient()
+        self._path = PathManager.get_sharepoint_ids_cache_path()
+        self._cache_lock = threading.RLock()
+        self._resolve_locks = {}
+        self._revalidating = set()
+        self._save_timer = None
+        self._cache = self._load()
+        self.client.add_not_found_listener(self._on_not_found)
+        self._initialized = True
+
+    # ------------------------------- Persistencia ---------------------------
+
+    def _empty(self):
+        return {"version": self.CACHE_VERSION, "sites": {}}
+
+    def _load(self):
+        try:
+            if os.path.exists(self._path):
+                with open(self._path, 'r', encoding='utf-8') as f: data = json.load(f)
+                if data.get("version") == self.CACHE_VERSION: return data
+                print("🔄 [Resolver] Caché de IDs con otra versión. Se descarta.")
+        except Exception as e:
+            print(f"⚠️ [Resolver] Caché de IDs ilegible, se reconstruye: {e}")
+        return self._empty()
+
+    def _save(self):
+        with self._cache_lock:
+            try:
+                os.makedirs(os.path.dirname(self._path), exist_ok=True)
+                tmp_path = f"{self._path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(self._cache, f)
+                os.replace(tmp_path, self._path)
+            except Exception as e:
+                print(f"⚠️ [Resolver] No se pudo guardar el caché de IDs: {e}")
+
+    def _save_soon(self):
+        """Agrupa escrituras frecuentes (rutas) en un solo guardado diferido."""
+        with self._cache_lock:
+            if self._save_timer: return
+            def flush():
+                with self._cache_lock: self._save_timer = None
+                self._save()
+            self._save_timer = threading.Timer(self.SAVE_DELAY, flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _site(self, site_id):
+        site = self._cache["sites"].setdefault(site_id, {"lists": {}, "columns": {}})
+        site.setdefault("drive_id", None)
+        site.setdefault("paths", {})
+        return site
+
+    @staticmethod
+    def _norm_path(path):
+        return str(path or "").replace("\\", "/").strip("/").lower()
+
+    def _key_lock(self, key):
+        with self._cache_lock:
+            return self._resolve_locks.setdefault(key, threading.Lock())
+
+    # --------------------------------- Listas -------------------------------
+
+    def get_list_id(self, display_name, site_id=None):
+        """GUID de la lista por su nombre visible (None si no existe o falla la red)."""
+        site_id = site_id or os.getenv('SHAREPOINT_SITE_ID')
+        with self._cache_lock:
+            cached = self._site(site_id)["lists"].get(display_name)
+        if cached: return cached
+
+        # Un solo hilo resuelve cada lista; el resto espera y reutiliza el resultado
+        with self._key_lock(("list", site_id, display_name)):
+            with self._cache_lock:
+                cached = self._site(site_id)["lists"].get(display_name)
+            if cached: return cached
+
+            data = self.client.get(f"/sites/{site_id}/lists?$filter=displayName eq '{display_name}'&$select=id,name&$top=1")
+            items = data.get("value", []) if data else []
+            if not items:
+                print(f"⚠️ [Resolver] No se encontró la lista '{display_name}'.")
+                return None
+            list_id = items[0]["id"]
+            with self._cache_lock:
+                self._site(site_id)["lists"][display_name] = list_id
+            self._save()
+            return list_id
+
+    def prefetch_list(self, display_name, site_id=None, with_columns=False):
+        """Resuelve la lista (y opcionalmente sus columnas) en segundo plano."""
+        def task():
+            list_id = self.get_list_id(display_name, site_id)
+            if list_id and with_columns: self.get_columns(list_id, site_id)
+        threading.Thread(target=task, daemon=True).start()
+
+    def invalidate_list(self, display_name, site_id=None):
+        site_id = site_id or os.getenv('SHAREPOINT_SITE_ID')
+        with self._cache_lock:
+            list_id = self._site(site_id)["lists"].pop(display_name, None)
+            if list_id: self._site(site_id)["columns"].pop(list_id, None)
+        self._save()
+
+    # -------------------------------- Columnas ------------------------------
+
+    def get_columns(self, list_id, site_id=None):
+        """Definiciones de columnas (name, displayName, readOnly, calculated) de la lista."""
+        site_id = site_id or os.getenv('SHAREPOINT_SITE_ID')
+        with self._cache_lock:
+            cached = self._site(site_id)["columns"].get(list_id)
+        if cached:
+            if time.time() - cached.get("fetched_at", 0) > self.COLUMNS_TTL:
+                self._revalidate_columns(list_id, site_id)
+            return cached["value"]
+
+        with self._key_lock(("columns", site_id, list_id)):
+            with self._cache_lock:
+                cached = self._site(site_id)["columns"].get(list_id)
+            if cached: return cached["value"]
+            return self._fetch_columns(list_id, site_id) or []
+
+    def _fetch_columns(self, list_id, site_id):
+        data = self.client.get(f"/sites/{site_id}/lists/{list_id}/columns?$select={self.COLUMNS_SELECT}&$top=200")
+        if data is None: return None
+        value = data.get("value") or []
+        with self._cache_lock:
+            self._site(site_id)["columns"][list_id] = {"fetched_at": time.time(), "value": value}
+        self._save()
+        return value
+
+    def _revalidate_columns(self, list_id, site_id):
+        key = (site_id, list_id)
+        with self._cache_lock:
+            if key in self._revalidating: return
+            self._revalidating.add(key)
+
+        def task():
+            try: self._fetch_columns(list_id, site_id)
+            finally:
+                with self._cache_lock: self._revalidating.discard(key)
+        threading.Thread(target=task, daemon=True).start()
+
+    # --------------------------------- Drives -------------------------------
+
+    def get_drive_id(self, site_id=None):
+        """ID de la biblioteca de documentos del sitio (una resolución por instalación)."""
+        site_id = site_id or os.getenv('SHAREPOINT_SITE_ID')
+        with self._cache_lock:
+            cached = self._site(site_id)["drive_id"]
+        if cached: return cached
+
+        with self._key_lock(("drive", site_id)):
+            with self._cache_lock:
+                cached = self._site(site_id)["drive_id"]
+            if cached: return cached
+
+            drives = self.client.get(f"/sites/{site_id}/drives?$select=id,name")
+            values = drives.get('value', []) if drives else []
+            if not values:
+                print("❌ Error: No se encontraron drives.")
+                return None
+            drive_id = next((d['id'] for d in values if d.get('name') in self.DRIVE_NAMES), values[0]['id'])
+            with self._cache_lock:
+                self._site(site_id)["drive_id"] = drive_id
+            self._save()
+            return drive_id
+
+    def get_cached_drive_id(self, site_id=None):
+        """Solo memoria/disco, sin red (None si aún no se resolvió o fue invalidado)."""
+        site_id = site_id or os.getenv('SHAREPOINT_SITE_ID')
+        with self._cache_lock:
+            return self._site(site_id)["drive_id"]
+
+    def list_ref(self, display_name, site_id=None):
+        """Segmento para /lists/{...}: el GUID si se pudo resolver, si no el nombre (Graph acepta ambos)."""
+        return self.get_list_id(display_name, site_id) or display_name
+
+    # ------------------------------ Ruta -> ID -------------------------------
+
+    def get_item_id_by_path(self, path, site_id=None):
+        """ID del ítem en la ruta (relativa a la raíz del drive). None si no existe."""
+        site_id = site_id or os.getenv('SHAREPOINT_SITE_ID')
+        key = self._norm_path(path)
+        if not key: return None
+        with self._cache_lock:
+            cached = self._site(site_id)["paths"].get(key)
+        if cached: return cached
+
+        drive_id = self.get_drive_id(site_id)
+        if not drive_id: return None
+        data = self.client.get(f"/sites/{site_id}/drives/{drive_id}/root:/{str(path).strip('/')}?$select=id")
+        if not data or 'id' not in data: return None
+        self.remember_path(path, data['id'], site_id)
+        return data['id']
+
+    def get_cached_path_id(self, path, site_id=None):
+        """Solo memoria/disco, sin red."""
+        site_id = site_id or os.getenv('SHAREPOINT_SITE_ID')
+        with self._cache_lock:
+            return self._site(site_id)["paths"].get(self._norm_path(path))
+
+    def remember_path(self, path, item_id, site_id=None):
+        """Registra una ruta ya conocida (p. ej. descubierta por el crawl del reader)."""
+        site_id = site_id or os.getenv('SHAREPOINT_SITE_ID')
+        key = self._norm_path(path)
+        if not key or not item_id: return
+        with self._cache_lock:
+            paths = self._site(site_id)["paths"]
+            if paths.get(key) == item_id: return
+            paths[key] = item_id
+            while len(paths) > self.MAX_CACHED_PATHS:
+                paths.pop(next(iter(paths)))
+        self._save_soon()
+
+    def invalidate_path(self, path, site_id=None):
+        site_id = site_id or os.getenv('SHAREPOINT_SITE_ID')
+        prefix = self._norm_path(path)
+        with self._cache_lock:
+            paths = self._site(site_id)["paths"]
+            for key in [k for k in paths if k == prefix or k.startswith(prefix + "/")]:
+                del paths[key]
+        self._save_soon()
+
+    def forget_item(self, item_id):
+        """Descarta cualquier ruta cacheada que apunte al ítem (movido o borrado)."""
+        if not item_id: return
+        changed = False
+        with self._cache_lock:
+            for site in self._cache["sites"].values():
+                paths = site.get("paths", {})
+                for key in [k for k, v in paths.items() if v == item_id]:
+                    # También los descendientes: su ruta cambió con la del padre
+                    for sub in [k for k in paths if k == key or k.startswith(key + "/")]:
+                        del paths[sub]
+                    changed = True
+        if changed: self._save_soon()
+
+    # ------------------------------ Invalidación -----------------------------
+
+    def _on_not_found(self, url):
+        base = unquote(url.split("?", 1)[0]).rstrip("/")
+        with self._cache_lock:
+            sites = list(self._cache["sites"].items())
+        for site_id, site in sites:
+            drive_id = site.get("drive_id")
+            if drive_id and (base.endswith(f"/drives/{drive_id}") or base.endswith(f"/drives/{drive_id}/root")):
+                print("🔄 [Resolver] Drive no encontrado. Se resolverá de nuevo.")
+                with self._cache_lock: site["drive_id"] = None
+                self._save()
+
+            for name, list_id in list(site.get("lists", {}).items()):
+                marker = f"/lists/{list_id}"
+                if marker not in base: continue
+                tail = base.split(marker, 1)[1]
+                # Un 404 de un ítem concreto no invalida la lista
+                if tail in ("", "/items", "/items/delta", "/columns"):
+                    print(f"🔄 [Resolver] Lista '{name}' no encontrada. Se resolverá de nuevo.")
+                    self.invalidate_list(name, site_id)
+
+            if "/items/" in base:
+                item_id = base.split("/items/", 1)[1].split("/", 1)[0]
+                if item_id in site.get("paths", {}).values(): self.forget_item(item_id)
+            elif "/root:/" in base:
+                # root:/a/b:/children -> a/b (lo que sigue al primer ':/' es el segmento de la acción)
+                self.invalidate_path(base.split("/root:/", 1)[1].split(":/", 1)[0].rstrip(":"), site_id)
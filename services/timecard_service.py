@@ -2,10 +2,18 @@ import os
 import shutil
 import json
 import getpass
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
 from datetime import datetime, timezone
 import dateutil.parser
 from ms_graph_client import MSGraphClient
 from sharepoint_requests_reader import SharePointRequestsReader
+from services.history_log import HistoryLog
+from services.write_behind_queue import WriteBehindQueue, WriteFailed
+from services.sharepoint_resolver import SharePointResolver
+from services.tracker_index import TrackerIndex
 
 class TimecardService:
     """
@@ -43,14 +51,38 @@ class TimecardService:
         "REFINE_PROMPT": "RefinementPrompt"
     }
 
+    # Re-sincronización completa periódica (detecta ítems borrados que el watermark no ve)
+    FULL_RESYNC_SECONDS = 300
+
+    # Generación de ciclo: envelopes $batch en paralelo y reintentos de ítems fallidos
+    GEN_BATCH_CONCURRENCY = 4
+    GEN_MAX_RETRIES = 2
+
     def __init__(self):
         self.client = MSGraphClient()
         self.site_id = os.getenv('SHAREPOINT_SITE_ID')
         self.list_name = "Timecard Tracking"
         self.email_tracker_list = "Email Conversation Tracker"
-        self.drive_id = None 
         self._cached_active_date = None
         self._folder_reader = SharePointRequestsReader()
+        self._history = HistoryLog()
+        self._resolver = SharePointResolver()
+        self._writes = WriteBehindQueue.get("timecards", self._send_fields_patch)
+
+        # Store local por ciclo: {active_date: {item_id: item}} + watermark de 'Modified'
+        self._timecard_store: dict[str, dict[str, dict]] = {}
+        self._store_watermarks: dict[str, str] = {}
+        self._store_full_sync_at: dict[str, float] = {}
+        self._store_lock = threading.Lock()
+
+    @property
+    def list_ref(self):
+        """GUID de 'Timecard Tracking' (resuelto una vez por instalación) o su nombre como fallback."""
+        return self._resolver.list_ref(self.list_name, self.site_id)
+
+    @property
+    def tracker_list_ref(self):
+        return self._resolver.list_ref(self.email_tracker_list, self.site_id)
 
     def get_available_cycles(self):
         """
@@ -67,56 +99,115 @@ class TimecardService:
             print(f"⚠️ Error listando ciclos disponibles: {e}")
             return []
 
-    def generate_cycle_timecards(self, active_date, locations_data):
+    def _existing_pc_numbers(self, active_date):
+        """Códigos de ubicación que ya tienen timecard para el ciclo (None si la consulta falla)."""
+        endpoint = (
+            f"/sites/{self.site_id}/lists/{self.list_ref}/items"
+            f"?expand=fields($select={self.COL_MAP['PC_NUM']})"
+            f"&$filter=fields/{self.COL_MAP['ACTIVE_DATE']} eq '{active_date}'"
+            f"&$top=500"
+        )
+        headers = {"Prefer": "HonorNonIndexedQueriesWarningMayFailRandomly"}
+        raw_items = self._get_all_pages(endpoint, extra_headers=headers)
+        if raw_items is None: return None
+        return {str(r.get('fields', {}).get(self.COL_MAP['PC_NUM']) or '').strip() for r in raw_items}
+
+    def _post_timecard_batch(self, active_date, locs):
+        """Crea hasta 20 timecards en un envelope $batch. Retorna (creadas, fallidas)."""
+        url = f"/sites/{self.site_id}/lists/{quote(self.list_ref)}/items"
+        sub_requests = [{
+            "method": "POST",
+            "url": url,
+            "body": {
+                "fields": {
+                    "Title": loc['code'],           # Location Code
+                    "PayGroup": loc['pay_group'],   # Pay Group (H/V)
+                    "Location": loc['description'], # Description
+                    "ActiveDate": str(active_date), # Nueva fecha del ciclo
+
+                    # Valores Iniciales
+                    # NOTA: Sin 'Status' para que SharePoint use su valor default ("Not Ready")
+                    "Approval": False,
+                    "SignedOff": False,
+                    "ReportUploaded": False
+                }
+            }
+        } for loc in locs]
+
+        try:
+            responses = self.client.send_batch(sub_requests)
+        except Exception as e:
+            print(f"❌ Error en envelope de generación: {e}")
+            return [], list(locs)
+
+        created, failed = [], []
+        for loc, sub in zip(locs, responses):
+            if sub and sub.get('status') in (200, 201): created.append(loc)
+            else: failed.append(loc)
+        return created, failed
+
+    def generate_cycle_timecards(self, active_date, locations_data, progress_callback=None):
         """
         Genera filas en la lista Timecard Tracking para el nuevo ciclo.
-        Crea items automáticamente basándose en los datos del Excel de Locations.
+        Crea los items con $batch (20 por envelope) y varios envelopes en paralelo.
+        Es idempotente: omite las ubicaciones que ya tienen timecard para ese ActiveDate,
+        por lo que un reintento (o un segundo cierre) no duplica filas.
+        progress_callback(done, total) se invoca tras cada envelope.
+        Retorna un reporte {total, created, skipped, failed: [codes]}.
         """
         print(f"🚀 Iniciando generación masiva de Timecards para el ciclo {active_date}...")
-        
+        t0 = time.perf_counter()
+
         # 1. Ordenar por PayGroup para inserción en bloques ordenados (H, luego V...)
         # Usamos 'Z' como fallback para que los vacíos queden al final
         sorted_locs = sorted(locations_data, key=lambda x: str(x.get('pay_group', 'Z')))
-        
-        success_count = 0
-        total = len(sorted_locs)
-        
-        # Iteramos e insertamos
-        for i, loc in enumerate(sorted_locs):
-            try:
-                # Construimos el payload POST para SharePoint
-                payload = {
-                    "fields": {
-                        "Title": loc['code'],           # Location Code
-                        "PayGroup": loc['pay_group'],   # Pay Group (H/V)
-                        "Location": loc['description'], # Description
-                        "ActiveDate": str(active_date), # Nueva fecha del ciclo
-                        
-                        # Valores Iniciales
-                        # NOTA: Eliminado 'Status' para que SharePoint use su valor default ("Not Ready")
-                        "Approval": False,
-                        "SignedOff": False,
-                        "ReportUploaded": False
-                    }
-                }
-                
-                # Petición de creación
-                endpoint = f"/sites/{self.site_id}/lists/{self.list_name}/items"
-                resp = self.client.post(endpoint, payload)
-                
-                if resp and 'id' in resp:
-                    success_count += 1
-                    # Feedback en consola cada 10 items para no saturar logs
-                    if success_count % 10 == 0:
-                        print(f"   -> Generado {success_count}/{total}...")
-                else:
-                    print(f"⚠️ Falló creación para {loc['code']} ({loc['description']})")
-                    
-            except Exception as e:
-                print(f"❌ Error generando card para {loc['code']}: {e}")
-        
-        print(f"🏁 Generación finalizada. Éxito: {success_count}/{total} tarjetas creadas.")
-        return success_count
+        report = {"total": len(sorted_locs), "created": 0, "skipped": 0, "failed": []}
+
+        existing = self._existing_pc_numbers(active_date)
+        if existing is None:
+            print("⚠️ No se pudo verificar timecards existentes. Se aborta para no duplicar.")
+            report["failed"] = [loc['code'] for loc in sorted_locs]
+            return report
+        pending = [loc for loc in sorted_locs if str(loc['code']).strip() not in existing]
+        report["skipped"] = len(sorted_locs) - len(pending)
+        if report["skipped"]: print(f"   -> {report['skipped']} ubicaciones ya tenían timecard. Omitidas.")
+
+        done = report["skipped"]
+        for attempt in range(self.GEN_MAX_RETRIES + 1):
+            if not pending: break
+            if attempt:
+                time.sleep(2 ** attempt)
+                # Un envelope que "falló" pudo haberse aplicado: re-verificamos antes de reintentar
+                existing = self._existing_pc_numbers(active_date) or existing
+                recovered = [loc for loc in pending if str(loc['code']).strip() in existing]
+                report["created"] += len(recovered)
+                done += len(recovered)
+                pending = [loc for loc in pending if str(loc['code']).strip() not in existing]
+                if not pending: break
+                print(f"🔄 Reintento {attempt}/{self.GEN_MAX_RETRIES} para {len(pending)} timecards...")
+
+            chunks = [pending[i:i + self.client.BATCH_MAX_REQUESTS] for i in range(0, len(pending), self.client.BATCH_MAX_REQUESTS)]
+            still_failed = []
+            with ThreadPoolExecutor(max_workers=self.GEN_BATCH_CONCURRENCY) as pool:
+                futures = [pool.submit(self._post_timecard_batch, active_date, chunk) for chunk in chunks]
+                for fut in as_completed(futures):
+                    created, failed = fut.result()
+                    report["created"] += len(created)
+                    done += len(created)
+                    still_failed.extend(failed)
+                    print(f"   -> Generado {report['created']}/{report['total'] - report['skipped']}...")
+                    if progress_callback:
+                        try: progress_callback(done, report["total"])
+                        except Exception: pass
+            pending = still_failed
+
+        report["failed"] = [loc['code'] for loc in pending]
+        for loc in pending: print(f"⚠️ Falló creación para {loc['code']} ({loc['description']})")
+
+        self.invalidate_timecard_store(str(active_date))
+        print(f"🏁 Generación finalizada en {time.perf_counter() - t0:.1f}s. "
+              f"Creadas: {report['created']}, omitidas: {report['skipped']}, fallidas: {len(report['failed'])}.")
+        return report
 
     def get_active_date_from_folders(self):
         """Detecta el ciclo activo (el más reciente) basado en la estructura de carpetas."""
@@ -146,72 +237,122 @@ class TimecardService:
         except:
             return None
 
-    def get_active_timecards(self, target_date=None):
+    def _timecard_fields_select(self):
+        """Columnas que consume _map_timecard (+ Modified para el watermark). El historial se lee bajo demanda."""
+        cols = [self.COL_MAP[k] for k in (
+            'PC_NUM', 'PAY_GROUP', 'LOCATION', 'ACTIVE_DATE', 'STATUS', 'APPROVAL', 'MANAGER',
+            'SIGNED_OFF', 'REPORT_UPLOADED', 'PROCESSED_BY', 'PROBLEMS', 'BOT_CACHE',
+            'EMP_LIST', 'NOTIF_STATUS', 'DRAFT_TO', 'DRAFT_SUBJECT', 'DRAFT_BODY'
+        )]
+        return ",".join(cols + ["Modified"])
+
+    def _get_all_pages(self, endpoint, extra_headers=None):
+        """Sigue @odata.nextLink hasta agotar la colección. Retorna None si falla la primera página."""
+        items = []
+        data = self.client.get(endpoint, extra_headers=extra_headers)
+        if data is None: return None
+        while data:
+            items.extend(data.get('value', []))
+            next_link = data.get('@odata.nextLink')
+            if not next_link: break
+            data = self.client.get(next_link, extra_headers=extra_headers)
+        return items
+
+    def _map_timecard(self, raw):
+        f = raw.get('fields', {})
+        
+        status_val = f.get(self.COL_MAP['STATUS'])
+        if not status_val: status_val = 'Not Ready' 
+
+        return {
+            "id": raw['id'],
+            "pc_number": f.get(self.COL_MAP['PC_NUM']),
+            "pay_group": f.get(self.COL_MAP['PAY_GROUP']),
+            "location": f.get(self.COL_MAP['LOCATION']), 
+            "status": status_val,
+            "Approval": f.get(self.COL_MAP['APPROVAL'], False),
+            "manager": f.get(self.COL_MAP['MANAGER'], ''),
+            "signed_off": f.get(self.COL_MAP['SIGNED_OFF'], False),
+            "report_uploaded": f.get(self.COL_MAP['REPORT_UPLOADED'], False),
+            "processed_by": f.get(self.COL_MAP['PROCESSED_BY'], ''),
+            "reported_problems": f.get(self.COL_MAP['PROBLEMS'], ''),
+            "active_date": f.get(self.COL_MAP['ACTIVE_DATE']),
+            "bot_analysis_cache": f.get(self.COL_MAP['BOT_CACHE'], ''),
+            "employee_list": f.get(self.COL_MAP['EMP_LIST'], ''),
+            
+            # Datos críticos para la resolución inteligente
+            "notif_status": f.get(self.COL_MAP['NOTIF_STATUS'], 'None'),
+            "draft_to": f.get(self.COL_MAP['DRAFT_TO'], ''),
+            "draft_subject": f.get(self.COL_MAP['DRAFT_SUBJECT'], ''),
+            "draft_body": f.get(self.COL_MAP['DRAFT_BODY'], ''),
+            "modified_at": f.get('Modified')
+        }
+
+    def get_active_timecards(self, target_date=None, *, incremental=True):
         """
         Recupera las timecards.
         Si target_date es None, busca la fecha más reciente automáticamente.
         Si target_date tiene valor, filtra por esa fecha específica (historial).
+
+        Con incremental=True solo se descargan las filas con Modified >= último watermark
+        y se fusionan en el store local; cada FULL_RESYNC_SECONDS se hace una lectura completa.
         """
         if target_date:
             active_date = target_date
-            print(f"🗓️ [Timecards] Consultando ciclo histórico/específico: {active_date}")
         else:
             active_date = self.get_active_date_from_folders()
             if not active_date:
                 print("⚠️ No se pudo determinar un ciclo activo.")
                 return [], "Scanning..."
 
+        with self._store_lock:
+            watermark = self._store_watermarks.get(active_date)
+            last_full = self._store_full_sync_at.get(active_date, 0)
+        needs_full = (not incremental or watermark is None or time.time() - last_full > self.FULL_RESYNC_SECONDS)
+
         filter_query = f"fields/{self.COL_MAP['ACTIVE_DATE']} eq '{active_date}'"
+        if not needs_full:
+            filter_query += f" and fields/Modified ge '{watermark}'"
         
         endpoint = (
-            f"/sites/{self.site_id}/lists/{self.list_name}/items"
-            f"?expand=fields"
+            f"/sites/{self.site_id}/lists/{self.list_ref}/items"
+            f"?expand=fields($select={self._timecard_fields_select()})"
             f"&$filter={filter_query}"
             f"&$top=500" 
         )
         
         headers = {"Prefer": "HonorNonIndexedQueriesWarningMayFailRandomly"}
-        data = self.client.get(endpoint, extra_headers=headers)
+        raw_items = self._get_all_pages(endpoint, extra_headers=headers)
         
-        items = []
-        if data and 'value' in data:
-            for raw in data['value']:
-                f = raw.get('fields', {})
-                
-                status_val = f.get(self.COL_MAP['STATUS'])
-                if not status_val: status_val = 'Not Ready' 
-
-                item = {
-                    "id": raw['id'],
-                    "pc_number": f.get(self.COL_MAP['PC_NUM']),
-                    "pay_group": f.get(self.COL_MAP['PAY_GROUP']),
-                    "location": f.get(self.COL_MAP['LOCATION']), 
-                    "status": status_val,
-                    "Approval": f.get(self.COL_MAP['APPROVAL'], False),
-                    "manager": f.get(self.COL_MAP['MANAGER'], ''),
-                    "signed_off": f.get(self.COL_MAP['SIGNED_OFF'], False),
-                    "report_uploaded": f.get(self.COL_MAP['REPORT_UPLOADED'], False),
-                    "processed_by": f.get(self.COL_MAP['PROCESSED_BY'], ''),
-                    "reported_problems": f.get(self.COL_MAP['PROBLEMS'], ''),
-                    "active_date": f.get(self.COL_MAP['ACTIVE_DATE']),
-                    "bot_analysis_cache": f.get(self.COL_MAP['BOT_CACHE'], ''),
-                    "history": f.get(self.COL_MAP['HISTORY'], ''),
-                    "employee_list": f.get(self.COL_MAP['EMP_LIST'], ''),
-                    
-                    # Datos críticos para la resolución inteligente
-                    "notif_status": f.get(self.COL_MAP['NOTIF_STATUS'], 'None'),
-                    "draft_to": f.get(self.COL_MAP['DRAFT_TO'], ''),
-                    "draft_subject": f.get(self.COL_MAP['DRAFT_SUBJECT'], ''),
-                    "draft_body": f.get(self.COL_MAP['DRAFT_BODY'], '')
-                }
-                items.append(item)
+        with self._store_lock:
+            store = self._timecard_store.setdefault(active_date, {})
+            if raw_items is not None:
+                if needs_full:
+                    store.clear()
+                    self._store_full_sync_at[active_date] = time.time()
+                for raw in raw_items:
+                    item = self._map_timecard(raw)
+                    store[item['id']] = item
+                    if item['modified_at'] and (watermark is None or item['modified_at'] > watermark):
+                        watermark = item['modified_at']
+                if watermark: self._store_watermarks[active_date] = watermark
+                if needs_full: print(f"🗓️ [Timecards] Sync completo {active_date}: {len(store)} items.")
+            items = list(store.values())
                 
         items.sort(key=lambda x: x['pc_number'] if x['pc_number'] else "ZZZ")
         return items, active_date
 
+    def invalidate_timecard_store(self, active_date=None):
+        """Fuerza lectura completa en el próximo get_active_timecards."""
+        with self._store_lock:
+            if active_date:
+                self._store_watermarks.pop(active_date, None)
+            else:
+                self._store_watermarks.clear()
+
     def get_single_item_status(self, item_id):
         """Recupera el estado de un solo item para polling eficiente."""
-        endpoint = f"/sites/{self.site_id}/lists/{self.list_name}/items/{item_id}?expand=fields"
+        endpoint = f"/sites/{self.site_id}/lists/{self.list_ref}/items/{item_id}?expand=fields"
         data = self.client.get(endpoint)
         if data and 'fields' in data:
             f = data['fields']
@@ -224,11 +365,29 @@ class TimecardService:
         return None
 
     # -------------------------------------------------------------------------
-    #  PLAN A: RESOLUCIÓN AUTOMÁTICA (Server-Side Filter)
+    #  PLAN A: RESOLUCIÓN AUTOMÁTICA (Índice local; $filter en servidor como fallback)
     # -------------------------------------------------------------------------
     def find_exact_match_evidence(self, subject_str, location_code):
         if not subject_str or not location_code: return None
-        
+
+        index = TrackerIndex.ready(self.site_id)
+        if index is None: return self._find_exact_match_remote(subject_str, location_code)
+
+        item = index.find_by_subject(subject_str, location_code)
+        if not item:
+            print(f"🤖 [Auto-Resolve] Sin coincidencias locales para Loc='{location_code}'.")
+            return None
+        f = item.get('fields', {})
+        print(f"✅ [Auto-Resolve] ¡Match encontrado (índice local)! ID: {item['id']}")
+        return {
+            "key": item['id'],
+            "text": f.get('OriginalSubject', 'No Subject'),
+            "body": f.get('OriginalBody', ''),
+            "created": f.get('Created', '')
+        }
+
+    def _find_exact_match_remote(self, subject_str, location_code):
+        """Fallback cuando el índice local no está disponible: $filter no indexado en el servidor."""
         # Variantes de asunto
         variants = [subject_str]
         if "//" in subject_str:
@@ -248,7 +407,7 @@ class TimecardService:
         filter_query = f"fields/LocationCode eq '{safe_loc}' and ({or_clause})"
         
         endpoint = (
-            f"/sites/{self.site_id}/lists/{self.email_tracker_list}/items"
+            f"/sites/{self.site_id}/lists/{self.tracker_list_ref}/items"
             f"?expand=fields"
             f"&$filter={filter_query}"
             f"&$top=1"
@@ -278,8 +437,20 @@ class TimecardService:
     # -------------------------------------------------------------------------
     def get_audit_candidates(self, location_code, active_date_str=None):
         """
-        Realiza diagnóstico del formato de fecha real en SharePoint y luego intenta filtrar.
+        Candidatos del tracker para la ubicación (y ciclo). Usa el índice local si está listo;
+        si no, realiza diagnóstico del formato de fecha real en SharePoint y luego intenta filtrar.
         """
+        index = TrackerIndex.ready(self.site_id)
+        if index is not None:
+            iso_date = self._format_date_for_sharepoint_iso(active_date_str)
+            items = index.items_for_location(location_code)
+            if iso_date: items = [i for i in items if str(i.get('fields', {}).get('ActiveWeekEndingDate') or '')[:10] == iso_date]
+            candidates = [self._to_audit_candidate(i) for i in items]
+            candidates.sort(key=lambda x: x['created_iso'], reverse=True)
+            candidates = candidates[:50]
+            print(f"🔎 [Manual-Resolve] {len(candidates)} candidatos en índice local (Loc='{location_code}' | Ciclo='{active_date_str}')")
+            return candidates
+
         print(f"🔎 [Manual-Resolve] Consultando servidor: Loc='{location_code}' | Ciclo='{active_date_str}'")
         safe_loc = str(location_code).replace("'", "''")
 
@@ -287,7 +458,7 @@ class TimecardService:
         # Traemos 1 item reciente de esta ubicación SIN filtro de fecha para ver qué formato usa SP
         try:
             spy_endpoint = (
-                f"/sites/{self.site_id}/lists/{self.email_tracker_list}/items"
+                f"/sites/{self.site_id}/lists/{self.tracker_list_ref}/items"
                 f"?expand=fields"
                 f"&$filter=fields/LocationCode eq '{safe_loc}'"
                 # CORRECCIÓN: Eliminado orderby para evitar error 400
@@ -316,7 +487,7 @@ class TimecardService:
         filter_query = " and ".join(filters)
         
         endpoint = (
-            f"/sites/{self.site_id}/lists/{self.email_tracker_list}/items"
+            f"/sites/{self.site_id}/lists/{self.tracker_list_ref}/items"
             f"?expand=fields"
             f"&$filter={filter_query}"
             # CORRECCIÓN: Eliminado orderby para evitar error 400
@@ -330,24 +501,7 @@ class TimecardService:
         if data and 'value' in data:
             print(f"   -> Servidor devolvió {len(data['value'])} items.")
             
-            # Procesamos items
-            for item in data['value']:
-                f = item.get('fields', {})
-                subject = f.get('OriginalSubject', 'No Subject')
-                created_iso = f.get('Created', '')
-                try:
-                    dt = dateutil.parser.parse(created_iso)
-                    date_display = dt.strftime("%d/%m %H:%M")
-                except:
-                    date_display = created_iso[:16]
-
-                label = f"[{date_display}] {subject[:50]}..."
-                candidates.append({
-                    "key": item['id'], 
-                    "text": label,
-                    "full_subject": subject,
-                    "created_iso": created_iso # Guardamos para ordenar en Python
-                })
+            candidates = [self._to_audit_candidate(item) for item in data['value']]
             
             # CORRECCIÓN: Ordenamiento en memoria (Python)
             candidates.sort(key=lambda x: x['created_iso'], reverse=True)
@@ -357,6 +511,24 @@ class TimecardService:
         
         return candidates
 
+    def _to_audit_candidate(self, item):
+        f = item.get('fields', {})
+        subject = f.get('OriginalSubject', 'No Subject')
+        created_iso = f.get('Created', '')
+        try:
+            dt = dateutil.parser.parse(created_iso)
+            date_display = dt.strftime("%d/%m %H:%M")
+        except:
+            date_display = created_iso[:16]
+
+        label = f"[{date_display}] {subject[:50]}..."
+        return {
+            "key": item['id'], 
+            "text": label,
+            "full_subject": subject,
+            "created_iso": created_iso # Guardamos para ordenar en Python
+        }
+
     # -------------------------------------------------------------------------
     #  ACTUALIZACIÓN Y UTC (Logs de Escritura)
     # -------------------------------------------------------------------------
@@ -378,14 +550,18 @@ class TimecardService:
         if ru_finish: updates[self.COL_MAP['RU_FINISH']] = self.ensure_utc_timestamp(ru_finish)
         return self.update_status(item_id, updates)
 
-    def update_status(self, item_id, updates: dict):
+    def update_status(self, item_id, updates: dict, *, wait=True):
+        """
+        Encola la actualización en la cola write-behind: los cambios del mismo ítem que
+        lleguen dentro de la ventana de coalescencia salen en un único PATCH.
+        wait=True bloquea hasta la respuesta de SharePoint y retorna True/False;
+        wait=False retorna True en cuanto la escritura queda encolada (y persistida).
+        """
         if not updates: return False
         
-        # --- LOGS DE ESCRITURA ---
-        print(f"📤 [PATCH] Enviando actualización a Item {item_id}...")
-        
         # ELIMINADO: La conversión forzada de "" a None.
         # Ahora permitimos enviar "" tal como lo hacen Review y Start.
+        updates = dict(updates)
         
         # 1. Interceptor UTC
         time_cols = [
@@ -403,10 +579,26 @@ class TimecardService:
                         updates[col] = utc_val
                         # print(f"🕒 Tiempo corregido a UTC: {val} -> {utc_val}")
 
-        endpoint = f"/sites/{self.site_id}/lists/{self.list_name}/items/{item_id}/fields"
+        future = self._writes.enqueue(item_id, updates)
+        if not wait: return True
+        try:
+            return future.result(timeout=120)
+        except WriteFailed as e:
+            print(f"❌ [PATCH] Escritura de {item_id} rechazada. Código: {e.status}")
+            return False
+        except Exception as e:
+            print(f"❌ [PATCH] Sin respuesta de la cola de escritura para {item_id}: {e}")
+            return False
+
+    def _send_fields_patch(self, item_id, fields, etag=None):
+        """Envío real (lo invoca el hilo de la cola write-behind)."""
+        # --- LOGS DE ESCRITURA ---
+        print(f"📤 [PATCH] Enviando actualización a Item {item_id}...")
+        endpoint = f"/sites/{self.site_id}/lists/{self.list_ref}/items/{item_id}/fields"
+        headers = {"If-Match": etag} if etag else None
         
         try:
-            result = self.client.patch(endpoint, updates)
+            result = self.client.patch(endpoint, fields, extra_headers=headers)
             if result:
                 print(f"✅ [PATCH] Éxito. SharePoint aceptó el cambio.")
                 return True
@@ -417,25 +609,21 @@ class TimecardService:
             print(f"❌ [PATCH] Excepción crítica: {e}")
             return False
 
-    def append_history(self, item_id, current_history_str, event_type, details=None):
-        history = []
-        if current_history_str:
-            try:
-                history = json.loads(current_history_str)
-                if not isinstance(history, list): history = []
-            except: history = []
-
+    def append_history(self, item_id, event_type, details=None):
+        """
+        Añade un evento a ProcessingHistory (lista JSON, legible por clientes anteriores; ver HistoryLog).
+        La fusión se hace siempre sobre el valor vigente en SharePoint.
+        """
         new_entry = {
             "timestamp": datetime.now().isoformat(),
             "event": event_type,
             "user": getpass.getuser().upper(),
             "details": details or {}
         }
-        history.append(new_entry)
-        
         try:
-            json_str = json.dumps(history)
-            self.update_status(item_id, {self.COL_MAP['HISTORY']: json_str})
+            endpoint = f"/sites/{self.site_id}/lists/{self.list_ref}/items/{item_id}"
+            if self._history.append(endpoint, self.COL_MAP['HISTORY'], new_entry) is None:
+                print(f"⚠️ Error history: no se registró {event_type} en {item_id}")
         except Exception as e:
             print(f"⚠️ Error history: {e}")
 
@@ -506,10 +694,8 @@ class TimecardService:
         except Exception: pass
 
         if not upload_success:
-            if not self.drive_id:
-                drives = self.client.get(f"/sites/{self.site_id}/drives")
-                if drives and 'value' in drives: self.drive_id = drives['value'][0]['id']
-            if not self.drive_id: return False
+            drive_id = self._resolver.get_drive_id(self.site_id)
+            if not drive_id: return False
             
             file_name = f"{pc_number}.pdf"
             safe_date = cycle_date.strip()
@@ -518,10 +704,12 @@ class TimecardService:
             try:
                 with open(local_path, 'rb') as f: content = f.read()
                 import requests
-                endpoint = f"/sites/{self.site_id}/drives/{self.drive_id}/root:/{target_path}:/content"
+                endpoint = f"/sites/{self.site_id}/drives/{drive_id}/root:/{target_path}:/content"
                 headers = {'Authorization': f'Bearer {self.client.access_token}', 'Content-Type': 'application/pdf'}
                 url = f"https://graph.microsoft.com/v1.0{endpoint}"
                 resp = requests.put(url, headers=headers, data=content)
                 if resp.status_code in [200, 201]: return True
+                # PUT directo (fuera de _make_request): el 404 se notifica a mano para invalidar el drive cacheado
+                if resp.status_code == 404: self.client._notify_not_found(endpoint)
             except Exception: return False
         return False
\ No newline at end of file
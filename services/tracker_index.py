@@ -0,0 +1,113 @@
+import os
+from services.list_mirror import ListMirror
+from services.employee_directory import normalize_text
+from services.sharepoint_resolver import SharePointResolver
+
+
+class TrackerIndex(ListMirror):
+    """
+    Copia local de 'Email Conversation Tracker' para búsquedas sin $filter en el servidor.
+
+    - ConversationID (columna Title) -> item id.
+    - LocationCode -> {item ids}.
+    - (LocationCode, OriginalSubject normalizado) -> {item ids}. La normalización ignora
+      mayúsculas/acentos y unifica '//' y '--', igual que las variantes del Auto-Resolve.
+    Las columnas del tracker no están indexadas: filtrar en el servidor exige el header
+    'HonorNonIndexedQueriesWarningMayFailRandomly' y puede fallar con listas grandes.
+    """
+
+    LIST_NAME = "Email Conversation Tracker"
+    LABEL = "TrackerIndex"
+    # Espera máxima por la carga inicial antes de recurrir a la consulta remota
+    LOOKUP_WAIT = 5
+
+    @classmethod
+    def for_site(cls, site_id=None):
+        """Índice del tracker del sitio (None si la lista no se pudo resolver)."""
+        site_id = site_id or os.getenv('SHAREPOINT_SITE_ID')
+        list_id = SharePointResolver().get_list_id(cls.LIST_NAME, site_id)
+        if not list_id: return None
+        return cls.get(site_id, list_id)
+
+    @classmethod
+    def ready(cls, site_id=None):
+        """Índice si está (o queda en LOOKUP_WAIT) sincronizado; None para usar la consulta remota."""
+        index = cls.for_site(site_id)
+        if index and index.ensure_loaded(wait_seconds=cls.LOOKUP_WAIT): return index
+        return None
+
+    def __init__(self, site_id, list_id):
+        super().__init__(site_id, list_id)
+        self._id_by_conversation: dict[str, str] = {}
+        self._ids_by_location: dict[str, set] = {}
+        self._ids_by_subject: dict[tuple, set] = {}
+
+    # ------------------------------- Claves ---------------------------------
+
+    @staticmethod
+    def location_key(location_code):
+        return str(location_code or "").strip().lower()
+
+    @staticmethod
+    def subject_key(subject):
+        return normalize_text(subject).replace("//", "--")
+
+    def _keys_for(self, fields):
+        loc = self.location_key(fields.get('LocationCode'))
+        subject = fields.get('OriginalSubject')
+        return loc, ((loc, self.subject_key(subject)) if subject else None)
+
+    # ------------------------------- Índice ---------------------------------
+
+    def _clear_locked(self):
+        self._id_by_conversation.clear()
+        self._ids_by_location.clear()
+        self._ids_by_subject.clear()
+
+    def _upsert_locked(self, item_id, fields):
+        conv = str(fields.get('Title') or "").strip()
+        if conv: self._id_by_conversation[conv] = item_id
+        loc, subj = self._keys_for(fields)
+        if loc: self._ids_by_location.setdefault(loc, set()).add(item_id)
+        if subj: self._ids_by_subject.setdefault(subj, set()).add(item_id)
+
+    def _remove_locked(self, item_id, fields):
+        conv = str(fields.get('Title') or "").strip()
+        if conv and self._id_by_conversation.get(conv) == item_id: del self._id_by_conversation[conv]
+        loc, subj = self._keys_for(fields)
+        for index, key in ((self._ids_by_location, loc), (self._ids_by_subject, subj)):
+            bucket = index.get(key) if key else None
+            if bucket is None: continue
+            bucket.discard(item_id)
+            if not bucket: del index[key]
+
+    # ------------------------------- Consultas ------------------------------
+
+    def find_by_conversation(self, conversation_id, refresh_on_miss=True):
+        """Ítem crudo (con 'fields') de la conversación. Si no está, aplica el delta una vez y reintenta."""
+        conv = str(conversation_id or "").strip()
+        if not conv: return None
+        with self._lock:
+            item = self._items.get(self._id_by_conversation.get(conv))
+        if item is None and refresh_on_miss and self.sync(wait=True):
+            return self.find_by_conversation(conv, refresh_on_miss=False)
+        return item
+
+    def find_item_id(self, conversation_id):
+        item = self.find_by_conversation(conversation_id)
+        return item['id'] if item else None
+
+    def find_by_subject(self, subject, location_code):
+        """Ítem más reciente de la ubicación cuyo asunto coincide (normalizado). None si no hay."""
+        if not subject or not location_code: return None
+        key = (self.location_key(location_code), self.subject_key(subject))
+        with self._lock:
+            items = [self._items[i] for i in self._ids_by_subject.get(key, ()) if i in self._items]
+        if not items: return None
+        return max(items, key=lambda i: str(i.get('fields', {}).get('Created', '')))
+
+    def items_for_location(self, location_code):
+        """Ítems crudos de la ubicación (sin orden garantizado)."""
+        with self._lock:
+            ids = self._ids_by_location.get(self.location_key(location_code), ())
+            return [self._items[i] for i in ids if i in self._items]
@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import Future
+from ms_graph_client import MSGraphClient
+from services.path_manager import PathManager
+
+
+class WriteFailed(Exception):
+    """Escritura descartada por la cola. 'status' es el último código HTTP (0 = sin respuesta)."""
+
+    def __init__(self, key, status, attempts):
+        super().__init__(f"{key} descartado tras {attempts} intento(s). Código: {status}")
+        self.key = key
+        self.status = status
+        self.attempts = attempts
+
+
+class WriteBehindQueue:
+    """
+    Cola write-behind para PATCH de campos en SharePoint.
+
+    - Coalesce: las actualizaciones del mismo ítem dentro de COALESCE_WINDOW se
+      fusionan en un único PATCH (gana el último valor de cada campo).
+    - Un solo hilo escritor por cola: nunca hay dos PATCH en vuelo para el mismo ítem.
+    - Concurrencia optimista: se conserva el primer eTag recibido (la versión sobre la
+      que el usuario editó); un 412 se reporta como fallo y no se reintenta.
+    - Las escrituras pendientes se persisten en disco y se reenvían al reiniciar.
+    - Cada flush reporta su latencia (desde el primer encolado hasta la respuesta).
+    """
+
+    COALESCE_WINDOW = 0.4
+    MAX_ATTEMPTS = 4
+    # Códigos que no tiene sentido reintentar (el payload o la versión son inválidos)
+    PERMANENT_ERRORS = {400, 403, 404, 409, 412}
+
+    _instances = {}
+    _registry_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, name, send_fn):
+        """Cola única por nombre en todo el proceso (el archivo de persistencia es compartido)."""
+        with cls._registry_lock:
+            if name not in cls._instances:
+                cls._instances[name] = cls(name, send_fn)
+            return cls._instances[name]
+
+    def __init__(self, name, send_fn):
+        self.name = name
+        self._send_fn = send_fn
+        self._path = PathManager.get_pending_writes_path(name)
+        self._cond = threading.Condition()
+        # {key: {"fields", "etag", "queued_at", "due_at", "attempts", "count", "futures"}}
+        self._pending = {}
+        # Ítem en vuelo: sigue persistido hasta que SharePoint confirme
+        self._inflight = {}
+        self.stats = {"flushed": 0, "coalesced": 0, "failed": 0, "last_latency_ms": 0.0, "max_latency_ms": 0.0}
+
+        self._load_persisted()
+        threading.Thread(target=self._worker, daemon=True, name=f"WriteBehind-{name}").start()
+
+    # ------------------------------- API pública ----------------------------
+
+    def enqueue(self, key, fields: dict, etag=None) -> Future:
+        """
+        Encola campos para el ítem 'key'. El Future resuelve a True al confirmarse el PATCH,
+        o lanza WriteFailed (con el código HTTP) si se descarta.
+        """
+        future = Future()
+        with self._cond:
+            now = time.time()
+            entry = self._pending.get(key)
+            if entry is None:
+                entry = {"fields": {}, "etag": etag, "queued_at": now, "due_at": now + self.COALESCE_WINDOW,
+                         "attempts": 0, "count": 0, "futures": []}
+                self._pending[key] = entry
+            else:
+                self.stats["coalesced"] += 1
+                if not entry["etag"]: entry["etag"] = etag
+            entry["fields"].update(fields)
+            entry["count"] += 1
+            entry["futures"].append(future)
+            self._persist_locked()
+            self._cond.notify()
+        return future
+
+    def pending_count(self):
+        with self._cond: return len(self._pending)
+
+    # ------------------------------- Hilo escritor --------------------------
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.time()
+                    due = [k for k, e in self._pending.items() if e["due_at"] <= now]
+                    if due: break
+                    next_due = min((e["due_at"] for e in self._pending.values()), default=None)
+                    self._cond.wait(timeout=None if next_due is None else max(0.01, next_due - now))
+                key = due[0]
+                entry = self._pending.pop(key)
+                self._inflight[key] = entry
+
+            ok, retry, code = self._flush(key, entry)
+
+            with self._cond:
+                self._inflight.pop(key, None)
+                if retry:
+                    # Re-encolamos fusionando con lo que haya llegado mientras tanto (lo nuevo gana)
+                    newer = self._pending.get(key)
+                    if newer:
+                        entry["fields"].update(newer["fields"])
+                        entry["futures"].extend(newer["futures"])
+                        entry["count"] += newer["count"]
+                    entry["due_at"] = time.time() + min(30, 2 ** entry["attempts"])
+                    self._pending[key] = entry
+                self._persist_locked()
+
+            if not retry:
+                # last_error_code es por hilo: el código viaja en el Future, no en el cliente
+                error = None if ok else WriteFailed(key, code, entry["attempts"])
+                for fut in entry["futures"]:
+                    if fut.done(): continue
+                    if ok: fut.set_result(True)
+                    else: fut.set_exception(error)
+
+    def _flush(self, key, entry):
+        """Envía un PATCH. Retorna (ok, reintentar, código HTTP del fallo)."""
+        client = MSGraphClient()
+        client.last_error_code = 0
+        entry["attempts"] += 1
+        try:
+            ok = bool(self._send_fn(key, dict(entry["fields"]), entry["etag"]))
+        except Exception as e:
+            print(f"❌ [WriteBehind:{self.name}] Excepción enviando {key}: {e}")
+            ok = False
+
+        latency_ms = (time.time() - entry["queued_at"]) * 1000
+        if ok:
+            self.stats["flushed"] += 1
+            self.stats["last_latency_ms"] = latency_ms
+            self.stats["max_latency_ms"] = max(self.stats["max_latency_ms"], latency_ms)
+            print(f"⏱️ [WriteBehind:{self.name}] {key} flush={latency_ms:.0f}ms "
+                  f"({entry['count']} updates -> 1 PATCH, {len(entry['fields'])} campos)")
+            return True, False, 0
+
+        code = client.last_error_code
+        if code in self.PERMANENT_ERRORS or entry["attempts"] >= self.MAX_ATTEMPTS:
+            self.stats["failed"] += 1
+            print(f"❌ [WriteBehind:{self.name}] {key} descartado tras {entry['attempts']} intento(s). Código: {code}")
+            return False, False, code
+        print(f"⚠️ [WriteBehind:{self.name}] {key} falló (código {code}). Reintento {entry['attempts']}/{self.MAX_ATTEMPTS - 1}...")
+        return False, True, code
+
+    # ------------------------------- Persistencia ---------------------------
+
+    def _persist_locked(self):
+        data = {}
+        for source in (self._inflight, self._pending):
+            for k, e in source.items():
+                slot = data.setdefault(k, {"fields": {}, "etag": e["etag"], "queued_at": e["queued_at"]})
+                slot["fields"].update(e["fields"])
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            if not data:
+                if os.path.exists(self._path): os.remove(self._path)
+                return
+            tmp_path = f"{self._path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(data, f, default=str)
+            os.replace(tmp_path, self._path)
+        except Exception as e:
+            print(f"⚠️ [WriteBehind:{self.name}] No se pudo persistir la cola: {e}")
+
+    def _load_persisted(self):
+        if not os.path.exists(self._path): return
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f: data = json.load(f)
+        except Exception as e:
+            print(f"⚠️ [WriteBehind:{self.name}] Cola persistida ilegible, se descarta: {e}")
+            return
+        now = time.time()
+        for key, e in data.items():
+            self._pending[key] = {"fields": e.get("fields", {}), "etag": e.get("etag"), "queued_at": e.get("queued_at", now),
+                                  "due_at": now, "attempts": 0, "count": 1, "futures": []}
+        if self._pending: print(f"🔄 [WriteBehind:{self.name}] Reenviando {len(self._pending)} escritura(s) pendientes de la sesión anterior.")
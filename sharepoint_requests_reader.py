@@ -4,14 +4,29 @@ import threading
 import time
 from datetime import datetime, date
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import NamedTuple
 
 from dotenv import load_dotenv
 
 from ms_graph_client import MSGraphClient
 from sharepoint_config import COLUMN_MAP
+from services.write_behind_queue import WriteBehindQueue, WriteFailed
+from services.sharepoint_resolver import SharePointResolver
 
 load_dotenv()
 
+# Proyección mínima para refrescos puntuales: solo lo que consume _map_fields
+ITEM_SELECT = "id,name,eTag,webUrl,createdDateTime,lastModifiedBy,parentReference,folder,file"
+EXTRA_FIELD_SELECT = ["OutlookFails", "Status"]
+
+
+class FolderEntry(NamedTuple):
+    """Nodo del índice local de carpetas (id -> nombre, padre, ruta)."""
+    name: str
+    parent_id: str | None
+    path: str | None
+
+
 class SharePointRequestsReader:
     def __init__(self, *, max_workers: int = 6, file_cache_ttl: int = 180, root_paths: list = None):
         print("🔧 [Reader] Inicializando SharePointRequestsReader v3.0 (Multi-Root)") # DEBUG MARKER
@@ -30,7 +45,6 @@ class SharePointRequestsReader:
 
         self.root_path = self.target_paths[0] if self.target_paths else None
 
-        self.drive_id = None
         self.max_workers = max_workers
 
         # In-memory cache for per-request files
@@ -38,27 +52,69 @@ class SharePointRequestsReader:
         self._cache_lock = threading.Lock()
         self._file_cache_ttl = max(file_cache_ttl, 10)
 
-    def _get_drive_id(self):
-        """Obtiene el ID del drive (cacheado en memoria de la instancia)."""
-        if self.drive_id:
-            return self.drive_id
-            
-        endpoint = f"/sites/{self.site_id}/drives"
-        drives = self.client.get(endpoint)
-        
-        if not drives:
-            print("❌ Error: No se encontraron drives.")
-            return None
+        # Índice de carpetas (fecha / ubicación / solicitud) alimentado por el crawl y el delta
+        self._folder_index: dict[str, FolderEntry] = {}
+        self._folder_index_lock = threading.Lock()
 
-        for drive in drives.get('value', []):
-            if drive['name'] in ["Documents", "Shared Documents", "Documentos"]:
-                self.drive_id = drive['id']
-                return self.drive_id
-        
-        if drives.get('value'):
-            self.drive_id = drives['value'][0]['id']
-            return self.drive_id
-        return None
+        # Escrituras de metadatos: coalescidas por ítem y persistidas hasta confirmarse
+        self._writes = WriteBehindQueue.get("requests", self._send_metadata_patch)
+
+    @property
+    def drive_id(self):
+        """ID del drive si el resolver ya lo conoce (sin red). Para resolverlo, _get_drive_id()."""
+        return SharePointResolver().get_cached_drive_id(self.site_id)
+
+    def _get_drive_id(self):
+        """
+        ID del drive vía el resolver compartido (persistido en disco, una resolución por instalación).
+        No se guarda en la instancia: así un 404 que invalide el drive en el resolver se respeta aquí.
+        """
+        return SharePointResolver().get_drive_id(self.site_id)
+
+    # --- ÍNDICE LOCAL DE CARPETAS ---
+    def _index_drive_item(self, item, parent_path=None):
+        """Registra (o elimina) una carpeta del índice a partir de un driveItem crudo."""
+        item_id = item.get('id')
+        if not item_id: return
+        if 'deleted' in item:
+            with self._folder_index_lock:
+                self._folder_index.pop(item_id, None)
+            SharePointResolver().forget_item(item_id)
+            return
+        if 'folder' not in item: return
+
+        parent_ref = item.get('parentReference') or {}
+        parent_id = parent_ref.get('id')
+        name = item.get('name', '')
+        if parent_path is None and parent_ref.get('path'):
+            # parentReference.path viene como "/drives/{id}/root:/ruta/relativa"
+            parent_path = parent_ref['path'].split('root:', 1)[-1]
+
+        with self._folder_index_lock:
+            if parent_path is None and parent_id in self._folder_index:
+                parent_path = self._folder_index[parent_id].path
+            path = f"{parent_path.rstrip('/')}/{name}" if parent_path is not None else None
+            self._folder_index[item_id] = FolderEntry(name, parent_id, path)
+        # Siembra el caché ruta->ID compartido (lo usa RemediationService para mover carpetas)
+        if path: SharePointResolver().remember_path(path, item_id, self.site_id)
+
+    def get_folder_entry(self, folder_id):
+        with self._folder_index_lock:
+            return self._folder_index.get(folder_id)
+
+    def resolve_request_location(self, parent_id):
+        """
+        Resuelve (location_code, date_folder) de una solicitud a partir del id de su carpeta padre,
+        sin llamadas de red. Retorna (None, None) si el índice no conoce la jerarquía.
+        """
+        with self._folder_index_lock:
+            loc_entry = self._folder_index.get(parent_id)
+            if not loc_entry: return None, None
+            date_entry = self._folder_index.get(loc_entry.parent_id)
+        # Jerarquía esperada: <fecha YYYYMMDD>/<ubicación>/<solicitud>
+        if not date_entry or not (date_entry.name.isdigit() and len(date_entry.name) == 8):
+            return None, None
+        return loc_entry.name, date_entry.name
 
     def _get_items(self, item_id=None, path=None):
         """Helper para obtener items de una ruta o ID."""
@@ -83,45 +139,26 @@ class SharePointRequestsReader:
         
         clean_item = {
             "id": sp_item.get('id'),
-<<<<<<< HEAD
             "etag": sp_item.get('eTag'),
-=======
-            "etag": sp_item.get('eTag'), # NUEVO: Guardamos la versión para control de concurrencia
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             "web_url": sp_item.get('webUrl'),
             "name": sp_item.get('name'), 
             "created_at": sp_item.get('createdDateTime'),
             "download_url": sp_item.get('@microsoft.graph.downloadUrl'),
+            "parent_id": (sp_item.get('parentReference') or {}).get('id'),
             "outlook_fails": fields.get('OutlookFails'),
             "status": fields.get('Status') 
         }
 
-<<<<<<< HEAD
         for app_key, sp_key in COLUMN_MAP.items():
             val = fields.get(sp_key)
-=======
-        # 2. Mapear columnas configuradas
-        for app_key, sp_key in COLUMN_MAP.items():
-            val = fields.get(sp_key)
-            
-            # --- LÓGICA ROBUSTA PARA EDITOR (Modified By) ---
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             if app_key == "editor":
                 if isinstance(val, dict):
                     val = val.get('LookupValue')
                 elif isinstance(val, list) and len(val) > 0:
                     val = val[0].get('LookupValue')
-<<<<<<< HEAD
             if val is not None:
                 clean_item[app_key] = val
 
-=======
-            
-            if val is not None:
-                clean_item[app_key] = val
-
-        # 3. FALLBACK: Usar lastModifiedBy del driveItem si no viene en fields
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         if 'editor' not in clean_item or not clean_item['editor']:
             try:
                 editor_fallback = sp_item.get('lastModifiedBy', {}).get('user', {}).get('displayName')
@@ -132,7 +169,6 @@ class SharePointRequestsReader:
 
         return clean_item
 
-<<<<<<< HEAD
     # --- MÉTODO DELTA QUERY MULTI-ROOT (MODIFICADO FASE 3) ---
     def init_delta_links(self, date_folder_name):
         """
@@ -150,139 +186,6 @@ class SharePointRequestsReader:
             # 1. Buscar el ID de la carpeta de fecha dentro de ESTA ruta raíz
             # Usamos _get_items con path específico
             full_path = f"{root_path.strip('/')}/{date_folder_name}"
-=======
-    # --- MÉTODO DELTA QUERY (NUEVO) ---
-    def init_delta_link(self, folder_id):
-        """
-        Obtiene el 'latest' deltaLink para una carpeta.
-        Esto marca el punto de partida: 'Avísame cambios a partir de AHORA'.
-        """
-        drive_id = self._get_drive_id()
-        if not drive_id or not folder_id: return None
-        
-        # Pedimos 'latest' token para no descargar todo el historial, solo preparar monitoreo
-        endpoint = f"/sites/{self.site_id}/drives/{drive_id}/items/{folder_id}/delta?token=latest"
-        data = self.client.get(endpoint)
-        
-        if data and '@odata.deltaLink' in data:
-            return data['@odata.deltaLink']
-        
-        # Fallback: Si token=latest no es soportado, paginamos hasta el final
-        endpoint = f"/sites/{self.site_id}/drives/{drive_id}/items/{folder_id}/delta"
-        while True:
-            data = self.client.get(endpoint)
-            if not data: return None
-            
-            if '@odata.deltaLink' in data:
-                return data['@odata.deltaLink']
-            
-            if '@odata.nextLink' in data:
-                endpoint = data['@odata.nextLink']
-            else:
-                return None
-
-    def fetch_changes(self, delta_url):
-        """
-        Consulta cambios usando una URL Delta existente.
-        Retorna: (nuevo_delta_link, lista_de_cambios)
-        """
-        changes = []
-        current_url = delta_url
-        
-        while True:
-            # delta_url ya es una URL completa; usamos el cliente para pooling/reintentos/refresh.
-            response = self.client.get_raw(current_url)
-
-            if not response or response.status_code != 200:
-                status = response.status_code if response else self.client.last_error_code
-                print(f"⚠️ Error en Delta Query: {status}")
-                # Si el token expiró (410 Gone), hay que reiniciar (retornar None fuerza resync)
-                if status == 410:
-                    return None, []
-                return current_url, [] # Retornar URL vieja para reintentar
-
-            data = response.json()
-            items = data.get('value', [])
-            changes.extend(items)
-            
-            if '@odata.nextLink' in data:
-                current_url = data['@odata.nextLink']
-            elif '@odata.deltaLink' in data:
-                return data['@odata.deltaLink'], changes
-            else:
-                # Should not happen in standard delta flow
-                return current_url, changes
-
-    # --------------------------------------------------
-
-    def get_latest_metadata(self, item_id):
-        """Obtiene metadatos frescos de un solo ítem para validación antes de escribir."""
-        drive_id = self._get_drive_id()
-        if not drive_id or not item_id: return None
-        
-        # Endpoint directo al ítem específico (muy rápido)
-        endpoint = f"/sites/{self.site_id}/drives/{drive_id}/items/{item_id}?expand=listItem(expand=fields)"
-        data = self.client.get(endpoint)
-        
-        if data:
-            return self._map_fields(data)
-        return None
-
-    def get_available_date_folders(self) -> list[str]:
-        date_folders = self._get_items(path=self.root_path)
-        valid_dates = []
-        for f in date_folders:
-            name = f.get('name', '')
-            if f.get('folder') and name.isdigit() and len(name) == 8:
-                valid_dates.append(name)
-        return valid_dates
-
-    def fetch_active_requests(self, limit_dates=1, date_range: tuple[date, date] = None, *, include_unread: bool = True, progress_callback=None):
-        all_requests = []
-        print("🔄 Iniciando escaneo completo (Sync)...")
-
-        raw_folders = self._get_items(path=self.root_path)
-        valid_date_folders = []
-        for f in raw_folders:
-            name = f.get('name', '')
-            if f.get('folder') and name.isdigit() and len(name) == 8:
-                valid_date_folders.append(f)
-
-        target_folders = []
-        if date_range:
-            start_input, end_input = date_range
-            start_d = start_input if not isinstance(start_input, datetime) else start_input.date()
-            end_d = end_input if not isinstance(end_input, datetime) else end_input.date()
-
-            for f in valid_date_folders:
-                try:
-                    folder_dt = datetime.strptime(f['name'], "%Y%m%d")
-                    folder_d = folder_dt.date()
-                    if start_d <= folder_d <= end_d:
-                        target_folders.append(f)
-                except ValueError:
-                    continue
-            print(f"📅 Filtrando por rango: {start_d} - {end_d}. Carpetas encontradas: {len(target_folders)}")
-        else:
-            valid_date_folders.sort(key=lambda x: x['name'], reverse=True)
-            target_folders = valid_date_folders[:limit_dates]
-            print(f"📅 Analizando últimas {len(target_folders)} carpetas de fecha.")
-
-        start_time = time.time()
-        for i, date_folder in enumerate(target_folders):
-            if progress_callback:
-                elapsed = time.time() - start_time
-                processed_count = i
-                if processed_count > 0:
-                    avg_time_per_folder = elapsed / processed_count
-                    remaining_folders = len(target_folders) - processed_count
-                    eta_seconds = avg_time_per_folder * remaining_folders
-                    progress_callback(processed_count, len(target_folders), eta_seconds)
-                else:
-                    progress_callback(0, len(target_folders), None)
-
-            location_folders = self._get_items(item_id=date_folder['id'])
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             
             # Buscamos el ID de esa carpeta específica
             try:
@@ -290,9 +193,9 @@ class SharePointRequestsReader:
                 folder_endpoint = f"/sites/{self.site_id}/drives/{drive_id}/root:/{full_path}"
                 folder_data = self.client.get(folder_endpoint)
                 
-<<<<<<< HEAD
                 if folder_data and 'id' in folder_data:
                     folder_id = folder_data['id']
+                    self._index_drive_item(folder_data, parent_path=f"/{root_path.strip('/')}")
                     
                     # 2. Pedir Delta Token para esa carpeta
                     endpoint = f"/sites/{self.site_id}/drives/{drive_id}/items/{folder_id}/delta?token=latest"
@@ -340,22 +243,25 @@ class SharePointRequestsReader:
                 local_changes = []
                 
                 while True:
-                    response = requests.get(current_url, headers={'Authorization': f'Bearer {self.client.access_token}'})
+                    # delta_url ya es una URL completa; usamos el cliente para pooling/reintentos/refresh.
+                    response = self.client.get_raw(current_url)
+                    status = response.status_code if response is not None else self.client.last_error_code
                     
-                    if response.status_code == 410: # Gone (Token expirado)
+                    if status == 410: # Gone (Token expirado)
                         print(f"⚠️ Token expirado para {root_path}. Se requiere reinicio.")
                         return None, [] # Forzar resync global
                     
-                    if response.status_code != 200:
-                        print(f"⚠️ Error polling {root_path}: {response.status_code}")
+                    if status != 200:
+                        print(f"⚠️ Error polling {root_path}: {status}")
                         break 
                         
                     data = response.json()
                     items = data.get('value', [])
                     
-                    # Inyectar origen para trazabilidad
+                    # Inyectar origen para trazabilidad y alimentar el índice de carpetas
                     for item in items:
                         item['_source_root'] = root_path
+                        self._index_drive_item(item)
                         
                     local_changes.extend(items)
                     
@@ -374,16 +280,49 @@ class SharePointRequestsReader:
                 
         return new_map, all_changes
 
-    # Mantenemos métodos legacy por si acaso, pero fetch_active_requests es el principal
+    def _projection_query(self):
+        """Query string con $select: columnas de COLUMN_MAP + eTag/parentReference."""
+        field_names = list(dict.fromkeys(EXTRA_FIELD_SELECT + list(COLUMN_MAP.values())))
+        return f"$select={ITEM_SELECT}&$expand=listItem($select=id;$expand=fields($select={','.join(field_names)}))"
+
     def get_latest_metadata(self, item_id):
+        """Obtiene metadatos frescos de un solo ítem (proyección reducida)."""
         drive_id = self._get_drive_id()
         if not drive_id or not item_id: return None
-        endpoint = f"/sites/{self.site_id}/drives/{drive_id}/items/{item_id}?expand=listItem(expand=fields)"
+        endpoint = f"/sites/{self.site_id}/drives/{drive_id}/items/{item_id}?{self._projection_query()}"
         data = self.client.get(endpoint)
         if data:
             return self._map_fields(data)
         return None
 
+    def get_latest_metadata_batch(self, item_ids):
+        """
+        Refresca varios ítems con JSON batching ($batch, 20 por envelope).
+        Retorna {item_id: metadatos_mapeados}; los ítems que fallen dentro del lote
+        se reintentan individualmente.
+        """
+        drive_id = self._get_drive_id()
+        unique_ids = list(dict.fromkeys(i for i in item_ids if i))
+        if not drive_id or not unique_ids: return {}
+
+        results = {}
+        failed = []
+        query = self._projection_query()
+
+        sub_requests = [{"method": "GET", "url": f"/sites/{self.site_id}/drives/{drive_id}/items/{item_id}?{query}"}
+                        for item_id in unique_ids]
+        for item_id, sub in zip(unique_ids, self.client.send_batch(sub_requests)):
+            if sub and sub.get('status') == 200 and sub.get('body'):
+                results[item_id] = self._map_fields(sub['body'])
+            elif not sub or sub.get('status') != 404:
+                failed.append(item_id)
+
+        for item_id in failed:
+            fresh = self.get_latest_metadata(item_id)
+            if fresh: results[item_id] = fresh
+
+        return results
+
     def get_available_date_folders(self) -> list[str]:
         valid_dates = set()
         for root_path in self.target_paths:
@@ -409,11 +348,13 @@ class SharePointRequestsReader:
             print(f"   📂 Escaneando raíz: {root_path}")
             
             raw_folders = self._get_items(path=root_path)
+            root_prefix = f"/{root_path.strip('/')}"
             valid_date_folders = []
             for f in raw_folders:
                 name = f.get('name', '')
                 if f.get('folder') and name.isdigit() and len(name) == 8:
                     valid_date_folders.append(f)
+                    self._index_drive_item(f, parent_path=root_prefix)
 
             target_folders = []
             if date_range:
@@ -448,14 +389,17 @@ class SharePointRequestsReader:
                         progress_callback(steps_done, total_steps, eta)
 
                 location_folders = self._get_items(item_id=date_folder['id'])
+                date_path = f"{root_prefix}/{date_folder['name']}"
                 
                 for loc_folder in location_folders:
                     if not loc_folder.get('folder'): continue
+                    self._index_drive_item(loc_folder, parent_path=date_path)
                     
                     requests_items = self._get_items(item_id=loc_folder['id'])
                     
                     for req in requests_items:
                         if not req.get('folder'): continue 
+                        self._index_drive_item(req, parent_path=f"{date_path}/{loc_folder['name']}")
                         
                         clean_req = self._map_fields(req)
                         clean_req['location_code'] = loc_folder['name']
@@ -463,17 +407,6 @@ class SharePointRequestsReader:
                         clean_req['_source_root'] = root_path 
                         
                         all_requests.append(clean_req)
-=======
-                requests_items = self._get_items(item_id=loc_folder['id'])
-                
-                for req in requests_items:
-                    if not req.get('folder'): continue 
-                    
-                    clean_req = self._map_fields(req)
-                    clean_req['location_code'] = loc_folder['name']
-                    clean_req['date_folder'] = date_folder['name']
-                    all_requests.append(clean_req)
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
 
         if include_unread and all_requests:
             self._hydrate_unread_counts(all_requests)
@@ -522,13 +455,10 @@ class SharePointRequestsReader:
         return clean_files
 
     def get_unread_email_count(self, request_id: str, *, force_refresh: bool = False) -> int:
-<<<<<<< HEAD
         metrics = self.get_folder_metrics(request_id, force_refresh=force_refresh)
         return metrics['unread']
 
     def get_folder_metrics(self, request_id: str, *, force_refresh: bool = False) -> dict:
-=======
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         files = self.get_request_files(request_id, use_cache=not force_refresh)
         unread_count = 0
         has_failure = False
@@ -574,29 +504,19 @@ class SharePointRequestsReader:
             print(f"Excepción al descargar: {e}")
             return None
 
-<<<<<<< HEAD
     def update_request_metadata(self, item_id, new_status=None, new_priority=None, new_category=None, 
                                 new_reply_limit=..., new_resolve_limit=...,
                                 new_reply_time=..., new_resolve_time=...,
                                 new_comments=None, 
-                                etag=None): 
-=======
-    # MODIFICADO PARA ETAG Y CONCURRENCIA
-    def update_request_metadata(self, item_id, new_status=None, new_priority=None, new_category=None, 
-                                new_reply_limit=..., new_resolve_limit=...,
-                                new_reply_time=..., new_resolve_time=...,
-                                etag=None): # NUEVO PARAMETRO
+                                etag=None, *, wait=True): 
         """
-        Actualiza metadatos con soporte de Concurrencia Optimista (If-Match).
+        Encola el cambio en la cola write-behind (un PATCH por ítem y ventana).
+        wait=True retorna el resultado real de SharePoint; wait=False retorna el Future de la cola
+        (resuelve a True o lanza WriteFailed con el código HTTP).
         """
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
-        drive_id = self._get_drive_id()
-        if not drive_id or not item_id: return False
-
-        endpoint = f"/sites/{self.site_id}/drives/{drive_id}/items/{item_id}/listItem/fields"
+        if not item_id: return False
         payload = {}
         
-<<<<<<< HEAD
         if new_status: payload[COLUMN_MAP['status']] = new_status
         if new_priority: payload[COLUMN_MAP['priority']] = new_priority
         if new_category: payload[COLUMN_MAP['category']] = new_category
@@ -605,39 +525,30 @@ class SharePointRequestsReader:
         if new_reply_time is not ...: payload[COLUMN_MAP['reply_time']] = new_reply_time
         if new_resolve_time is not ...: payload[COLUMN_MAP['resolve_time']] = new_resolve_time
         if new_comments is not None: payload[COLUMN_MAP['comments']] = new_comments
-=======
-        if new_status:
-            payload[COLUMN_MAP['status']] = new_status
-        if new_priority:
-            payload[COLUMN_MAP['priority']] = new_priority
-        if new_category:
-            payload[COLUMN_MAP['category']] = new_category
-            
-        if new_reply_limit is not ...:
-            payload[COLUMN_MAP['reply_limit']] = new_reply_limit
-        if new_resolve_limit is not ...:
-            payload[COLUMN_MAP['resolve_limit']] = new_resolve_limit
-        if new_reply_time is not ...:
-            payload[COLUMN_MAP['reply_time']] = new_reply_time
-        if new_resolve_time is not ...:
-            payload[COLUMN_MAP['resolve_time']] = new_resolve_time
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             
         if not payload: return False
 
+        future = self._writes.enqueue(item_id, payload, etag=etag)
+        if not wait: return future
+        try:
+            return future.result(timeout=120)
+        except WriteFailed as e:
+            print(f"❌ Fallo definitivo al guardar {item_id}. Código: {e.status}")
+            return False
+        except Exception as e:
+            print(f"❌ Sin respuesta de la cola de escritura para {item_id}: {e}")
+            return False
+
+    def _send_metadata_patch(self, item_id, payload, etag=None):
+        """Envío real (lo invoca el hilo de la cola write-behind)."""
+        drive_id = self._get_drive_id()
+        if not drive_id: return False
+
+        endpoint = f"/sites/{self.site_id}/drives/{drive_id}/items/{item_id}/listItem/fields"
         print(f"🔄 Actualizando item {item_id}: {payload}")
         
         headers = {}
-<<<<<<< HEAD
         if etag: headers['If-Match'] = etag
             
         result = self.client.patch(endpoint, payload, extra_headers=headers)
-=======
-        if etag:
-            headers['If-Match'] = etag
-            
-        result = self.client.patch(endpoint, payload, extra_headers=headers)
-        
-        # Si devuelve None y el código fue 412, MSGraphClient lo registró en last_error_code
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
-        return result is not None
\ No newline at end of file
+        return result is not None
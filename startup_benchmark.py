@@ -0,0 +1,104 @@
+"""
+Benchmark de arranque basado en `python -X importtime`.
+
+Importa main.py (sin abrir la ventana: ft.app solo corre bajo __main__) en un proceso nuevo,
+suma el tiempo de import por paquete raíz y lo compara con el presupuesto.
+Además verifica que los módulos pesados de carga diferida no se importen al arrancar.
+
+Uso:
+    python startup_benchmark.py [--runs 3] [--budget-ms 1500] [--top 15]
+Sale con código 1 si se supera el presupuesto o si se cargó un módulo diferido.
+"""
+import os
+import sys
+import argparse
+import subprocess
+from collections import defaultdict
+
+# Solo deben importarse al primer uso (leer Excel, lanzar el bot, autenticar)
+DEFERRED_MODULES = ("pandas", "selenium", "webdriver_manager", "azure.identity", "msal")
+# Importados por el intérprete antes de ejecutar -c (no son coste de la app)
+INTERPRETER_MODULES = ("_frozen_importlib_external", "zipimport", "encodings", "_signal", "io", "site",
+                       "_io", "marshal", "posix", "nt", "winreg", "_codecs", "codecs", "abc", "_abc", "time")
+
+
+def run_importtime(target="main"):
+    """Retorna [(self_us, cumulative_us, nombre, profundidad)] de un import en frío."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=root, capture_output=True, text=True, encoding="utf-8", errors="replace",
+    )
+    if proc.returncode != 0:
+        print(f"❌ Falló 'import {target}':\n{proc.stderr[-2000:]}")
+        sys.exit(2)
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line: continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            # Un espacio de separación + 2 por nivel: " json" es profundidad 0, "   json.decoder" es 1
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            rows.append((int(self_us), int(cumulative_us), name.strip(), depth))
+        except ValueError:
+            continue
+    return rows
+
+
+def summarize(rows):
+    """
+    El acumulado de un import de nivel 0 ya incluye a sus hijos: solo se suman las filas
+    depth == 0. Los árboles del arranque del intérprete (site, encodings, ...) se descartan.
+    """
+    # importtime lista los hijos antes que su padre: cada fila de nivel 0 cierra su árbol
+    app_rows, tree = [], []
+    for row in rows:
+        tree.append(row)
+        if row[3] != 0: continue
+        if row[2].split(".")[0] not in INTERPRETER_MODULES: app_rows.extend(tree)
+        tree = []
+
+    total_us = sum(cum for _, cum, _, depth in app_rows if depth == 0)
+    by_package = defaultdict(int)
+    for self_us, _, name, _ in app_rows:
+        by_package[name.split(".")[0]] += self_us
+    loaded = {name for _, _, name, _ in rows}
+    deferred_hits = sorted(m for m in DEFERRED_MODULES if m in loaded)
+    return total_us, by_package, deferred_hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Presupuesto de tiempo de import de C.A.R.O.L")
+    parser.add_argument("--runs", type=int, default=3, help="Repeticiones (se reporta la más rápida)")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="Presupuesto total de imports")
+    parser.add_argument("--top", type=int, default=15, help="Paquetes a listar")
+    parser.add_argument("--target", default="main", help="Módulo a importar")
+    args = parser.parse_args()
+
+    best = None
+    for i in range(max(1, args.runs)):
+        result = summarize(run_importtime(args.target))
+        print(f"⏱️ Corrida {i + 1}: {result[0] / 1000:.0f}ms")
+        if best is None or result[0] < best[0]: best = result
+
+    total_us, by_package, deferred_hits = best
+    print("\n📦 Paquetes más costosos (tiempo propio, corrida más rápida):")
+    for pkg, us in sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f"   {us / 1000:8.1f}ms  {pkg}")
+
+    ok = True
+    total_ms = total_us / 1000
+    if total_ms > args.budget_ms:
+        print(f"\n❌ Imports: {total_ms:.0f}ms (presupuesto {args.budget_ms:.0f}ms)")
+        ok = False
+    else:
+        print(f"\n✅ Imports: {total_ms:.0f}ms (presupuesto {args.budget_ms:.0f}ms)")
+    if deferred_hits:
+        print(f"❌ Módulos de carga diferida importados al arrancar: {', '.join(deferred_hits)}")
+        ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import json
 import threading
 from ui.styles import SSA_GREEN, SSA_GREY, SSA_WHITE, SSA_BG, SSA_BORDER
 from services.employee_info_service import EmployeeInfoService
+from services.facet_service import FacetService
 from services.user_service import UserService
 from ui.timecard_view import TimecardView
 
@@ -34,8 +35,9 @@ class ActionsView(ft.Container):
 
     def did_mount(self):
         """Se ejecuta cuando el control es agregado a la página. Seguro para iniciar cargas."""
-        self._init_pay_group_loader()
-        self._init_status_loader()
+        self._init_facet_loader()
+        # Precarga del directorio local: las búsquedas pasan a resolverse en memoria
+        threading.Thread(target=lambda: self.employee_service.directory.ensure_loaded(), daemon=True).start()
 
     @property
     def employee_service(self):
@@ -59,53 +61,60 @@ class ActionsView(ft.Container):
         except: pass
         return "Unknown User"
 
-    def _init_pay_group_loader(self):
+    def _init_facet_loader(self):
+        """Una sola pasada para ambas facetas (Pay Group y Status), con su conteo exacto."""
         def load():
             try:
-                groups = self.employee_service.get_unique_pay_groups()
-                # Agregamos opción "Any" para poder limpiar el filtro desde el dropdown
-                options = [ft.dropdown.Option("Any")] + [ft.dropdown.Option(g) for g in groups]
-                self.pay_group_dropdown.options = options
-                self.pay_group_dropdown.disabled = False
-                
-                # UPDATE SEGURO: Solo si el control sigue vivo en la página
-                if self.pay_group_dropdown.page:
-                    self.pay_group_dropdown.update()
+                facets = self.employee_service.facets.get_facets()
             except Exception as e:
-                print(f"Error loading pay groups: {e}")
+                print(f"Error loading facets: {e}")
+                return
+            self._apply_pay_group_facet(facets.get("pay_group") or {})
+            self._apply_status_facet(facets.get("status") or {})
 
         threading.Thread(target=load, daemon=True).start()
 
-    def _init_status_loader(self):
-        def load():
-            try:
-                statuses = self.employee_service.get_unique_statuses()
-                if not statuses: return
-                
-                chips = []
-                for s in statuses:
-                    chips.append(
-                        ft.Chip(
-                            label=ft.Text(s, size=12, weight=ft.FontWeight.W_500),
-                            data=s,
-                            on_select=self._on_status_chip_select,
-                            bgcolor=ft.Colors.WHITE,
-                            selected_color=SSA_GREEN,
-                            label_style=ft.TextStyle(color=SSA_GREY), # Color por defecto
-                            check_color=ft.Colors.WHITE,
-                            shape=ft.RoundedRectangleBorder(radius=6),
-                        )
-                    )
-                
-                self.status_chips_row.controls = chips
-                
-                # UPDATE SEGURO: Solo si el control sigue vivo en la página
-                if self.status_chips_row.page:
-                    self.status_chips_row.update()
-            except Exception as e:
-                print(f"Error loading statuses: {e}")
+    def _apply_pay_group_facet(self, counts):
+        try:
+            groups = FacetService.sorted_values(counts)
+            # Agregamos opción "Any" para poder limpiar el filtro desde el dropdown
+            options = [ft.dropdown.Option("Any")] + [ft.dropdown.Option(key=g, text=f"{g} ({counts[g]})") for g in groups]
+            self.pay_group_dropdown.options = options
+            self.pay_group_dropdown.disabled = False
+            
+            # UPDATE SEGURO: Solo si el control sigue vivo en la página
+            if self.pay_group_dropdown.page:
+                self.pay_group_dropdown.update()
+        except Exception as e:
+            print(f"Error loading pay groups: {e}")
 
-        threading.Thread(target=load, daemon=True).start()
+    def _apply_status_facet(self, counts):
+        try:
+            statuses = FacetService.sorted_values(counts)
+            if not statuses: return
+            
+            chips = []
+            for s in statuses:
+                chips.append(
+                    ft.Chip(
+                        label=ft.Text(f"{s} ({counts[s]})", size=12, weight=ft.FontWeight.W_500),
+                        data=s,
+                        on_select=self._on_status_chip_select,
+                        bgcolor=ft.Colors.WHITE,
+                        selected_color=SSA_GREEN,
+                        label_style=ft.TextStyle(color=SSA_GREY), # Color por defecto
+                        check_color=ft.Colors.WHITE,
+                        shape=ft.RoundedRectangleBorder(radius=6),
+                    )
+                )
+            
+            self.status_chips_row.controls = chips
+            
+            # UPDATE SEGURO: Solo si el control sigue vivo en la página
+            if self.status_chips_row.page:
+                self.status_chips_row.update()
+        except Exception as e:
+            print(f"Error loading statuses: {e}")
 
     def _on_status_chip_select(self, e):
         clicked_chip = e.control
@@ -554,22 +563,15 @@ class ActionsView(ft.Container):
             raw_fields = emp.get("_raw_fields", {})
             old_val = raw_fields.get(target_field_internal_name, "Unknown")
             
-            current_history_raw = emp.get("_raw_history_json", "")
-            
-            new_history_json = self.employee_service.append_history_entry(
-                current_raw_json=current_history_raw,
+            new_history_json = self.employee_service.update_field_with_history(
+                sp_item_id,
+                target_field_internal_name,
+                chosen_value,
                 user_display_name=real_user_name,
                 field_label=field_label_friendly,
-                old_value=old_val,
-                new_value=chosen_value
+                old_value=old_val
             )
-            
-            updates = {
-                target_field_internal_name: chosen_value,
-                self.employee_service.COL_MAP["CHANGE_HISTORY"]: new_history_json
-            }
-
-            self.employee_service.update_employee_fields(sp_item_id, updates)
+            if new_history_json is None: raise RuntimeError("SharePoint rejected the update")
 
             emp["_raw_fields"][target_field_internal_name] = chosen_value
             emp["_raw_history_json"] = new_history_json
@@ -581,7 +583,7 @@ class ActionsView(ft.Container):
                 emp["_raw_fields"].get(c["HOURLY_RATE_2"]),
             )
             emp["pay_info"] = new_pay_info
-            emp["change_history"] = self.employee_service._parse_change_history(new_history_json)
+            emp["change_history"] = self.employee_service._parse_change_history(new_history_json, self.employee_service.HISTORY_LIMIT)
 
             self.page.snack_bar = ft.SnackBar(ft.Text(f"Updated {field_label_friendly} to {chosen_value}"))
             self.page.snack_bar.open = True
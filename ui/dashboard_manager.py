@@ -2,16 +2,11 @@ import flet as ft
 import threading
 import time
 import os
-<<<<<<< HEAD
 import json
 import webbrowser
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from dataclasses import dataclass
-=======
-import json # Necesario para persistencia de preferencias
-import webbrowser
-from datetime import datetime, timezone
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
 
 from sharepoint_requests_reader import SharePointRequestsReader
 from deadline_calculator import DeadlineCalculator
@@ -28,8 +23,8 @@ from ui.components import LiveStatBadge
 from ui.remediation_dialog import RemediationDialog
 from ui.calendar_view import CalendarView
 from ui.help_tour import HelpTourDialog 
-<<<<<<< HEAD
 from services.path_manager import PathManager
+from services.write_behind_queue import WriteFailed
 
 # --- Importar decorador de errores ---
 from error_tracking import track_errors
@@ -42,37 +37,41 @@ class RestoredDataset:
     meta_cache: dict
     processed_requests: list
 
-class DashboardManager:
+@dataclass(frozen=True)
+class StateSnapshot:
     """
-    Controlador principal de la lógica de UI.
+    Estado en caliente entregado entre instancias del manager (Soft Reset).
+    Los contenedores se transfieren por referencia: el manager origen se desprende de ellos
+    al exportarlos, por lo que nadie más los muta y no hace falta copiarlos.
     """
-    
-    def __init__(self, page: ft.Page, tabs_control: ft.Tabs, loading_container: ft.Container, status_text_control: ft.Text, welcome_large_control: ft.Text, user_name_small_control: ft.Text, notification_center=None):
-        self.page = page
-        self.tabs = tabs_control
-        self.loading_container = loading_container 
-=======
-
-# --- NUEVO: Importar decorador de errores ---
-from error_tracking import track_errors
+    version: int
+    taken_at: float
+    requests_data: dict
+    requests_state: dict
+    requests_meta: dict
+    current_cycle_date: str | None
+    delta_links_map: dict
+    active_limit_dates: int
+    active_date_range: tuple | None
+    current_user: dict | None
+    available_dates: list
+    valid_locations: set
+    locations_db: list
+    selected_tab: str | None = None
 
 class DashboardManager:
     """
     Controlador principal de la lógica de UI.
-    Aplica patrones de fachada para servicios y gestión de estado local.
     """
-    PREFS_FILE = "user_prefs.json" # Archivo local para simulación de persistencia
-
-    def __init__(self, page: ft.Page, tabs_control: ft.Tabs, loading_container: ft.Container, status_text_control: ft.Text, welcome_large_control: ft.Text, user_name_small_control: ft.Text):
+    
+    def __init__(self, page: ft.Page, tabs_control: ft.Tabs, loading_container: ft.Container, status_text_control: ft.Text, welcome_large_control: ft.Text, user_name_small_control: ft.Text, notification_center=None):
         self.page = page
         self.tabs = tabs_control
-        self.loading_container = loading_container
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
+        self.loading_container = loading_container 
         self.status_text = status_text_control
         self.welcome_large = welcome_large_control
         self.user_name_small = user_name_small_control
 
-<<<<<<< HEAD
         self.PREFS_FILE = PathManager.get_user_prefs_path()
         self._ui_lock = threading.Lock()
 
@@ -84,12 +83,6 @@ class DashboardManager:
             self.notifier.set_visual_center(notification_center)
             notification_center.set_manager(self.notifier)
 
-=======
-        # --- INYECCIÓN DE SERVICIOS ---
-        self.reader = SharePointRequestsReader()
-        self.calculator = DeadlineCalculator()
-        self.notifier = NotificationManager(page)
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.data_service = RequestDataService(self.reader, self.calculator)
         self.location_service = LocationService()
         self.remediation_service = RemediationService(self.reader)
@@ -104,7 +97,6 @@ class DashboardManager:
         self.tab_refs = {}
         self.current_user = None 
         
-<<<<<<< HEAD
         self.active_limit_dates = 1
         self.active_date_range = None
         self.current_cycle_date = None
@@ -118,50 +110,24 @@ class DashboardManager:
         self.filter_status = ["Pending", "In Progress", "Done", "No Action Needed"]
         self.search_results_info = ft.Text("", size=12, color=SSA_GREEN, weight=ft.FontWeight.BOLD)
         
-=======
-        # Filtros Activos
-        self.active_limit_dates = 1
-        self.active_date_range = None
-        self.current_cycle_date = None
-        self.current_cycle_folder_id = None 
-        self.delta_link = None              
-        
-        # Calendario
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.available_dates = []
         self.calendar_dialog = None
         self.calendar_btn_text = ft.Text("Select Period", size=12, color=SSA_GREY)
         
-<<<<<<< HEAD
-=======
-        # Cierre de Ciclo UI
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.close_cycle_btn = None 
         self.close_confirm_dialog = None
         self.next_cycle_picker = None
         self.next_cycle_input = None
         
-<<<<<<< HEAD
-=======
-        # Diálogo de Confirmación de Propiedad
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.ownership_confirm_dialog = None
         self.ownership_confirm_text = ft.Text("")
         self.ownership_pending_change = None 
         
-<<<<<<< HEAD
         self.help_dialog = None 
-=======
-        # Ayuda
-        self.help_dialog = None 
-
-        # Caches de Sincronización
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.requests_state_cache = {}
         self.requests_meta_cache = {}
         self.requests_data_cache = {}
         
-<<<<<<< HEAD
         self.comment_dialog = None
         self.comment_input = None
         self.comment_req_id = None 
@@ -172,62 +138,85 @@ class DashboardManager:
         self._is_first_load = True 
         self._is_rendering = False
         
-=======
-        self._polling_active = False
-        self._is_first_load = True # Bandera para controlar el tour al inicio
-        
-        # Cargar reglas en segundo plano
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
-        def delayed_load():
-            time.sleep(2)
-            self.rules_service.load_data()
-        threading.Thread(target=delayed_load, daemon=True).start()
+        # Versión monotónica del store de solicitudes (se incrementa en cada mutación)
+        self._store_version = 0
+
+        # Arranque en paralelo (ver warm_up); data_ready se activa al terminar la primera carga
+        self._warmup = {}
+        self.data_ready = threading.Event()
 
         self._init_dialogs()
 
-<<<<<<< HEAD
+    def _bump_store_version(self):
+        self._store_version += 1
+
+    def _selected_tab_name(self):
+        try:
+            selected = self.tabs.tabs[self.tabs.selected_index or 0]
+        except (IndexError, TypeError):
+            return None
+        return next((name for name, tab in self.tab_refs.items() if tab is selected), None)
+
     def get_state_snapshot(self):
-        print("🧠 [Manager] Exportando estado en caliente...")
-        return {
-            "requests_data": self.requests_data_cache.copy(),
-            "requests_state": self.requests_state_cache.copy(),
-            "requests_meta": self.requests_meta_cache.copy(),
-            "current_cycle_date": self.current_cycle_date,
-            "delta_links_map": self.delta_links_map.copy(), # [MODIFICADO] Guardar mapa
-            "active_limit_dates": self.active_limit_dates,
-            "active_date_range": self.active_date_range,
-            "current_user": self.current_user,
-            "available_dates": self.available_dates,
-            "valid_locations": self.location_service.valid_locations.copy(),
-            "locations_db": self.location_service.locations_db.copy()
-        }
+        """
+        Exporta el estado SIN copias: entrega las referencias del store y deja a esta
+        instancia con contenedores vacíos. Llamar después de stop_polling().
+        """
+        print(f"🧠 [Manager] Exportando estado en caliente (v{self._store_version})...")
+        snapshot = StateSnapshot(
+            version=self._store_version,
+            taken_at=time.time(),
+            requests_data=self.requests_data_cache,
+            requests_state=self.requests_state_cache,
+            requests_meta=self.requests_meta_cache,
+            current_cycle_date=self.current_cycle_date,
+            delta_links_map=self.delta_links_map,
+            active_limit_dates=self.active_limit_dates,
+            active_date_range=self.active_date_range,
+            current_user=self.current_user,
+            available_dates=self.available_dates,
+            valid_locations=self.location_service.valid_locations,
+            locations_db=self.location_service.locations_db,
+            selected_tab=self._selected_tab_name()
+        )
+        # Desprendimiento: hilos rezagados de esta instancia ya no pueden tocar el store entregado
+        self.requests_data_cache = {}
+        self.requests_state_cache = {}
+        self.requests_meta_cache = {}
+        self.delta_links_map = {}
+        return snapshot
 
     def restore_state_snapshot(self, snapshot):
         try:
-            print("💉 [Manager] Inyectando estado recuperado...")
+            if not snapshot or not snapshot.version or not snapshot.requests_data:
+                print("⚠️ [Manager] Snapshot vacío, se requiere carga completa.")
+                return False
+
+            print(f"💉 [Manager] Inyectando estado recuperado (v{snapshot.version}, {len(snapshot.requests_data)} solicitudes)...")
+            t0 = time.perf_counter()
             
-            if snapshot.get("valid_locations"):
-                self.location_service.valid_locations = snapshot["valid_locations"]
-                self.location_service.locations_db = snapshot.get("locations_db", [])
+            if snapshot.valid_locations:
+                self.location_service.valid_locations = snapshot.valid_locations
+                self.location_service.locations_db = snapshot.locations_db
             else:
                 threading.Thread(target=self.location_service.load_locations, daemon=True).start()
 
-            self.requests_data_cache = snapshot.get("requests_data", {})
-            self.requests_state_cache = snapshot.get("requests_state", {})
-            self.requests_meta_cache = snapshot.get("requests_meta", {})
-            self.current_cycle_date = snapshot.get("current_cycle_date")
-            
-            # [MODIFICADO] Restaurar mapa de tokens
-            self.delta_links_map = snapshot.get("delta_links_map", {}) 
-            
-            self.active_limit_dates = snapshot.get("active_limit_dates", 1)
-            self.active_date_range = snapshot.get("active_date_range")
-            self.current_user = snapshot.get("current_user")
-            self.available_dates = snapshot.get("available_dates", [])
+            # Adopción directa del store (sin copias ni DeadlineCalculator)
+            self.requests_data_cache = snapshot.requests_data
+            self.requests_state_cache = snapshot.requests_state
+            self.requests_meta_cache = snapshot.requests_meta
+            self.current_cycle_date = snapshot.current_cycle_date
+            self.delta_links_map = snapshot.delta_links_map
+            self.active_limit_dates = snapshot.active_limit_dates
+            self.active_date_range = snapshot.active_date_range
+            self.current_user = snapshot.current_user
+            self.available_dates = snapshot.available_dates
+            self._store_version = snapshot.version
 
             if self.current_user:
                 self.user_name_small.value = self.current_user.get('displayName', '')
                 self.safe_update()
+            t_adopt = time.perf_counter()
 
             todo_list = []
             grouped = {cat: [] for cat in ["Request", "Staff Movements", "Inquiry", "Information", "New Email"]}
@@ -249,11 +238,18 @@ class DashboardManager:
                 meta_cache=self.requests_meta_cache,
                 processed_requests=processed_all
             )
+            t_group = time.perf_counter()
 
-            self.render_dataset(dataset)
+            self.render_dataset(dataset, first_tab=snapshot.selected_tab)
+            t_render = time.perf_counter()
+            
             self.update_close_cycle_button()
             self.start()
             
+            print(
+                f"⏱️ [Manager] Restauración: adopt={(t_adopt - t0) * 1000:.1f}ms "
+                f"group={(t_group - t_adopt) * 1000:.1f}ms render={(t_render - t_group) * 1000:.1f}ms"
+            )
             print("✅ [Manager] Restauración exitosa.")
             return True
 
@@ -285,40 +281,10 @@ class DashboardManager:
         prefs = self._load_prefs()
         hide = prefs.get("hide_tour", False) or prefs.get("dont_show_tour", False)
         if not hide:
-=======
-    # --- GESTIÓN DE PREFERENCIAS (Simulación Local) ---
-    def _load_prefs(self):
-        """Carga preferencias del usuario desde un JSON local."""
-        try:
-            if os.path.exists(self.PREFS_FILE):
-                with open(self.PREFS_FILE, 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"Error cargando prefs: {e}")
-        return {}
-
-    def _save_pref(self, key, value):
-        """Guarda una preferencia en el JSON local."""
-        prefs = self._load_prefs()
-        prefs[key] = value
-        try:
-            with open(self.PREFS_FILE, 'w') as f:
-                json.dump(prefs, f)
-        except Exception as e:
-            print(f"Error guardando prefs: {e}")
-
-    def check_and_show_tour(self):
-        """Verifica si debe mostrar el tour y lo abre si corresponde."""
-        prefs = self._load_prefs()
-        # Si NO está marcado 'dont_show_tour', lo mostramos
-        if not prefs.get("dont_show_tour", False):
-            # Pequeño delay para asegurar que la UI principal ya se pintó
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             time.sleep(0.5) 
             self.open_help_tour()
 
     def on_tour_dismiss(self, dont_show_again):
-<<<<<<< HEAD
         if dont_show_again:
             self._save_pref("hide_tour", True)
             self.notifier.send("Preferences Saved", "You won't see the tour again.", "success")
@@ -421,30 +387,10 @@ class DashboardManager:
         self.help_dialog.dont_show_checkbox.value = False 
         self.help_dialog.current_step = 0
         self.help_dialog.update_view()
-=======
-        """Callback ejecutado cuando el usuario cierra el tour."""
-        if dont_show_again:
-            self._save_pref("dont_show_tour", True)
-            self.notifier.send("Preferences Saved", "You won't see the tour again.", "success")
-
-    # --- MÉTODOS EXISTENTES (Modificados) ---
-
-    def open_help_tour(self, e=None):
-        # Lazy Loading con inyección del callback
-        if not self.help_dialog:
-            self.help_dialog = HelpTourDialog(self.page, on_dismiss_callback=self.on_tour_dismiss)
-        
-        # Resetear checkbox visualmente cada vez que se abre manualmente
-        self.help_dialog.dont_show_checkbox.value = False 
-        self.help_dialog.current_step = 0
-        self.help_dialog.update_view()
-        
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.page.open(self.help_dialog)
         self.page.update()
 
     def _init_dialogs(self):
-<<<<<<< HEAD
         self.mail_loading_dialog = ft.AlertDialog(modal=True, title=ft.Text("Opening Mail...", size=18, weight=ft.FontWeight.BOLD, color=SSA_GREY), content=ft.Container(content=ft.Column([ft.ProgressRing(color=SSA_GREEN), ft.Text("Downloading content...\nLaunching Outlook...", size=14, color=SSA_GREY)], spacing=20, alignment=ft.MainAxisAlignment.CENTER, height=100), padding=20, height=150), actions=[])
         self.legacy_loading_dialog = ft.AlertDialog(modal=True, title=ft.Text("Emergency Mode...", size=18, weight=ft.FontWeight.BOLD, color=ft.Colors.BLUE_GREY_700), content=ft.Container(content=ft.Column([ft.ProgressRing(color=ft.Colors.BLUE_GREY_400), ft.Text("Fixing issues of new outlook...\nLaunching Classic Outlook...", size=14, color=SSA_GREY)], spacing=20, alignment=ft.MainAxisAlignment.CENTER, height=100), padding=20, height=150), actions=[])
         self.detail_title = ft.Text("", size=20, weight=ft.FontWeight.BOLD, color=SSA_GREY)
@@ -467,154 +413,6 @@ class DashboardManager:
         self.comment_input = ft.TextField(multiline=True, min_lines=3, max_lines=8, hint_text="Write a comment...", border_radius=8)
         self.comment_info_text = ft.Text("", size=11, color=ft.Colors.GREY_600, italic=True)
         self.comment_dialog = ft.AlertDialog(modal=True, title=ft.Text("Comments", weight=ft.FontWeight.BOLD), content=ft.Container(content=ft.Column([self.comment_info_text, self.comment_input], tight=True, spacing=10), width=500), actions=[ft.TextButton("Cancel", on_click=lambda e: self.page.close(self.comment_dialog)), ft.ElevatedButton("Save Comment", bgcolor=SSA_GREEN, color="white", on_click=self.save_comment)], actions_alignment=ft.MainAxisAlignment.END)
-=======
-        self.mail_loading_dialog = ft.AlertDialog(
-            modal=True, 
-            title=ft.Text("Opening Mail...", size=18, weight=ft.FontWeight.BOLD, color=SSA_GREY),
-            content=ft.Container(
-                content=ft.Column([
-                    ft.ProgressRing(color=SSA_GREEN), 
-                    ft.Text("Downloading content...\nLaunching Outlook...", size=14, color=SSA_GREY)
-                ], spacing=20, alignment=ft.MainAxisAlignment.CENTER, height=100), 
-                padding=20, height=150
-            ), 
-            actions=[],
-        )
-        
-        self.legacy_loading_dialog = ft.AlertDialog(
-            modal=True, 
-            title=ft.Text("Emergency Mode...", size=18, weight=ft.FontWeight.BOLD, color=ft.Colors.BLUE_GREY_700),
-            content=ft.Container(
-                content=ft.Column([
-                    ft.ProgressRing(color=ft.Colors.BLUE_GREY_400), 
-                    ft.Text("Fixing issues of new outlook...\nLaunching Classic Outlook...", size=14, color=SSA_GREY)
-                ], spacing=20, alignment=ft.MainAxisAlignment.CENTER, height=100), 
-                padding=20, height=150
-            ), 
-            actions=[],
-        )
-        
-        self.detail_title = ft.Text("", size=20, weight=ft.FontWeight.BOLD, color=SSA_GREY)
-        self.detail_subtitle = ft.Text("", size=12, color=ft.Colors.GREY)
-        self.detail_files_list = ft.ListView(expand=True, spacing=5, padding=10, height=300)
-        
-        self.status_dropdown = ft.Dropdown(
-            label="Status", width=200, text_size=13, 
-            options=[ft.dropdown.Option(s) for s in ["Pending", "In Progress", "Done", "No Action Needed"]]
-        )
-        self.priority_dropdown = ft.Dropdown(
-            label="Priority", width=150, text_size=13, 
-            options=[ft.dropdown.Option(p) for p in ["1", "2", "3", "4"]]
-        )
-        self.category_dropdown = ft.Dropdown(
-            label="Category", width=200, text_size=13, 
-            options=[ft.dropdown.Option(c) for c in ["Request", "Staff Movements", "Inquiry", "Information"]]
-        )
-        
-        self.detail_dialog = ft.AlertDialog(
-            title=ft.Column([
-                self.detail_title, 
-                self.detail_subtitle, 
-                ft.Divider(), 
-                ft.Text("Edit Properties:", size=12, weight=ft.FontWeight.BOLD, color=ft.Colors.GREY), 
-                ft.Row([self.status_dropdown, self.priority_dropdown, self.category_dropdown], alignment=ft.MainAxisAlignment.START, spacing=10)
-            ], spacing=5), 
-            content=ft.Container(content=self.detail_files_list, width=600, bgcolor=ft.Colors.WHITE, border_radius=8), 
-            actions=[
-                ft.TextButton("Close", on_click=lambda e: self.page.close(self.detail_dialog), style=ft.ButtonStyle(color=SSA_GREEN))
-            ], 
-            actions_alignment=ft.MainAxisAlignment.END
-        )
-
-        self.next_cycle_picker = ft.DatePicker(
-            on_change=self.on_next_date_picked,
-            first_date=datetime(2023, 1, 1),
-            last_date=datetime(2030, 12, 31)
-        )
-        if self.next_cycle_picker not in self.page.overlay:
-            self.page.overlay.append(self.next_cycle_picker)
-
-        self.next_cycle_input = ft.TextField(
-            label="Next Cycle Start Date",
-            value="",
-            read_only=True,
-            width=180,
-            text_size=14,
-            border_color=SSA_GREEN
-        )
-        
-        def open_date_picker(e):
-            try: self.next_cycle_picker.pick_date()
-            except: pass
-
-        pick_date_btn = ft.IconButton(
-            icon=ft.Icons.EDIT_CALENDAR,
-            icon_color=SSA_GREEN,
-            tooltip="Change Date",
-            on_click=open_date_picker 
-        )
-
-        self.confirm_close_text = ft.Text("", size=14)
-        self.close_confirm_dialog = ft.AlertDialog(
-            modal=True,
-            title=ft.Text("Confirm Cycle Closure", color=ft.Colors.BLUE_GREY_800, weight=ft.FontWeight.BOLD),
-            content=ft.Container(
-                content=ft.Column([
-                    self.confirm_close_text,
-                    ft.Divider(),
-                    ft.Text("Verify NEXT cycle start date:", weight=ft.FontWeight.BOLD, size=12, color=SSA_GREY),
-                    ft.Row([self.next_cycle_input, pick_date_btn], alignment=ft.MainAxisAlignment.START, vertical_alignment=ft.CrossAxisAlignment.CENTER),
-                ], tight=True, spacing=15),
-                width=450,
-                height=240,
-                padding=10
-            ),
-            actions=[
-                ft.TextButton("Cancel", on_click=lambda e: self.page.close(self.close_confirm_dialog)),
-                ft.ElevatedButton("Close Cycle", bgcolor=SSA_GREEN, color="white", on_click=self.execute_cycle_close)
-            ],
-            actions_alignment=ft.MainAxisAlignment.END
-        )
-
-        self.ownership_confirm_dialog = ft.AlertDialog(
-            modal=True,
-            title=ft.Text("⚠️ Ownership Conflict", color=ft.Colors.ORANGE_800, weight=ft.FontWeight.BOLD),
-            content=ft.Container(
-                content=self.ownership_confirm_text,
-                width=400,
-                padding=10
-            ),
-            actions=[
-                ft.TextButton("Cancel", on_click=self.cancel_ownership_change),
-                ft.ElevatedButton("Yes, Change It", bgcolor=ft.Colors.ORANGE, color="white", on_click=self.confirm_ownership_change)
-            ],
-            actions_alignment=ft.MainAxisAlignment.END
-        )
-
-        self.reply_confirm_dialog = ft.AlertDialog(
-            modal=True,
-            title=ft.Text("Reply Detected", weight=ft.FontWeight.BOLD, color=SSA_GREY),
-            content=ft.Text("Did you send a reply to the user?"),
-            actions=[
-                ft.TextButton("No (Just checking)", on_click=lambda e: self.page.close(self.reply_confirm_dialog)),
-                ft.ElevatedButton("Yes, I Replied", bgcolor=SSA_GREEN, color="white", on_click=self.confirm_reply_action)
-            ],
-            actions_alignment=ft.MainAxisAlignment.END
-        )
-        self.pending_reply_req = None 
-
-        self.no_action_dialog = ft.AlertDialog(
-            modal=True,
-            title=ft.Text("No Action Needed", weight=ft.FontWeight.BOLD, color=SSA_GREY),
-            content=ft.Text("Was a response sent to the user?"),
-            actions=[
-                ft.TextButton("No (Not needed)", on_click=lambda e: self.confirm_no_action(replied=False)),
-                ft.ElevatedButton("Yes (Replied)", bgcolor=SSA_GREEN, color="white", on_click=lambda e: self.confirm_no_action(replied=True))
-            ],
-            actions_alignment=ft.MainAxisAlignment.END
-        )
-        self.pending_no_action_req = None
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
 
     def cancel_ownership_change(self, e):
         self.page.close(self.ownership_confirm_dialog)
@@ -628,15 +426,7 @@ class DashboardManager:
         self.page.close(self.ownership_confirm_dialog)
         if self.ownership_pending_change:
             d = self.ownership_pending_change
-<<<<<<< HEAD
             self._execute_property_change(d['req_data'], d['new_status'], d['new_priority'], d['new_category'], d.get('new_reply_limit'), d.get('new_resolve_limit'), new_reply_time=d.get('new_reply_time', ...))
-=======
-            self._execute_property_change(
-                d['req_data'], d['new_status'], d['new_priority'], d['new_category'],
-                d.get('new_reply_limit'), d.get('new_resolve_limit'),
-                new_reply_time=d.get('new_reply_time', ...) 
-            )
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.ownership_pending_change = None
 
     def on_next_date_picked(self, e):
@@ -646,7 +436,6 @@ class DashboardManager:
             self.next_cycle_input.update()
 
     def build_help_button(self):
-<<<<<<< HEAD
         return ft.IconButton(icon=ft.Icons.HELP_OUTLINE, icon_color=SSA_GREY, tooltip="Guía rápida / Ayuda", on_click=self.open_help_tour, bgcolor=ft.Colors.WHITE, style=ft.ButtonStyle(shape=ft.CircleBorder()))
 
     def build_calendar_button(self):
@@ -654,45 +443,6 @@ class DashboardManager:
 
     def build_close_cycle_button(self):
         self.close_cycle_btn = ft.Container(content=ft.Row([ft.Icon(ft.Icons.UPDATE, color=ft.Colors.WHITE, size=16), ft.Text("Close Cycle", size=12, color=ft.Colors.WHITE, weight=ft.FontWeight.BOLD)], spacing=5), padding=ft.padding.symmetric(horizontal=15, vertical=8), border_radius=8, bgcolor=ft.Colors.GREY_400, ink=False, tooltip="Loading...", visible=False)
-=======
-        return ft.IconButton(
-            icon=ft.Icons.HELP_OUTLINE,
-            icon_color=SSA_GREY,
-            tooltip="Guía rápida / Ayuda",
-            on_click=self.open_help_tour,
-            bgcolor=ft.Colors.WHITE,
-            style=ft.ButtonStyle(shape=ft.CircleBorder()) 
-        )
-
-    def build_calendar_button(self):
-        return ft.Container(
-            content=ft.Row([
-                ft.Icon(ft.Icons.CALENDAR_MONTH, color=SSA_GREEN, size=16), 
-                self.calendar_btn_text
-            ], spacing=5),
-            padding=ft.padding.symmetric(horizontal=15, vertical=8), 
-            border=ft.border.all(1, SSA_BORDER), 
-            border_radius=8, 
-            bgcolor=ft.Colors.WHITE, 
-            ink=True, 
-            on_click=self.open_calendar_dialog, 
-            tooltip="Filter by Payroll Date Range"
-        )
-
-    def build_close_cycle_button(self):
-        self.close_cycle_btn = ft.Container(
-            content=ft.Row([
-                ft.Icon(ft.Icons.UPDATE, color=ft.Colors.WHITE, size=16), 
-                ft.Text("Close Cycle", size=12, color=ft.Colors.WHITE, weight=ft.FontWeight.BOLD)
-            ], spacing=5),
-            padding=ft.padding.symmetric(horizontal=15, vertical=8), 
-            border_radius=8, 
-            bgcolor=ft.Colors.GREY_400, 
-            ink=False,
-            tooltip="Loading...",
-            visible=False 
-        )
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         return self.close_cycle_btn
 
     def update_close_cycle_button(self):
@@ -705,17 +455,9 @@ class DashboardManager:
             try:
                 dt = datetime.strptime(self.current_cycle_date, "%Y%m%d")
                 formatted_date = dt.strftime("%m/%d/%Y")
-<<<<<<< HEAD
             except: formatted_date = self.current_cycle_date
             row = self.close_cycle_btn.content
             if len(row.controls) > 1: row.controls[1].value = f"{formatted_date} Payroll Cycle"
-=======
-            except:
-                formatted_date = self.current_cycle_date
-            row = self.close_cycle_btn.content
-            if len(row.controls) > 1:
-                row.controls[1].value = f"{formatted_date} Payroll Cycle"
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             self.close_cycle_btn.update()
 
     def prompt_close_cycle(self, e):
@@ -723,37 +465,17 @@ class DashboardManager:
         suggested_dt = self.payroll_service.calculate_next_cycle_date(self.current_cycle_date)
         self.next_cycle_picker.value = suggested_dt
         self.next_cycle_input.value = suggested_dt.strftime("%m/%d/%Y")
-<<<<<<< HEAD
         try:
             curr_dt_obj = datetime.strptime(self.current_cycle_date, "%Y%m%d")
             curr_str_fmt = curr_dt_obj.strftime("%m/%d/%Y")
         except: curr_str_fmt = self.current_cycle_date
         user = self.user_name_small.value or "Unknown"
         msg = (f"Current Cycle: {curr_str_fmt}\nClosing User: {user}\n\nThis action will close the current period and create the next folder structure.")
-=======
-        
-        try:
-            curr_dt_obj = datetime.strptime(self.current_cycle_date, "%Y%m%d")
-            curr_str_fmt = curr_dt_obj.strftime("%m/%d/%Y")
-        except:
-            curr_str_fmt = self.current_cycle_date
-
-        user = self.user_name_small.value or "Unknown"
-        msg = (
-            f"Current Cycle: {curr_str_fmt}\n"
-            f"Closing User: {user}\n\n"
-            "This action will close the current period and create the next folder structure."
-        )
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.confirm_close_text.value = msg
         self.page.open(self.close_confirm_dialog)
         self.page.update()
 
-<<<<<<< HEAD
     @track_errors("Executing Cycle Closure") 
-=======
-    @track_errors("Executing Cycle Closure") # --- PROTEGIDO ---
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
     def execute_cycle_close(self, e):
         visual_date = self.next_cycle_input.value
         if not visual_date: return
@@ -763,66 +485,56 @@ class DashboardManager:
         except ValueError:
             self.notifier.send("Error", "Invalid date format. Please use MM/DD/YYYY", "error")
             return
-<<<<<<< HEAD
-=======
-
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.page.close(self.close_confirm_dialog)
         self.loading_container.visible = True
         self.status_text.value = f"Closing {self.current_cycle_date}... Creating {system_date_str}..."
         self.page.update()
-<<<<<<< HEAD
-=======
-        
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         def task():
             user = self.user_name_small.value or "Unknown User"
-            result = self.payroll_service.execute_cycle_closure(self.current_cycle_date, system_date_str, user)
+            result = self.payroll_service.execute_cycle_closure(
+                self.current_cycle_date, system_date_str, user,
+                on_generation_progress=self._on_timecard_generation_progress,
+                on_generation_done=self._on_timecard_generation_done
+            )
             if result['success']:
                 self.notifier.send("Cycle Closed", result['message'], "success")
                 time.sleep(2)
-<<<<<<< HEAD
             else: self.notifier.send("Error", result['message'], "error")
             self.loading_container.visible = False
             self.safe_update()
-=======
-            else:
-                self.notifier.send("Error", result['message'], "error")
-            self.loading_container.visible = False
-            self.page.update()
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         threading.Thread(target=task, daemon=True).start()
 
+    def _on_timecard_generation_progress(self, done, total):
+        # Un aviso por cada cuarto completado para no saturar el panel
+        if not total: return
+        step = max(1, total // 4)
+        last = getattr(self, '_gen_progress_notified', 0)
+        if done < total and done - last >= step:
+            self._gen_progress_notified = done
+            self.notifier.send("Generating Timecards", f"{done}/{total} locations ready...", "info")
+
+    def _on_timecard_generation_done(self, date_str, report):
+        self._gen_progress_notified = 0
+        if report.get('error'):
+            self.notifier.send("Cycle Timecards Failed", f"{date_str}: {report['error']}", "error")
+            return
+        msg = f"{date_str}: {report['created']} created, {report['skipped']} already existed"
+        if report['failed']:
+            codes = ", ".join(report['failed'][:10]) + ("..." if len(report['failed']) > 10 else "")
+            self.notifier.send("Cycle Timecards Incomplete", f"{msg}, {len(report['failed'])} failed ({codes}).", "warning")
+        else:
+            self.notifier.send("Cycle Timecards Ready", msg, "success")
+
     def open_calendar_dialog(self, e):
         if not self.calendar_dialog:
-<<<<<<< HEAD
             self.calendar_dialog = ft.AlertDialog(content=CalendarView(self.available_dates, self.on_calendar_range_selected, on_dismiss=lambda: self.page.close(self.calendar_dialog)), content_padding=0, bgcolor=ft.Colors.TRANSPARENT, modal=True)
-=======
-            self.calendar_dialog = ft.AlertDialog(
-                content=CalendarView(
-                    self.available_dates, 
-                    self.on_calendar_range_selected, 
-                    on_dismiss=lambda: self.page.close(self.calendar_dialog)
-                ), 
-                content_padding=0, 
-                bgcolor=ft.Colors.TRANSPARENT, 
-                modal=True
-            )
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.page.open(self.calendar_dialog)
         self.page.update()
 
     def on_calendar_range_selected(self, start_date, end_date):
         self.page.close(self.calendar_dialog)
         fmt = "%b %d"
-<<<<<<< HEAD
         label = f"{start_date.strftime(fmt)}" if start_date == end_date else f"{start_date.strftime(fmt)} - {end_date.strftime(fmt)}"
-=======
-        if start_date == end_date:
-            label = f"{start_date.strftime(fmt)}"
-        else:
-            label = f"{start_date.strftime(fmt)} - {end_date.strftime(fmt)}"
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.calendar_btn_text.value = label
         self.calendar_btn_text.update()
         self.load_data(date_range=(start_date, end_date), silent=True)
@@ -834,23 +546,11 @@ class DashboardManager:
     def resolve_category_key(self, raw_val):
         raw = str(raw_val or "").lower()
         for cat in ["Request", "Staff Movements", "Inquiry", "Information"]:
-<<<<<<< HEAD
             if cat.lower() in raw: return cat
         return "New Email"
 
     def _get_grid_config(self):
         return {"expand": 1, "runs_count": 4, "max_extent": 320, "child_aspect_ratio": 0.95, "spacing": 20, "run_spacing": 20}
-=======
-            if cat.lower() in raw: 
-                return cat
-        return "New Email"
-
-    def _get_grid_config(self):
-        return {
-            "expand": 1, "runs_count": 4, "max_extent": 320, 
-            "child_aspect_ratio": 0.95, "spacing": 20, "run_spacing": 20
-        }
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
 
     def _ensure_category_tab(self, category_name):
         if category_name not in self.grids:
@@ -862,30 +562,49 @@ class DashboardManager:
             self.tabs.update()
 
     def _remove_category_tab_if_empty(self, category_name):
-<<<<<<< HEAD
         if category_name == "To Do": return 
         if category_name in self.grids and len(self.grids[category_name].controls) == 0:
             tab = self.tab_refs.get(category_name)
             if tab and tab in self.tabs.tabs: self.tabs.tabs.remove(tab)
             del self.grids[category_name]
             if category_name in self.tab_refs: del self.tab_refs[category_name]
-=======
-        if category_name == "To Do": 
-            return 
-        if category_name in self.grids and len(self.grids[category_name].controls) == 0:
-            tab = self.tab_refs.get(category_name)
-            if tab and tab in self.tabs.tabs: 
-                self.tabs.tabs.remove(tab)
-            del self.grids[category_name]
-            if category_name in self.tab_refs: 
-                del self.tab_refs[category_name]
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             self.tabs.update()
 
+    def warm_up(self):
+        """
+        Lanza en paralelo lo que la primera carga necesita: token + usuario, drive id y los Excel
+        de reglas/rutas y ubicaciones. Solo un hilo obtiene el token (los demás esperan en el lock
+        de MSGraphClient). load_data espera únicamente la tarea que necesita en cada paso.
+        Lo que ya se conoce (p. ej. tras un Soft Reset) no se vuelve a pedir.
+        """
+        tasks = {"rules": ("Reglas y rutas (Excel)", self.rules_service.load_data)}
+        if not self.current_user: tasks["user"] = ("Token y usuario", self.user_service.get_current_user)
+        if not self.reader.drive_id: tasks["drive"] = ("Drive ID", self.reader._get_drive_id)
+        if not self.location_service.valid_locations: tasks["locations"] = ("Ubicaciones (Excel)", self.location_service.load_locations)
+
+        t0 = time.perf_counter()
+        def timed(label, fn):
+            def task():
+                try: return fn()
+                finally: print(f"⏱️ [Warm-up] {label} listo en {(time.perf_counter() - t0) * 1000:.0f}ms")
+            return task
+
+        pool = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="WarmUp")
+        self._warmup = {key: pool.submit(timed(label, fn)) for key, (label, fn) in tasks.items()}
+        pool.shutdown(wait=False)
+
+    def _await_warmup(self, key, timeout=120):
+        """Resultado de una tarea de warm-up (None si no se lanzó o falló)."""
+        future = self._warmup.get(key)
+        if future is None: return None
+        try: return future.result(timeout=timeout)
+        except Exception as e:
+            print(f"⚠️ [Warm-up] '{key}' falló: {e}")
+            return None
+
     def start(self):
         self._polling_active = True
         threading.Thread(target=self.background_poller, daemon=True).start()
-<<<<<<< HEAD
         self._start_central_timer()
 
     def stop_polling(self):
@@ -936,20 +655,6 @@ class DashboardManager:
         self.delta_links_map = {} 
         
         self.loading_container.visible = True
-=======
-
-    def stop_polling(self):
-        self._polling_active = False
-
-    @track_errors("Loading Initial Data") # --- PROTEGIDO ---
-    def load_data(self, limit_dates: int = 1, date_range=None, silent=False):
-        self.active_limit_dates = limit_dates
-        self.active_date_range = date_range
-        self.delta_link = None 
-        
-        self.loading_container.visible = True
-        self.tabs.visible = False
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.status_text.value = "Initializing..." if not silent else "Updating period..."
         self.page.update()
 
@@ -966,21 +671,24 @@ class DashboardManager:
             try:
                 if not silent: 
                     self.status_text.value = "Connecting to Microsoft..."
-<<<<<<< HEAD
                     self.safe_update()
                 
                 if not self.current_user:
-                    self.current_user = self.user_service.get_current_user()
+                    self.current_user = self._await_warmup("user") or self.user_service.get_current_user()
                     if self.current_user and not silent:
                         self.welcome_large.value = f"Hello, {self.current_user.get('givenName', 'User')}!"
-                        self.welcome_large.update()
-                        time.sleep(1)
-                        self.welcome_large.value = ""
                         self.user_name_small.value = self.current_user.get('displayName', '')
                         self.safe_update()
+                        # El saludo se borra solo; la carga no espera por él
+                        def clear_welcome():
+                            self.welcome_large.value = ""
+                            self.safe_update()
+                        threading.Timer(1.0, clear_welcome).start()
 
                 if self.current_user:
                     email = self.current_user.get('mail') or self.current_user.get('userPrincipalName')
+                    # Las rutas del usuario salen del Excel de reglas (cargado en el warm-up)
+                    self._await_warmup("rules")
                     paths = self.rules_service.get_paths_for_user(email)
                     
                     if paths:
@@ -990,19 +698,13 @@ class DashboardManager:
                     else:
                         print(f"⚠️ No se encontraron rutas dinámicas para {email}. Usando fallback (.env).")
 
+                self._await_warmup("drive")
                 if not self.reader.drive_id: self.reader._get_drive_id()
-=======
-                    self.page.update()
-                
-                if not self.reader.drive_id: 
-                    self.reader._get_drive_id()
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                 
                 if not self.available_dates: 
                     self.available_dates = self.reader.get_available_date_folders()
                     if self.available_dates:
                         self.available_dates.sort(reverse=True)
-<<<<<<< HEAD
                         if not date_range: self.current_cycle_date = self.available_dates[0]
                 
                 # [MODIFICADO] Activación Multi-Root Polling (Fase 3)
@@ -1018,6 +720,7 @@ class DashboardManager:
                     else:
                         print("⚠️ No se pudo activar Delta Tracking en ninguna ruta.")
 
+                self._await_warmup("locations")
                 if not self.location_service.valid_locations: self.location_service.load_locations()
                 
                 dataset = self.data_service.load(limit_dates=limit_dates, date_range=date_range, include_unread=True, progress_callback=on_progress_update)
@@ -1025,63 +728,12 @@ class DashboardManager:
                 if not silent: 
                     self.status_text.value = "Rendering..."
                     self.safe_update()
-=======
-                        if not date_range:
-                            self.current_cycle_date = self.available_dates[0]
-                
-                # Obtener ID de carpeta activa para Delta
-                if self.current_cycle_date:
-                    folders = self.reader._get_items(path=self.reader.root_path)
-                    for f in folders:
-                        if f['name'] == self.current_cycle_date:
-                            self.current_cycle_folder_id = f['id']
-                            break
-                            
-                # Inicializar Delta
-                if self.current_cycle_folder_id:
-                    self.status_text.value = "Initializing Real-time Sync..."
-                    self.page.update()
-                    self.delta_link = self.reader.init_delta_link(self.current_cycle_folder_id)
-                    print(f"📡 Delta Tracking activado para: {self.current_cycle_date}")
-
-                if not silent and not self.current_user:
-                    self.current_user = self.user_service.get_current_user()
-                    if self.current_user:
-                        self.welcome_large.value = f"Hello, {self.current_user.get('givenName', 'User')}!"
-                        self.welcome_large.update()
-                        time.sleep(2)
-                        self.welcome_large.value = ""
-                        self.user_name_small.value = self.current_user.get('displayName', '')
-                        self.page.update()
-
-                if not self.location_service.valid_locations: 
-                    self.location_service.load_locations()
-                
-                dataset = self.data_service.load(
-                    limit_dates=limit_dates, 
-                    date_range=date_range, 
-                    include_unread=True, 
-                    progress_callback=on_progress_update
-                )
-                
-                if not silent: 
-                    self.status_text.value = "Rendering..."
-                    self.page.update()
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                 
                 self.render_dataset(dataset)
                 self.update_close_cycle_button()
                 
-<<<<<<< HEAD
                 if self._is_first_load:
                     self._is_first_load = False
-=======
-                # --- CHECK TOUR (Al finalizar la primera carga) ---
-                if self._is_first_load:
-                    self._is_first_load = False
-                    # Ejecutar en hilo de UI para evitar conflictos
-                    # No necesitamos threading extra aquí porque check_and_show_tour hace update seguro
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                     self.check_and_show_tour()
                 
             except Exception as e:
@@ -1089,17 +741,16 @@ class DashboardManager:
                 print(f"Error en worker: {e}")
             finally:
                 self.loading_container.visible = False
-<<<<<<< HEAD
                 self.safe_update()
-=======
-                self.tabs.visible = True
-                self.page.update()
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
+                self.data_ready.set()
 
         threading.Thread(target=worker, daemon=True).start()
 
-    def render_dataset(self, dataset):
-<<<<<<< HEAD
+    def render_dataset(self, dataset, first_tab=None):
+        """
+        Construye las pestañas. La pestaña visible (first_tab o "To Do") se llena y pinta primero;
+        el resto se completa después en la misma pasada para no competir con el poller.
+        """
         self._is_rendering = True
         try:
             with self._ui_lock:
@@ -1108,15 +759,15 @@ class DashboardManager:
                 self.tab_refs.clear()
                 self.tabs.tabs.clear()
                 
-                self.requests_state_cache.update(dataset.state_cache)
-                self.requests_meta_cache.update(dataset.meta_cache)
+                if dataset.state_cache is not self.requests_state_cache: self.requests_state_cache.update(dataset.state_cache)
+                if dataset.meta_cache is not self.requests_meta_cache: self.requests_meta_cache.update(dataset.meta_cache)
                 for req in dataset.processed_requests: self.requests_data_cache[req['id']] = req
                     
                 grid_config = self._get_grid_config()
                 
+                # 1. Esqueleto: todas las pestañas con sus contadores, grids vacíos
+                pending_fill = [("To Do", dataset.todo_requests, True)]
                 grid_todo = ft.GridView(**grid_config)
-                for item in dataset.todo_requests: grid_todo.controls.append(self.create_request_card(item, show_category_label=True))
-                
                 self.grids["To Do"] = grid_todo
                 tab_todo = ft.Tab(text=f"To Do ({len(dataset.todo_requests)})", icon=ft.Icons.CHECKLIST_RTL, content=ft.Container(content=grid_todo, padding=20))
                 self.tab_refs["To Do"] = tab_todo
@@ -1125,53 +776,26 @@ class DashboardManager:
                 for cat_name, items in dataset.grouped_requests.items():
                     if not items: continue
                     grid = ft.GridView(**grid_config)
-                    for item in items: grid.controls.append(self.create_request_card(item))
                     self.grids[cat_name] = grid
                     tab_cat = ft.Tab(text=f"({len(items)}) {cat_name}", content=ft.Container(content=grid, padding=20))
                     self.tab_refs[cat_name] = tab_cat
                     self.tabs.tabs.append(tab_cat)
+                    pending_fill.append((cat_name, items, False))
+
+                # 2. Pestaña visible primero
+                if first_tab not in self.tab_refs: first_tab = "To Do"
+                self.tabs.selected_index = self.tabs.tabs.index(self.tab_refs[first_tab])
+                pending_fill.sort(key=lambda entry: entry[0] != first_tab)
+
+                for idx, (grid_name, items, show_label) in enumerate(pending_fill):
+                    grid = self.grids[grid_name]
+                    for item in items: grid.controls.append(self.create_request_card(item, show_category_label=show_label))
+                    if idx == 0: self.page.update()
+
+                self._bump_store_version()
                 self.page.update()
         finally:
             self._is_rendering = False
-=======
-        self.ui_refs.clear()
-        self.grids.clear()
-        self.tab_refs.clear()
-        self.tabs.tabs.clear()
-        
-        self.requests_state_cache.update(dataset.state_cache)
-        self.requests_meta_cache.update(dataset.meta_cache)
-        
-        for req in dataset.processed_requests: 
-            self.requests_data_cache[req['id']] = req
-            
-        grid_config = self._get_grid_config()
-        
-        grid_todo = ft.GridView(**grid_config)
-        for item in dataset.todo_requests: 
-            grid_todo.controls.append(self.create_request_card(item, show_category_label=True))
-        
-        self.grids["To Do"] = grid_todo
-        tab_todo = ft.Tab(
-            text=f"To Do ({len(dataset.todo_requests)})", 
-            icon=ft.Icons.CHECKLIST_RTL, 
-            content=ft.Container(content=grid_todo, padding=20)
-        )
-        self.tab_refs["To Do"] = tab_todo
-        self.tabs.tabs.append(tab_todo)
-        
-        for cat_name, items in dataset.grouped_requests.items():
-            if not items: continue
-            grid = ft.GridView(**grid_config)
-            for item in items: 
-                grid.controls.append(self.create_request_card(item))
-            self.grids[cat_name] = grid
-            tab_cat = ft.Tab(text=f"({len(items)}) {cat_name}", content=ft.Container(content=grid, padding=20))
-            self.tab_refs[cat_name] = tab_cat
-            self.tabs.tabs.append(tab_cat)
-            
-        self.page.update()
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
 
     def create_request_card(self, req, show_category_label=False):
         reply_stat = req.get('reply_status', {})
@@ -1181,15 +805,10 @@ class DashboardManager:
         category_val = req.get('category', 'General')
         loc_code = req.get('location_code', '???')
         unread_count = req.get('unread_emails', 0)
-<<<<<<< HEAD
         has_failure = req.get('has_outlook_failure', False) 
         is_loc_valid = self.location_service.is_valid(loc_code)
         comments = req.get('comments', "")
         has_comments = bool(comments and str(comments).strip())
-=======
-        is_loc_valid = self.location_service.is_valid(loc_code)
-        
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         owner_text = ""
         owner_color = ft.Colors.GREY_500
         if status_val == "In Progress":
@@ -1198,7 +817,6 @@ class DashboardManager:
         elif status_val == "Done":
             owner_text = f"Done by: {req.get('editor', 'Unknown')}"
             owner_color = SSA_GREEN
-<<<<<<< HEAD
         owner_control = ft.Container()
         if owner_text:
             owner_control = ft.Container(content=ft.Text(owner_text, size=10, weight=ft.FontWeight.BOLD, color=owner_color, italic=True), padding=ft.padding.only(top=2))
@@ -1241,95 +859,12 @@ class DashboardManager:
         if req['id'] not in self.ui_refs: self.ui_refs[req['id']] = []
         real_grid_key = self.resolve_category_key(category_val) if not show_category_label else "To Do"
         
-=======
-
-        owner_control = ft.Container()
-        if owner_text:
-            owner_control = ft.Container(
-                content=ft.Text(owner_text, size=10, weight=ft.FontWeight.BOLD, color=owner_color, italic=True),
-                padding=ft.padding.only(top=2)
-            )
-
-        badge_text_ctrl = ft.Text(str(unread_count), size=11, color="white", weight=ft.FontWeight.BOLD)
-        badge_container_ctrl = ft.Container(
-            content=badge_text_ctrl, bgcolor=SSA_RED_BADGE, 
-            border_radius=10, padding=ft.padding.symmetric(horizontal=6, vertical=2), 
-            visible=(unread_count > 0)
-        )
-        
-        status_container_ctrl = ft.Container(
-            content=ft.Text(status_val, size=11, color=SSA_WHITE, weight=ft.FontWeight.BOLD), 
-            bgcolor=get_status_color(status_val), 
-            padding=ft.padding.symmetric(horizontal=8, vertical=4), 
-            border_radius=6
-        )
-        
-        priority_text_ctrl = ft.Text(priority_val, size=12, weight=ft.FontWeight.BOLD, color=get_priority_color(priority_val))
-        category_text_ctrl = ft.Text(category_val.upper(), size=9, weight=ft.FontWeight.BOLD, color=get_category_color(category_val))
-        
-        card_border_color = SSA_BORDER if is_loc_valid and reply_stat.get('color') != 'red' else ft.Colors.RED_400
-        category_label = ft.Container(content=category_text_ctrl, padding=ft.padding.only(bottom=5)) if show_category_label else ft.Container()
-        
-        header_controls = [
-            ft.Text(req.get('request_name', 'Unnamed'), size=16, weight=ft.FontWeight.W_600, color=SSA_GREY, expand=True, max_lines=2, overflow=ft.TextOverflow.ELLIPSIS),
-            ft.IconButton(icon=ft.Icons.OPEN_IN_NEW, icon_color=SSA_GREEN, data=req.get('web_url'), on_click=self.open_sharepoint_link)
-        ]
-        
-        icon_action = ft.Icons.WARNING_ROUNDED if not is_loc_valid else ft.Icons.BUILD_CIRCLE_OUTLINED
-        color_action = ft.Colors.RED if not is_loc_valid else ft.Colors.GREY_400
-        action_btn = ft.IconButton(
-            icon=icon_action, icon_color=color_action, 
-            on_click=lambda e: self.open_remediation_dialog(self.requests_data_cache.get(req['id']))
-        )
-        header_controls.insert(1, action_btn)
-        
-        reply_badge = LiveStatBadge(self.calculator, reply_stat.get('limit_date'), ft.Icons.TIMER, reply_stat.get('text'), reply_stat.get('color'), completion_date=reply_stat.get('completion_date'))
-        resolve_badge = LiveStatBadge(self.calculator, resolve_stat.get('limit_date'), ft.Icons.CHECK_CIRCLE_OUTLINE, resolve_stat.get('text'), resolve_stat.get('color'), completion_date=resolve_stat.get('completion_date'))
-
-        card_content = ft.Container(
-            padding=20, bgcolor=SSA_WHITE, border_radius=12, 
-            border=ft.border.all(1, card_border_color), 
-            on_click=lambda _: self.show_request_details(req['id']), 
-            ink=True,
-            content=ft.Column([
-                category_label, 
-                ft.Row(header_controls, alignment=ft.MainAxisAlignment.START, vertical_alignment=ft.CrossAxisAlignment.START),
-                ft.Text(f"Loc: {loc_code} | Created: {req.get('created_at')[:10]}", size=12, color=ft.Colors.RED if not is_loc_valid else ft.Colors.GREY_500),
-                ft.Divider(height=15, thickness=1, color=SSA_BORDER),
-                ft.Row([
-                    ft.Column([
-                        ft.Text("Reply by:", size=11, color=ft.Colors.GREY_600), 
-                        reply_badge 
-                    ], expand=True),
-                    ft.Column([
-                        ft.Text("Resolve by:", size=11, color=ft.Colors.GREY_600), 
-                        resolve_badge 
-                    ], expand=True)
-                ]),
-                ft.Row([
-                    ft.Column([
-                        status_container_ctrl,
-                        owner_control 
-                    ]), 
-                    ft.Row([ft.Text("Priority:", size=11, color=ft.Colors.GREY_600), priority_text_ctrl], spacing=5)
-                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN)
-            ])
-        )
-        
-        final_card = ft.Stack([card_content, ft.Container(content=badge_container_ctrl, right=0, top=0)])
-        
-        if req['id'] not in self.ui_refs: 
-            self.ui_refs[req['id']] = []
-            
-        real_grid_key = self.resolve_category_key(category_val) if not show_category_label else "To Do"
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.ui_refs[req['id']].append({
             'status_container': status_container_ctrl, 
             'owner_control': owner_control, 
             'priority_text': priority_text_ctrl, 
             'category_text': category_text_ctrl, 
             'badge_container': badge_container_ctrl, 
-<<<<<<< HEAD
             'badge_text': badge_text_ctrl, 
             'reply_badge': reply_badge, 
             'resolve_badge': resolve_badge, 
@@ -1370,19 +905,6 @@ class DashboardManager:
         self.notifier.send("Saved", "Comment signed and updated.", "success")
 
     def update_local_ui_card(self, req_id, new_status=None, new_priority=None, new_category=None, editor_name=None, new_reply_limit=..., new_resolve_limit=..., new_reply_time=..., new_resolve_time=..., new_location_code=..., created_at_iso=None, new_comments=None):
-=======
-            'badge_text': badge_text_ctrl,
-            'reply_badge': reply_badge,
-            'resolve_badge': resolve_badge,
-            'card_control': final_card, 
-            'parent_grid': real_grid_key
-        })
-        return final_card
-
-    def update_local_ui_card(self, req_id, new_status=None, new_priority=None, new_category=None, editor_name=None, 
-                             new_reply_limit=..., new_resolve_limit=..., 
-                             new_reply_time=..., new_resolve_time=...):
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         if req_id in self.ui_refs:
             for refs in self.ui_refs[req_id]:
                 try:
@@ -1390,45 +912,20 @@ class DashboardManager:
                         refs['status_container'].content.value = new_status
                         refs['status_container'].bgcolor = get_status_color(new_status)
                         if refs['status_container'].page: refs['status_container'].update()
-<<<<<<< HEAD
                         if 'owner_control' in refs:
                             txt, col = "", ft.Colors.GREY
                             if new_status == "In Progress": txt, col = f"Working: {editor_name or 'Unknown'}", ft.Colors.BLUE
                             elif new_status == "Done": txt, col = f"Done by: {editor_name or 'Unknown'}", SSA_GREEN
                             refs['owner_control'].content = ft.Text(txt, size=10, weight=ft.FontWeight.BOLD, color=col, italic=True) if txt else None
                             if refs['owner_control'].page: refs['owner_control'].update()
-=======
-                        
-                        if 'owner_control' in refs:
-                            txt = ""
-                            col = ft.Colors.GREY
-                            if new_status == "In Progress":
-                                txt = f"Working: {editor_name or 'Unknown'}"
-                                col = ft.Colors.BLUE
-                            elif new_status == "Done":
-                                txt = f"Done by: {editor_name or 'Unknown'}"
-                                col = SSA_GREEN
-                            
-                            if txt:
-                                refs['owner_control'].content = ft.Text(txt, size=10, weight=ft.FontWeight.BOLD, color=col, italic=True)
-                            else:
-                                refs['owner_control'].content = None
-                            if refs['owner_control'].page: refs['owner_control'].update()
-
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                     if new_priority:
                         refs['priority_text'].value = str(new_priority)
                         refs['priority_text'].color = get_priority_color(str(new_priority))
                         if refs['priority_text'].page: refs['priority_text'].update()
-<<<<<<< HEAD
-=======
-                        
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                     if new_category and 'category_text' in refs:
                         refs['category_text'].value = new_category.upper()
                         refs['category_text'].color = get_category_color(new_category)
                         if refs['category_text'].page: refs['category_text'].update()
-<<<<<<< HEAD
                     if new_location_code is not ... and 'loc_text_control' in refs:
                         date_display = created_at_iso[:10] if created_at_iso else "???"
                         if date_display == "???":
@@ -1445,9 +942,6 @@ class DashboardManager:
                         refs['comment_btn'].icon_color = ft.Colors.BLUE if has_c else ft.Colors.GREY_400
                         refs['comment_btn'].tooltip = "View Comments" if has_c else "Add Comment"
                         if refs['comment_btn'].page: refs['comment_btn'].update()
-=======
-                    
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                     if 'reply_badge' in refs:
                         badge = refs['reply_badge']
                         changed = False
@@ -1463,17 +957,8 @@ class DashboardManager:
                             changed = True
                         if changed:
                             now = datetime.now(timezone.utc)
-<<<<<<< HEAD
                             badge.update_state(now)
                             if badge.page: badge.update()
-=======
-                            new_stat = self.calculator.calculate_time_left(badge.limit_date, now, badge.completion_date)
-                            badge.text_control.value = new_stat['text']
-                            badge.text_control.color = SSA_GREEN if new_stat['color'] == "green" else new_stat['color']
-                            badge.icon_control.color = badge.text_control.color
-                            if badge.page: badge.update()
-
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                     if 'resolve_badge' in refs:
                         badge = refs['resolve_badge']
                         changed = False
@@ -1489,7 +974,6 @@ class DashboardManager:
                             changed = True
                         if changed:
                             now = datetime.now(timezone.utc)
-<<<<<<< HEAD
                             badge.update_state(now)
                             if badge.page: badge.update()
                 except Exception as e: print(f"Warning updating UI card: {e}")
@@ -1499,16 +983,27 @@ class DashboardManager:
         is_valid = (current_loc and current_loc not in ["???", "New/Syncing", "Unknown"] and self.location_service.is_valid(current_loc))
         if is_valid: return req_data
         try:
-            parent_id = None
-            if 'parentReference' in req_data: parent_id = req_data['parentReference'].get('id')
+            parent_id = req_data.get('parent_id')
+            if not parent_id and 'parentReference' in req_data: parent_id = req_data['parentReference'].get('id')
+
+            # 1. Resolución local O(1) desde el índice de carpetas del reader
+            resolved_loc, resolved_date = self.reader.resolve_request_location(parent_id)
+            if resolved_loc:
+                req_data['location_code'] = resolved_loc
+                req_data['date_folder'] = resolved_date
+                if req_id in self.requests_data_cache: self.requests_data_cache[req_id]['location_code'] = resolved_loc
+                return req_data
+
+            # 2. Fallback remoto (carpeta aún no indexada)
             if not parent_id:
-                meta_endpoint = f"/sites/{self.reader.site_id}/drives/{self.reader.drive_id}/items/{req_id}?select=parentReference"
+                meta_endpoint = f"/sites/{self.reader.site_id}/drives/{self.reader._get_drive_id()}/items/{req_id}?select=parentReference"
                 meta = self.reader.client.get(meta_endpoint)
                 if meta: parent_id = meta.get('parentReference', {}).get('id')
             if parent_id and parent_id != self.current_cycle_folder_id:
-                parent_endpoint = f"/sites/{self.reader.site_id}/drives/{self.reader.drive_id}/items/{parent_id}?select=name"
+                parent_endpoint = f"/sites/{self.reader.site_id}/drives/{self.reader._get_drive_id()}/items/{parent_id}?select=id,name,folder,parentReference"
                 parent_meta = self.reader.client.get(parent_endpoint)
                 if parent_meta and 'name' in parent_meta:
+                    self.reader._index_drive_item(parent_meta)
                     resolved_loc = parent_meta['name']
                     req_data['location_code'] = resolved_loc
                     if req_id in self.requests_data_cache: self.requests_data_cache[req_id]['location_code'] = resolved_loc
@@ -1523,201 +1018,58 @@ class DashboardManager:
             if new_resolve_time is ...: new_resolve_time = datetime.now(timezone.utc).isoformat()
         if new_s in ["Pending", "In Progress"] and req_data.get('status') in ["Done", "No Action Needed"]:
             if new_resolve_time is ...: new_resolve_time = None
-=======
-                            new_stat = self.calculator.calculate_time_left(badge.limit_date, now, badge.completion_date)
-                            badge.text_control.value = new_stat['text']
-                            badge.text_control.color = SSA_GREEN if new_stat['color'] == "green" else new_stat['color']
-                            badge.icon_control.color = badge.text_control.color
-                            if badge.page: badge.update()
-
-                except Exception as e: 
-                    print(f"Warning updating UI card: {e}")
-
-    def _execute_property_change(self, req_data, new_s, new_p, new_c, 
-                                 new_reply_limit=..., new_resolve_limit=...,
-                                 new_reply_time=..., new_resolve_time=...):
-        """Ejecuta la actualización con protección ETag y reintento inteligente."""
-        old_s, old_p, old_c = req_data.get('status'), str(req_data.get('priority')), req_data.get('category')
-        my_name = self.current_user.get('displayName') if self.current_user else "Me"
-        
-        # --- PREPARAR DATOS ---
-        if new_s == "Done" and req_data.get('status') != "Done":
-            if new_resolve_time is ...:
-                new_resolve_time = datetime.now(timezone.utc).isoformat()
-        
-        if new_s in ["Pending", "In Progress"] and req_data.get('status') in ["Done", "No Action Needed"]:
-            if new_resolve_time is ...:
-                new_resolve_time = None
-        
-        # --- ACTUALIZACIÓN OPTIMISTA EN UI ---
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         update_dict = {'status': new_s, 'priority': new_p, 'category': new_c, 'editor': my_name}
         if new_reply_limit is not ...: update_dict['reply_limit'] = new_reply_limit
         if new_resolve_limit is not ...: update_dict['resolve_limit'] = new_resolve_limit
         if new_reply_time is not ...: update_dict['reply_time'] = new_reply_time
         if new_resolve_time is not ...: update_dict['resolve_time'] = new_resolve_time
-<<<<<<< HEAD
         if new_comments is not None: update_dict['comments'] = new_comments
         req_data.update(update_dict)
         self.requests_data_cache[req_data['id']] = req_data
+        self._bump_store_version()
         self.update_local_ui_card(req_id=req_data['id'], new_status=new_s, new_priority=new_p, new_category=new_c, editor_name=my_name, new_reply_limit=new_reply_limit, new_resolve_limit=new_resolve_limit, new_reply_time=new_reply_time, new_resolve_time=new_resolve_time, new_location_code=req_data.get('location_code'), created_at_iso=req_data.get('created_at'), new_comments=new_comments)
         self.move_card_visually(req_data, new_s, new_c)
-        def sync_task():
-            print("🚀 Aplicando escritura forzada directa (Optimizacion)...")
-            force_success = self.reader.update_request_metadata(req_data['id'], new_status=new_s, new_priority=new_p, new_category=new_c, new_reply_limit=new_reply_limit, new_resolve_limit=new_resolve_limit, new_reply_time=new_reply_time, new_resolve_time=new_resolve_time, new_comments=new_comments, etag=None)
-            if force_success:
-                try:
-                    final_fresh = self.reader.get_latest_metadata(req_data['id'])
-                    if final_fresh: 
-                        req_data['etag'] = final_fresh.get('etag')
-                        self.requests_data_cache[req_data['id']] = req_data
-                except: pass
+        print("🚀 Aplicando escritura forzada directa (Optimizacion)...")
+        future = self.reader.update_request_metadata(req_data['id'], new_status=new_s, new_priority=new_p, new_category=new_c, new_reply_limit=new_reply_limit, new_resolve_limit=new_resolve_limit, new_reply_time=new_reply_time, new_resolve_time=new_resolve_time, new_comments=new_comments, etag=None, wait=False)
+        if not future: return
+        def on_saved(fut):
+            # Corre en el hilo de la cola write-behind: el trabajo de red se delega
+            try:
+                fut.result()
                 return
-            print(f"❌ Fallo definitivo al guardar. Código: {self.reader.client.last_error_code}")
+            except WriteFailed as e: print(f"❌ Fallo definitivo al guardar. Código: {e.status}")
+            except Exception as e: print(f"❌ Fallo definitivo al guardar: {e}")
             self.notifier.send("Error", "Failed to update SharePoint. Reloading...", "error")
-            self._reload_single_item(req_data['id'])
-        threading.Thread(target=sync_task, daemon=True).start()
+            threading.Thread(target=self._reload_single_item, args=(req_data['id'],), daemon=True).start()
+        future.add_done_callback(on_saved)
 
-    def _reload_single_item(self, req_id):
-        fresh_data = self.reader.get_latest_metadata(req_id)
+    def _reload_single_item(self, req_id, fresh_data=None):
+        if fresh_data is None: fresh_data = self.reader.get_latest_metadata(req_id)
         if fresh_data:
             cached_loc = self.requests_data_cache.get(req_id, {}).get('location_code')
             if cached_loc and not fresh_data.get('location_code'): fresh_data['location_code'] = cached_loc
             if not fresh_data.get('location_code'): fresh_data = self._ensure_request_location(req_id, fresh_data)
             if req_id in self.requests_data_cache: self.requests_data_cache[req_id].update(fresh_data)
             else: self.requests_data_cache[req_id] = fresh_data
+            self._bump_store_version()
             current_loc = fresh_data.get('location_code', '???')
             processed = self.calculator.process_requests([fresh_data])[0]
             self.update_local_ui_card(req_id, new_status=processed.get('status'), new_priority=processed.get('priority'), new_category=processed.get('category'), editor_name=processed.get('editor'), new_reply_limit=processed.get('reply_limit'), new_resolve_limit=processed.get('resolve_limit'), new_reply_time=processed.get('reply_time'), new_resolve_time=processed.get('resolve_time'), new_location_code=current_loc, created_at_iso=processed.get('created_at'), new_comments=processed.get('comments'))
             self.move_card_visually(processed, processed.get('status'), processed.get('category'))
-=======
-        
-        req_data.update(update_dict)
-        self.requests_data_cache[req_data['id']] = req_data
-        
-        self.update_local_ui_card(
-            req_id=req_data['id'], 
-            new_status=new_s, 
-            new_priority=new_p, 
-            new_category=new_c, 
-            editor_name=my_name,
-            new_reply_limit=new_reply_limit,
-            new_resolve_limit=new_resolve_limit,
-            new_reply_time=new_reply_time,
-            new_resolve_time=new_resolve_time
-        )
-        self.move_card_visually(req_data, new_s, new_c)
-        
-        # --- SINCRONIZACIÓN CON ETAG Y REINTENTO ---
-        def sync_task():
-            # Intento 1: Usar el ETag actual (Concurrencia Optimista)
-            current_etag = req_data.get('etag')
-            
-            success = self.reader.update_request_metadata(
-                req_data['id'], 
-                new_status=new_s, 
-                new_priority=new_p, 
-                new_category=new_c,
-                new_reply_limit=new_reply_limit,     
-                new_resolve_limit=new_resolve_limit,
-                new_reply_time=new_reply_time,
-                new_resolve_time=new_resolve_time,
-                etag=current_etag 
-            )
-            
-            if success:
-                self.notifier.send("Saved", "Changes updated in SharePoint", "success")
-                return
-
-            # Si falló, verificamos si fue por conflicto (412)
-            if self.reader.client.last_error_code == 412:
-                print("⚠️ Conflicto de ETag (412). Aplicando escritura forzada inmediata (Force Write)...")
-                
-                # INTENTO 2: FUERZA BRUTA DIRECTA (Saltamos el reintento 'smart' que fallaba)
-                # Borramos el ETag para que Graph ignore la versión
-                force_success = self.reader.update_request_metadata(
-                    req_data['id'], 
-                    new_status=new_s, 
-                    new_priority=new_p, 
-                    new_category=new_c,
-                    new_reply_limit=new_reply_limit,     
-                    new_resolve_limit=new_resolve_limit,
-                    new_reply_time=new_reply_time,
-                    new_resolve_time=new_resolve_time,
-                    etag=None 
-                )
-                
-                if force_success:
-                    # Refrescamos el etag después de forzar para sincronizar el estado local
-                    try:
-                        final_fresh = self.reader.get_latest_metadata(req_data['id'])
-                        if final_fresh: 
-                            req_data['etag'] = final_fresh.get('etag')
-                            self.requests_data_cache[req_data['id']] = req_data
-                    except: pass
-                    
-                    self.notifier.send("Saved (Forced)", "Changes updated (conflict resolved).", "success")
-                    return
-
-            # Si llegamos aquí, falló definitivamente (Error de red, permisos, etc.)
-            print(f"❌ Fallo definitivo al guardar. Código: {self.reader.client.last_error_code}")
-            self.notifier.send("Error", "Failed to update SharePoint. Reloading...", "error")
-            
-            # Revertir UI y recargar
-            self._reload_single_item(req_data['id'])
-                
-        threading.Thread(target=sync_task, daemon=True).start()
-
-    def _reload_single_item(self, req_id):
-        """Recarga un solo ítem desde el servidor y actualiza la UI (Recuperación de conflicto)."""
-        fresh_data = self.reader.get_latest_metadata(req_id)
-        if fresh_data:
-            fresh_data['location_code'] = self.requests_data_cache.get(req_id, {}).get('location_code', '???')
-            self.requests_data_cache[req_id] = fresh_data
-            
-            # Recalcular tiempos
-            processed = self.calculator.process_requests([fresh_data])[0]
-            
-            self.update_local_ui_card(
-                req_id,
-                new_status=processed.get('status'),
-                new_priority=processed.get('priority'),
-                new_category=processed.get('category'),
-                editor_name=processed.get('editor'),
-                new_reply_limit=processed.get('reply_limit'),
-                new_resolve_limit=processed.get('resolve_limit'),
-                new_reply_time=processed.get('reply_time'),
-                new_resolve_time=processed.get('resolve_time')
-            )
-            self.move_card_visually(processed, processed.get('status'), processed.get('category'))
-            
-            # Actualizar dropdowns si el diálogo está abierto
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             if self.detail_dialog.open and self.detail_title.value == processed.get('request_name'):
                 self.status_dropdown.value = processed.get('status')
                 self.priority_dropdown.value = str(processed.get('priority'))
                 self.category_dropdown.value = processed.get('category')
-<<<<<<< HEAD
                 self.detail_subtitle.value = f"Location: {current_loc}" 
                 self.page.update()
 
     @track_errors("Background Polling") 
     def background_poller(self):
         POLL_INTERVAL = 5 
-=======
-                self.page.update()
-
-    @track_errors("Background Polling") # --- PROTEGIDO ---
-    def background_poller(self):
-        """Hilo secundario INTELIGENTE: Usa Delta Query cada 5s."""
-        POLL_INTERVAL = 5 # Mucho más rápido gracias a Delta
-        
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         while self._polling_active:
             if not self.reader.client.is_session_valid:
                 time.sleep(5)
                 continue
-<<<<<<< HEAD
             time.sleep(POLL_INTERVAL)
             if not self._polling_active: break
             
@@ -1737,37 +1089,17 @@ class DashboardManager:
                 if not changes: continue 
                 
                 print(f"⚡ Detectados {len(changes)} cambios en tiempo real (Multi-Root).")
-=======
-
-            time.sleep(POLL_INTERVAL)
-            if not self._polling_active: break
-            
-            # Solo ejecutamos si tenemos un delta link activo (significa que la carga inicial terminó)
-            if not self.delta_link: continue
-            
-            try:
-                # 1. Consultar cambios ligeros
-                new_delta_link, changes = self.reader.fetch_changes(self.delta_link)
-                
-                if new_delta_link:
-                    self.delta_link = new_delta_link # Guardar token para la próxima
-                else:
-                    # Si devuelve None (410 Gone), hay que reiniciar Delta (re-cargar datos)
-                    print("🔄 Token Delta expirado. Reiniciando sincronización completa...")
-                    self.load_data(limit_dates=self.active_limit_dates, date_range=self.active_date_range, silent=True)
-                    continue
-
-                if not changes: continue # Nada pasó, dormir otros 5s
-
-                print(f"⚡ Detectados {len(changes)} cambios en tiempo real.")
-                
-                # 2. Procesar cambios
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                 changes_detected_in_ui = False
                 
+                # Un solo $batch para todas las carpetas cambiadas de esta página de delta
+                changed_folder_ids = [
+                    c.get('id') for c in changes
+                    if 'folder' in c and 'deleted' not in c and c.get('name') != self.current_cycle_date
+                ]
+                prefetched = self.reader.get_latest_metadata_batch(changed_folder_ids) if changed_folder_ids else {}
+                
                 for change in changes:
                     item_id = change.get('id')
-<<<<<<< HEAD
                     root_source = change.get('_source_root') # Metadato inyectado
                     
                     if 'deleted' in change:
@@ -1778,21 +1110,23 @@ class DashboardManager:
                         
                     if 'folder' in change:
                         if item_id in self.requests_data_cache:
-                            self._reload_single_item(item_id)
-                            changes_detected_in_ui = True
+                            if item_id in prefetched:
+                                self._reload_single_item(item_id, prefetched[item_id])
+                                changes_detected_in_ui = True
                         else:
                             # Ignorar carpeta del ciclo mismo si aparece
                             # (Nota: current_cycle_folder_id ahora es ambiguo, pero el filtro por nombre basta)
                             if change.get('name') == self.current_cycle_date: continue
                             
-                            new_req = self.reader.get_latest_metadata(item_id)
+                            new_req = prefetched.get(item_id)
+                            if not new_req: continue
                             has_request_metadata = new_req.get('status') or new_req.get('priority')
                             
                             if not has_request_metadata: continue
                             if 'location_code' not in new_req: new_req['location_code'] = "New/Syncing"
                             
                             new_req = self._ensure_request_location(item_id, new_req)
-                            new_req['date_folder'] = self.current_cycle_date
+                            if not new_req.get('date_folder'): new_req['date_folder'] = self.current_cycle_date
                             new_req['unread_emails'] = 0
                             
                             # PROPAGAR LA RUTA DE ORIGEN
@@ -1800,6 +1134,7 @@ class DashboardManager:
                             
                             proc = self.calculator.process_requests([new_req])[0]
                             self.requests_data_cache[item_id] = proc
+                            self._bump_store_version()
                             
                             target_cat = self.resolve_category_key(proc.get('category', 'New Email'))
                             self._ensure_category_tab(target_cat)
@@ -1807,7 +1142,7 @@ class DashboardManager:
                             if target_cat in self.grids:
                                 self.grids[target_cat].controls.insert(0, self.create_request_card(proc))
                                 self.grids[target_cat].update()
-                                self.notifier.send("New Item", f"New request: {proc.get('request_name', 'Unknown')}", "info")
+                                self.notifier.send("New Item", f"New request: {proc.get('request_name', 'Unknown')}", "info", item=proc.get('request_name', 'Unknown'))
                                 changes_detected_in_ui = True
                                 
                     if 'file' in change:
@@ -1822,12 +1157,13 @@ class DashboardManager:
                             self.requests_state_cache[parent_id] = new_count
                             self.requests_data_cache[parent_id]['unread_emails'] = new_count
                             self.requests_data_cache[parent_id]['has_outlook_failure'] = has_fail
+                            self._bump_store_version()
                             
                             self.update_local_card_indicators(parent_id, new_count, has_fail)
 
                             if new_count > old_count:
                                 name = self.requests_data_cache[parent_id].get('request_name', 'Request')
-                                self.notifier.send("New Email", f"Activity in: {name}")
+                                self.notifier.send("New Email", f"Activity in: {name}", item=parent_id, count=new_count - old_count)
                                 
                 if changes_detected_in_ui:
                     with self._ui_lock:
@@ -1836,87 +1172,6 @@ class DashboardManager:
                         
             except Exception as e:
                 print(f"Error en Multi-Smart Polling: {e}")
-=======
-                    
-                    # CASO A: ELIMINACIÓN
-                    if 'deleted' in change:
-                        if item_id in self.requests_data_cache:
-                            print(f"🗑️ Eliminando solicitud {item_id} de la UI")
-                            self._remove_card_from_ui(item_id)
-                            changes_detected_in_ui = True
-                        continue
-                    
-                    # CASO B: CARPETA (Solicitud Nueva o Modificada)
-                    if 'folder' in change:
-                        # Si ya existe, es una actualización de metadata (status, priority, etag)
-                        if item_id in self.requests_data_cache:
-                            self._reload_single_item(item_id)
-                            changes_detected_in_ui = True
-                        
-                        # Si NO existe, podría ser una solicitud nueva... O una carpeta de Ubicación (FANTASMA)
-                        else:
-                            # 1. Ignorar la carpeta raíz del ciclo
-                            if item_id == self.current_cycle_folder_id: continue
-                            
-                            # 2. Traer data completa para verificar
-                            new_req = self.reader.get_latest_metadata(item_id)
-                            
-                            # 3. FILTRO DE FANTASMAS (Ubicaciones vs Solicitudes)
-                            # Las ubicaciones NO suelen tener Status/Priority/Category definidos como columnas
-                            # Las solicitudes SÍ tienen al menos Status (o por defecto Pending/New)
-                            has_request_metadata = new_req.get('status') or new_req.get('priority')
-                            
-                            if not has_request_metadata:
-                                # Es probable que sea una carpeta de ubicación (Padre), la ignoramos
-                                print(f"👻 Ignorando posible carpeta de ubicación: {new_req.get('name')}")
-                                continue
-
-                            # Si pasamos el filtro, es una solicitud real.
-                            # 4. RESOLVER PADRE (Ubicación real)
-                            parent_id = change.get('parentReference', {}).get('id')
-                            if parent_id and parent_id != self.current_cycle_folder_id:
-                                # Hacemos una llamada rápida para saber el nombre del padre (la ubicación)
-                                parent_meta = self.reader.get_latest_metadata(parent_id)
-                                new_req['location_code'] = parent_meta.get('name') if parent_meta else "Unknown"
-                            else:
-                                new_req['location_code'] = "New/Syncing"
-                                
-                            new_req['date_folder'] = self.current_cycle_date
-                            new_req['unread_emails'] = 0
-                            
-                            # Procesar y agregar
-                            proc = self.calculator.process_requests([new_req])[0]
-                            self.requests_data_cache[item_id] = proc
-                            
-                            # Agregar a "To Do" o Categoría
-                            target_cat = self.resolve_category_key(proc.get('category', 'New Email'))
-                            self._ensure_category_tab(target_cat)
-                            if target_cat in self.grids:
-                                self.grids[target_cat].controls.insert(0, self.create_request_card(proc))
-                                self.grids[target_cat].update()
-                                changes_detected_in_ui = True
-                    
-                    # CASO C: ARCHIVO (Correo nuevo -> Actualizar Badge)
-                    if 'file' in change:
-                        parent_id = change.get('parentReference', {}).get('id')
-                        if parent_id and parent_id in self.requests_data_cache:
-                            # Alguien agregó un archivo a una solicitud existente
-                            # Forzamos recálculo de unread count
-                            new_count = self.reader.get_unread_email_count(parent_id, force_refresh=True)
-                            self.requests_state_cache[parent_id] = new_count
-                            self.requests_data_cache[parent_id]['unread_emails'] = new_count
-                            self.update_local_badge(parent_id, new_count)
-                            if new_count > 0:
-                                name = self.requests_data_cache[parent_id].get('request_name', 'Request')
-                                self.notifier.send("New Email", f"Activity in: {name}")
-
-                if changes_detected_in_ui:
-                    self.update_tab_headers()
-                    self.page.update()
-
-            except Exception as e:
-                print(f"Error en Smart Polling: {e}")
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                 time.sleep(5)
 
     def _remove_card_from_ui(self, req_id):
@@ -1930,24 +1185,16 @@ class DashboardManager:
                         grid.update()
                         self._remove_category_tab_if_empty(grid_name)
             del self.ui_refs[req_id]
-<<<<<<< HEAD
-=======
-        
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.requests_data_cache.pop(req_id, None)
         self.requests_state_cache.pop(req_id, None)
         self.requests_meta_cache.pop(req_id, None)
+        self._bump_store_version()
 
-<<<<<<< HEAD
-=======
-    # ... Resto de métodos auxiliares (move_card, resolve_key, etc) se mantienen igual ...
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
     def move_card_visually(self, req_data, new_status, new_category):
         try:
             req_id = req_data['id']
             changes_made = False
             should_be_todo = self.is_status_todo(new_status)
-<<<<<<< HEAD
             existing_todo_ref = next((r for r in self.ui_refs.get(req_id, []) if r['parent_grid'] == "To Do"), None)
             target_grid_name = self.resolve_category_key(new_category)
             existing_cat_ref = next((r for r in self.ui_refs.get(req_id, []) if r['parent_grid'] != "To Do"), None)
@@ -1980,74 +1227,33 @@ class DashboardManager:
                         existing_cat_ref['parent_grid'] = target_grid_name
                         changes_made = True
             else:
-=======
-            
-            existing_todo_ref = next((r for r in self.ui_refs.get(req_id, []) if r['parent_grid'] == "To Do"), None)
-            
-            if should_be_todo and not existing_todo_ref and "To Do" in self.grids:
-                self.grids["To Do"].controls.insert(0, self.create_request_card(req_data, show_category_label=True))
-                self.grids["To Do"].update()
-                changes_made = True
-            elif not should_be_todo and existing_todo_ref:
-                if existing_todo_ref['card_control'] in self.grids["To Do"].controls:
-                    self.grids["To Do"].controls.remove(existing_todo_ref['card_control'])
-                    self.grids["To Do"].update()
-                    self.ui_refs[req_id].remove(existing_todo_ref)
-                    changes_made = True
-            
-            target_grid_name = self.resolve_category_key(new_category)
-            existing_cat_ref = next((r for r in self.ui_refs.get(req_id, []) if r['parent_grid'] != "To Do"), None)
-            
-            if existing_cat_ref and existing_cat_ref['parent_grid'] != target_grid_name:
-                curr_grid = self.grids.get(existing_cat_ref['parent_grid'])
-                if curr_grid and existing_cat_ref['card_control'] in curr_grid.controls:
-                    curr_grid.controls.remove(existing_cat_ref['card_control'])
-                    curr_grid.update()
-                    self._remove_category_tab_if_empty(existing_cat_ref['parent_grid'])
-                
-                self._ensure_category_tab(target_grid_name)
-                if target_grid_name in self.grids:
-                    self.grids[target_grid_name].controls.insert(0, existing_cat_ref['card_control'])
-                    self.grids[target_grid_name].update()
-                    existing_cat_ref['parent_grid'] = target_grid_name
-                    changes_made = True
-                    
-            elif not existing_cat_ref:
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                 self._ensure_category_tab(target_grid_name)
                 if target_grid_name in self.grids:
                     self.grids[target_grid_name].controls.insert(0, self.create_request_card(req_data))
                     self.grids[target_grid_name].update()
                     changes_made = True
-<<<<<<< HEAD
             self._apply_filters()
             if changes_made: self.update_tab_headers()
         except Exception as e: print(f"Error moving card visually: {e}")
 
     def open_remediation_dialog(self, req_data):
-        dialog = RemediationDialog(self.page, req_data, self.remediation_service, self.location_service, self.on_remediation_success, self.available_dates)
+        # Solicitudes hermanas (misma fecha y ubicación) para remediar el lote completo de una vez
+        peers = [r for r in self.requests_data_cache.values()
+                 if r.get('date_folder') == req_data.get('date_folder') and r.get('location_code') == req_data.get('location_code')]
+        dialog = RemediationDialog(self.page, req_data, self.remediation_service, self.location_service, self.on_remediation_success, self.available_dates,
+                                   bulk_requests=peers, on_bulk_success=self.on_bulk_remediation_success)
         with self._ui_lock:
             self.page.open(dialog)
             self.page.update()
 
-    def on_remediation_success(self, req_id, new_loc_update=None):
-        if new_loc_update and req_id in self.requests_data_cache: self.requests_data_cache[req_id]['location_code'] = new_loc_update
-=======
-                    
-            if changes_made: 
-                self.update_tab_headers()
-        except: 
-            pass
-
-    def open_remediation_dialog(self, req_data):
-        dialog = RemediationDialog(self.page, req_data, self.remediation_service, self.location_service, self.on_remediation_success, self.available_dates)
-        self.page.open(dialog)
-        self.page.update()
+    def on_bulk_remediation_success(self, result, new_loc_update=None):
+        for req_id in result["succeeded"]: self.on_remediation_success(req_id, new_loc_update=new_loc_update, notify=False)
+        failed = len(result["failed"])
+        msg = f"{len(result['succeeded'])} requests remediated." + (f" {failed} failed." if failed else "")
+        self.notifier.send("Bulk Fix", msg, "warning" if failed else "success")
 
-    def on_remediation_success(self, req_id, new_loc_update=None):
-        if new_loc_update and req_id in self.requests_data_cache: 
-            self.requests_data_cache[req_id]['location_code'] = new_loc_update
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
+    def on_remediation_success(self, req_id, new_loc_update=None, notify=True):
+        if new_loc_update and req_id in self.requests_data_cache: self.requests_data_cache[req_id]['location_code'] = new_loc_update
         if req_id in self.ui_refs:
             current_refs = list(self.ui_refs[req_id])
             for ref in current_refs:
@@ -2070,8 +1276,7 @@ class DashboardManager:
         if not new_loc_update:
             self._remove_card_from_ui(req_id)
             self.update_tab_headers()
-        self.notifier.send("Fixed", "Request remediation applied successfully.", "success")
-<<<<<<< HEAD
+        if notify: self.notifier.send("Fixed", "Request remediation applied successfully.", "success")
         self.safe_update()
 
     def update_tab_headers(self):
@@ -2085,58 +1290,23 @@ class DashboardManager:
         desired_status = self.status_dropdown.value or "Pending"
         desired_priority = self.priority_dropdown.value
         desired_category = self.category_dropdown.value
-=======
-        self.page.update()
-
-    def update_tab_headers(self):
-        if "To Do" in self.grids and "To Do" in self.tab_refs: 
-            self.tab_refs["To Do"].text = f"To Do ({len(self.grids['To Do'].controls)})"
-        for cat_name, grid in self.grids.items():
-            if cat_name != "To Do" and cat_name in self.tab_refs: 
-                self.tab_refs[cat_name].text = f"({len(grid.controls)}) {cat_name}"
-        self.tabs.update()
-
-    @track_errors("Changing Property") # --- PROTEGIDO ---
-    def handle_property_change(self, e, req_data):
-        desired_status = self.status_dropdown.value
-        desired_priority = self.priority_dropdown.value
-        desired_category = self.category_dropdown.value
-        
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         if desired_status == "No Action Needed":
             self.pending_no_action_req = {'req': req_data, 'prio': desired_priority, 'cat': desired_category}
             self.page.open(self.no_action_dialog)
             self.page.update()
             return 
-<<<<<<< HEAD
         new_reply_limit, new_resolve_limit, new_reply_time = ..., ..., ...
         if desired_status == "In Progress" and not req_data.get('reply_time'): new_reply_time = datetime.now(timezone.utc).isoformat()
         if desired_category != req_data.get('category'):
             self.notifier.send("Calculating...", "Applying business rules...", "info")
             user_email = self.current_user.get('mail') if self.current_user else "Unknown"
             auto_prio, reply_iso, resolve_iso = self.rules_service.calculate_deadlines(req_data.get('created_at'), desired_category, user_email)
-=======
-
-        new_reply_limit = ... 
-        new_resolve_limit = ...
-        new_reply_time = ...
-        if desired_status == "In Progress" and not req_data.get('reply_time'):
-            new_reply_time = datetime.now(timezone.utc).isoformat()
-        
-        if desired_category != req_data.get('category'):
-            self.notifier.send("Calculating...", "Applying business rules...", "info")
-            user_email = self.current_user.get('mail') if self.current_user else "Unknown"
-            auto_prio, reply_iso, resolve_iso = self.rules_service.calculate_deadlines(
-                req_data.get('created_at'), desired_category, user_email
-            )
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             if auto_prio:
                 desired_priority = auto_prio 
                 self.priority_dropdown.value = str(auto_prio)
                 self.priority_dropdown.update()
                 new_reply_limit = reply_iso
                 new_resolve_limit = resolve_iso
-<<<<<<< HEAD
         cached_item = self.requests_data_cache.get(req_data['id'], {})
         known_location = cached_item.get('location_code') or req_data.get('location_code')
         if known_location and known_location != "???": req_data['location_code'] = known_location
@@ -2151,66 +1321,15 @@ class DashboardManager:
                 if fresh_data.get('status') == "In Progress" and current_editor != my_name and desired_status != "In Progress":
                       print(f"⚠️ Conflicto tardío detectado con {current_editor}. UI optimista prevalece.")
         threading.Thread(target=background_conflict_check, daemon=True).start()
-=======
-
-        self.notifier.send("Checking...", "Verifying status with server...", "info")
-        
-        def worker_check():
-            fresh_data = self.reader.get_latest_metadata(req_data['id'])
-            check_data = fresh_data if fresh_data else req_data
-            
-            if fresh_data:
-                self.requests_data_cache[req_data['id']].update(fresh_data)
-            
-            current_status = check_data.get('status')
-            current_editor = check_data.get('editor', 'Unknown')
-            my_name = self.current_user.get('displayName') if self.current_user else "Unknown"
-            
-            is_conflict = False
-            conflict_msg = ""
-            
-            if current_status == "In Progress" and current_editor != my_name and desired_status != current_status:
-                is_conflict = True
-                conflict_msg = f"{current_editor} is already working on this.\nAre you sure you want to change it?"
-            elif current_status == "Done" and current_editor != my_name and desired_status != current_status:
-                is_conflict = True
-                conflict_msg = f"{current_editor} already marked this as Done.\nAre you sure you want to reopen/change it?"
-
-            if is_conflict:
-                self.ownership_confirm_text.value = conflict_msg
-                self.ownership_pending_change = {
-                    'req_data': check_data,
-                    'new_status': desired_status,
-                    'new_priority': desired_priority,
-                    'new_category': desired_category,
-                    'new_reply_limit': new_reply_limit,     
-                    'new_resolve_limit': new_resolve_limit,
-                    'new_reply_time': new_reply_time
-                }
-                self.page.open(self.ownership_confirm_dialog)
-                self.page.update()
-                return
-
-            self._execute_property_change(
-                check_data, desired_status, desired_priority, desired_category,
-                new_reply_limit, new_resolve_limit,
-                new_reply_time=new_reply_time 
-            )
-
-        threading.Thread(target=worker_check, daemon=True).start()
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
 
     def confirm_reply_action(self, e):
         self.page.close(self.reply_confirm_dialog)
         if not self.pending_reply_req: return
         req = self.pending_reply_req
         now_iso = datetime.now(timezone.utc).isoformat()
-<<<<<<< HEAD
         cached_item = self.requests_data_cache.get(req['id'], {})
         known_location = cached_item.get('location_code')
         if known_location: req['location_code'] = known_location
-=======
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self._execute_property_change(req, new_s="In Progress", new_p=req.get('priority'), new_c=req.get('category'), new_reply_time=now_iso)
         self.pending_reply_req = None
 
@@ -2220,13 +1339,9 @@ class DashboardManager:
         d = self.pending_no_action_req
         req = d['req']
         now_iso = datetime.now(timezone.utc).isoformat()
-<<<<<<< HEAD
         cached_item = self.requests_data_cache.get(req['id'], {})
         known_location = cached_item.get('location_code')
         if known_location: req['location_code'] = known_location
-=======
-        
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         if replied:
             val_reply = ... 
             if not req.get('reply_time'): val_reply = now_iso
@@ -2235,7 +1350,6 @@ class DashboardManager:
             self._execute_property_change(req, new_s="No Action Needed", new_p=d['prio'], new_c=d['cat'], new_reply_limit=None, new_resolve_limit=None, new_reply_time=None, new_resolve_time=None)
         self.pending_no_action_req = None
 
-<<<<<<< HEAD
     def handle_file_click(self, e, file_data, req_data, title_control, icon_control):
         filename, download_url = file_data['name'], file_data.get('download_url')
         
@@ -2246,15 +1360,6 @@ class DashboardManager:
                     title_control.color = SSA_GREY
                     title_control.update() 
                 
-=======
-    # Métodos restantes sin cambios significativos se incluyen para mantener integridad
-    def handle_file_click(self, e, file_data, req_data, title_control, icon_control):
-        filename, download_url = file_data['name'], file_data.get('download_url')
-        if filename.lower().endswith(('.eml', '.msg')):
-            if file_data.get('status') == 'To Be Reviewed':
-                if title_control: 
-                    title_control.weight, title_control.color = ft.FontWeight.NORMAL, SSA_GREY
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                 curr = self.requests_state_cache.get(req_data['id'], 0)
                 if curr > 0:
                     new_c = curr - 1
@@ -2262,12 +1367,9 @@ class DashboardManager:
                     if req_data['id'] in self.requests_data_cache: 
                         self.requests_data_cache[req_data['id']]['unread_emails'] = new_c
                     self.update_local_badge(req_data['id'], new_c)
-<<<<<<< HEAD
                 
-=======
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                 file_data['status'] = 'Seen'
-                threading.Thread(target=lambda: self.reader.update_request_metadata(file_data['id'], new_status="Seen"), daemon=True).start()
+                self.reader.update_request_metadata(file_data['id'], new_status="Seen", wait=False)
             
             trigger_question = False
             if req_data.get('status') == 'Pending':
@@ -2275,7 +1377,6 @@ class DashboardManager:
                 if all_files and all_files[0]['id'] == file_data['id']:
                     trigger_question = True
                     self.pending_reply_req = req_data
-<<<<<<< HEAD
             
             self.page.open(self.mail_loading_dialog)
             self.page.update()
@@ -2313,23 +1414,6 @@ class DashboardManager:
                                 self.page.update()
                     except: pass
 
-=======
-
-            self.page.open(self.mail_loading_dialog)
-            self.page.update()
-
-            def download_task():
-                local_path = self.reader.download_file_locally(download_url, filename)
-                self.page.close(self.mail_loading_dialog)
-                self.page.update()
-                if local_path: 
-                    try: os.startfile(local_path)
-                    except: pass
-                if trigger_question:
-                    time.sleep(0.5)
-                    self.page.open(self.reply_confirm_dialog)
-                    self.page.update()
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             threading.Thread(target=download_task, daemon=True).start()
         else: 
             webbrowser.open(file_data['web_url'])
@@ -2339,11 +1423,7 @@ class DashboardManager:
         if not req_data: return
         self.detail_title.value = req_data.get('request_name', 'Details')
         self.detail_subtitle.value = f"Location: {req_data.get('location_code')}"
-<<<<<<< HEAD
         self.status_dropdown.value = req_data.get('status') or "Pending"
-=======
-        self.status_dropdown.value = req_data.get('status')
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.priority_dropdown.value = str(req_data.get('priority'))
         self.category_dropdown.value = req_data.get('category')
         self.status_dropdown.on_change = lambda e: self.handle_property_change(e, req_data)
@@ -2356,21 +1436,14 @@ class DashboardManager:
                 time.sleep(0.5)
                 files = self.reader.get_request_files(req_data['id'])
                 file_controls = []
-<<<<<<< HEAD
                 if not files: file_controls.append(ft.Text("No files found.", italic=True, color=ft.Colors.GREY))
                 else:
                     req_status = req_data.get('status') 
                     
-=======
-                if not files: 
-                    file_controls.append(ft.Text("No files found.", italic=True, color=ft.Colors.GREY))
-                else:
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                     for f in files:
                         name = f['name']
                         is_eml = name.lower().endswith(('.eml', '.msg'))
                         is_unread = f.get('status') == 'To Be Reviewed' and is_eml
-<<<<<<< HEAD
                         
                         outlook_fails = f.get('outlook_fails')
                         outlook_alert = None
@@ -2388,13 +1461,10 @@ class DashboardManager:
                                     ft.Text(msg, color=ft.Colors.AMBER_800, size=12, weight=ft.FontWeight.BOLD, italic=True)
                                 ], spacing=5)
 
-=======
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                         if is_eml: icon, icon_color = ft.Icons.EMAIL, (SSA_RED_BADGE if is_unread else ft.Colors.BLUE)
                         elif name.lower().endswith('.pdf'): icon, icon_color = ft.Icons.PICTURE_AS_PDF, ft.Colors.RED
                         elif name.lower().endswith(('.xls', '.xlsx')): icon, icon_color = ft.Icons.TABLE_CHART, SSA_GREEN
                         else: icon, icon_color = ft.Icons.INSERT_DRIVE_FILE, ft.Colors.GREY
-<<<<<<< HEAD
                         
                         title_ctrl = ft.Text(name, weight=ft.FontWeight.BOLD if is_unread else ft.FontWeight.NORMAL, size=14, color=ft.Colors.BLACK if is_unread else SSA_GREY, overflow=ft.TextOverflow.ELLIPSIS)
                         
@@ -2410,10 +1480,6 @@ class DashboardManager:
                             ft.Container(width=10, height=10, border_radius=5, bgcolor=SSA_RED_BADGE if is_unread else ft.Colors.TRANSPARENT)
                         ]
 
-=======
-                        title_ctrl = ft.Text(name, weight=ft.FontWeight.BOLD if is_unread else ft.FontWeight.NORMAL, size=14, color=ft.Colors.BLACK if is_unread else SSA_GREY, overflow=ft.TextOverflow.ELLIPSIS)
-                        row_content = [ft.Icon(icon, color=icon_color), ft.Column([title_ctrl, ft.Text(f.get('created_at', '')[:16], size=11, color=ft.Colors.GREY)], spacing=2, expand=True), ft.Container(width=10, height=10, border_radius=5, bgcolor=SSA_RED_BADGE if is_unread else ft.Colors.TRANSPARENT)]
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
                         if is_eml:
                             legacy_btn = ft.IconButton(icon=ft.Icons.MEDICAL_SERVICES, icon_color=ft.Colors.LIGHT_GREEN, icon_size=16, tooltip="Fix issues of New Outlook (Emergency)", on_click=lambda e, fd=f: self.launch_email_emergency(fd, req_data, title_ctrl))
                             row_content.append(ft.Container(width=5))
@@ -2437,47 +1503,29 @@ class DashboardManager:
                 if req_data['id'] in self.requests_data_cache: self.requests_data_cache[req_data['id']]['unread_emails'] = new_c
                 self.update_local_badge(req_data['id'], new_c)
             file_data['status'] = 'Seen'
-            threading.Thread(target=lambda: self.reader.update_request_metadata(file_data['id'], new_status="Seen"), daemon=True).start()
-<<<<<<< HEAD
-=======
-        
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
+            self.reader.update_request_metadata(file_data['id'], new_status="Seen", wait=False)
         trigger_question = False
         if req_data.get('status') == 'Pending':
             all_files = self.reader.get_request_files(req_data['id'])
             if all_files and all_files[0]['id'] == file_data['id']:
                 trigger_question = True
                 self.pending_reply_req = req_data
-<<<<<<< HEAD
-=======
-
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
         self.page.open(self.legacy_loading_dialog)
         self.page.update()
         def task():
             local_path = self.reader.download_file_locally(download_url, filename)
             success, msg = False, "Download failed"
             if local_path: success, msg = self.legacy_service.launch_classic(local_path)
-<<<<<<< HEAD
             with self._ui_lock:
                 self.page.close(self.legacy_loading_dialog)
                 self.page.update()
-=======
-            self.page.close(self.legacy_loading_dialog)
-            self.page.update()
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             if success:
                 self.notifier.send("Emergency Mode", "Classic Outlook launched.", "success")
                 if trigger_question:
                     time.sleep(1.0) 
-<<<<<<< HEAD
                     with self._ui_lock:
                         self.page.open(self.reply_confirm_dialog)
                         self.page.update()
-=======
-                    self.page.open(self.reply_confirm_dialog)
-                    self.page.update()
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
             else: self.notifier.send("Launch Failed", msg, "error")
         threading.Thread(target=task, daemon=True).start()
 
@@ -2491,7 +1539,6 @@ class DashboardManager:
                     refs['badge_text'].value = str(new_count)
                     refs['badge_container'].visible = (new_count > 0)
                     if refs['badge_container'].page: refs['badge_container'].update()
-<<<<<<< HEAD
                 except: pass
 
     def update_local_card_indicators(self, req_id, new_count, has_failure):
@@ -2507,6 +1554,3 @@ class DashboardManager:
                         if refs['warning_container'].page: refs['warning_container'].update()
                 except Exception as e:
                     print(f"Error updating local indicators: {e}") 
-=======
-                except: pass
->>>>>>> 050048a87e330291b783c1b91c5b654cf7c42826
@@ -26,6 +26,7 @@ class NotificationCenter(ft.UserControl):
         )
         
         self.notif_list = ft.ListView(expand=True, spacing=2, padding=5)
+        self._item_controls = {}  # id de notificación -> control en notif_list
         
         # Panel flotante
         self.panel_container = ft.Container(
@@ -49,8 +50,7 @@ class NotificationCenter(ft.UserControl):
     def set_manager(self, manager):
         self.manager = manager
         if self.manager:
-            unread = sum(1 for n in self.manager.history if not n.get('read', False))
-            self.update_badge(unread)
+            self.update_badge(self.manager.unread_count)
 
     def update_badge(self, count):
         self.badge_text.value = str(count) if count < 99 else "99+"
@@ -64,28 +64,66 @@ class NotificationCenter(ft.UserControl):
         if not self.show_panel or not self.manager: return
         
         self.notif_list.controls.clear()
-        data = self.manager.history
+        self._item_controls.clear()
+        data = list(self.manager.history)
         if self.filter_mode == "unread":
             data = [n for n in data if not n.get('read', False)]
             
         if not data:
-            self.notif_list.controls.append(
-                ft.Container(
-                    content=ft.Column([
-                        ft.Icon(ft.Icons.NOTIFICATIONS_OFF_OUTLINED, size=40, color=ft.Colors.GREY_300),
-                        ft.Text("No notifications", color=ft.Colors.GREY_400)
-                    ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
-                    alignment=ft.alignment.center,
-                    padding=20
-                )
-            )
+            self.notif_list.controls.append(self._create_empty_placeholder())
         else:
             for n in data:
-                self.notif_list.controls.append(self._create_item(n))
+                item = self._create_item(n)
+                self._item_controls[n['id']] = item
+                self.notif_list.controls.append(item)
+        self._update_list()
+
+    # --- CAMBIOS INCREMENTALES (sin reconstruir la lista) ---
+    def insert_item(self, notif):
+        if not self.show_panel: return  # al abrir el panel se construye desde el historial
+        if notif['id'] in self._item_controls: return
+        if not self._item_controls: self.notif_list.controls.clear()  # quitar "No notifications"
+        item = self._create_item(notif)
+        self._item_controls[notif['id']] = item
+        self.notif_list.controls.insert(0, item)
+        self._update_list()
+
+    def update_item(self, notif):
+        if not self.show_panel: return
+        old = self._item_controls.get(notif['id'])
+        if old is None: return
+        if self.filter_mode == "unread" and notif.get('read', False):
+            self.remove_item(notif['id'])
+            return
+        new = self._create_item(notif)
+        self._item_controls[notif['id']] = new
+        try: self.notif_list.controls[self.notif_list.controls.index(old)] = new
+        except ValueError: return
+        self._update_list()
+
+    def remove_item(self, notif_id):
+        if not self.show_panel: return
+        item = self._item_controls.pop(notif_id, None)
+        if item is None: return
+        if item in self.notif_list.controls: self.notif_list.controls.remove(item)
+        if not self._item_controls: self.notif_list.controls.append(self._create_empty_placeholder())
+        self._update_list()
+
+    def _update_list(self):
         try:
             if self.notif_list.page: self.notif_list.update()
         except: pass
 
+    def _create_empty_placeholder(self):
+        return ft.Container(
+            content=ft.Column([
+                ft.Icon(ft.Icons.NOTIFICATIONS_OFF_OUTLINED, size=40, color=ft.Colors.GREY_300),
+                ft.Text("No notifications", color=ft.Colors.GREY_400)
+            ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+            alignment=ft.alignment.center,
+            padding=20
+        )
+
     def _create_item(self, notif):
         icon = ft.Icons.INFO
         color = ft.Colors.BLUE
@@ -6,7 +6,8 @@ class RemediationDialog(ft.AlertDialog):
     """
     Diálogo de interfaz para la gestión de errores de ubicación y cambio de ciclo.
     """
-    def __init__(self, page, request_data, remediation_service, location_service, on_success_callback, available_dates):
+    def __init__(self, page, request_data, remediation_service, location_service, on_success_callback, available_dates,
+                 bulk_requests=None, on_bulk_success=None):
         super().__init__()
         self.page_ref = page
         self.req = request_data
@@ -14,6 +15,9 @@ class RemediationDialog(ft.AlertDialog):
         self.loc_service = location_service
         self.on_success = on_success_callback
         self.available_dates = available_dates # Lista de ciclos disponibles
+        # Otras solicitudes de la misma fecha/ubicación (limpieza de un lote de correos mal ruteados)
+        self.bulk_requests = [r for r in (bulk_requests or []) if r.get('id') != self.req.get('id')]
+        self.on_bulk_success = on_bulk_success
         
         self.modal = True
         self.title = ft.Text("⚠️ Remediation Required", color=SSA_RED_BADGE, weight=ft.FontWeight.BOLD)
@@ -56,11 +60,17 @@ class RemediationDialog(ft.AlertDialog):
             width=300, text_size=13, visible=False
         )
 
+        self.bulk_checkbox = ft.Checkbox(
+            label=f"Apply to all {len(self.bulk_requests) + 1} requests in this location",
+            value=False, visible=bool(self.bulk_requests and self.on_bulk_success)
+        )
+
         self.info_text = ft.Column([
             ft.Text(f"Request: {self.req.get('request_name')}", size=13, weight=ft.FontWeight.BOLD),
             ft.Text(f"Invalid Loc: {self.req.get('location_code')}", size=12, color="red"),
             ft.Text(f"Date Folder: {self.req.get('date_folder')}", size=11, color="grey"),
             ft.Divider(),
+            self.bulk_checkbox,
             ft.Text("Choose an action:", size=14),
         ], spacing=5)
 
@@ -130,6 +140,22 @@ class RemediationDialog(ft.AlertDialog):
         self.btn_merge.disabled = True
         self.btn_cycle.disabled = True
 
+    def _is_bulk(self):
+        return bool(self.bulk_checkbox.visible and self.bulk_checkbox.value)
+
+    def _run_bulk(self, btn, action, target_location=None, target_date=None):
+        """Aplica la acción a todas las solicitudes de la ubicación en una sola operación masiva."""
+        result = self.service.bulk_remediate([self.req] + self.bulk_requests, action,
+                                             target_location=target_location, target_date=target_date)
+        if result["succeeded"]: self.on_bulk_success(result, new_loc_update=target_location)
+        if result["failed"]:
+            btn.text = f"{len(result['failed'])} failed"
+            btn.bgcolor = ft.Colors.RED_900
+            btn.disabled = False
+            self.page_ref.update()
+        else:
+            self.close()
+
     def _show_error(self, btn):
         btn.text = "Error"
         btn.bgcolor = ft.Colors.RED_900
@@ -144,6 +170,7 @@ class RemediationDialog(ft.AlertDialog):
         threading.Thread(target=self._worker_block).start()
 
     def _worker_block(self):
+        if self._is_bulk(): return self._run_bulk(self.btn_block, "block")
         success = self.service.block_and_delete(
             self.req['id'], 
             self.req.get('conversation_id'),
@@ -174,6 +201,7 @@ class RemediationDialog(ft.AlertDialog):
                 threading.Thread(target=self._worker_relocate, args=(new_loc,)).start()
 
     def _worker_relocate(self, new_loc):
+        if self._is_bulk(): return self._run_bulk(self.btn_move, "relocate", target_location=new_loc)
         success = self.service.relocate_folder(
             self.req['id'], 
             new_loc, 
@@ -191,6 +219,7 @@ class RemediationDialog(ft.AlertDialog):
     def show_merge_options(self, e):
         if not self.merge_loc_dropdown.visible:
             self._hide_other_actions(self.btn_merge)
+            self.bulk_checkbox.visible = False
             self.merge_loc_dropdown.visible = True
             self.merge_folder_dropdown.visible = True
             self.btn_merge.text = "Confirm Merge"
@@ -273,6 +302,7 @@ class RemediationDialog(ft.AlertDialog):
                 threading.Thread(target=self._worker_change_cycle, args=(target_date,)).start()
 
     def _worker_change_cycle(self, target_date):
+        if self._is_bulk(): return self._run_bulk(self.btn_cycle, "change_cycle", target_date=target_date)
         success = self.service.change_request_cycle(
             self.req['id'],
             target_date,
@@ -73,6 +73,11 @@ class TimecardView(ft.Container):
         
         self.evidence_dropdown = None
 
+        # Reconciliación de filas: {item_id: (firma, DataRow)} + último item recibido por id
+        self._row_cache = {}
+        self._row_order = []
+        self._items_by_id = {}
+
         self.setup_ui()
         self.start_polling()
 
@@ -166,6 +171,9 @@ class TimecardView(ft.Container):
             data_row_min_height=50
         )
         
+        self._row_cache = {}
+        self._row_order = []
+        
         self.loading_indicator = ft.ProgressRing(width=30, height=30, color=SSA_GREEN, visible=False)
         
         self.content = ft.Column([
@@ -234,6 +242,7 @@ class TimecardView(ft.Container):
         self.page.snack_bar = ft.SnackBar(ft.Text("Refreshing data..."), bgcolor=SSA_GREY, duration=1000)
         self.page.snack_bar.open = True
         self.page.update()
+        self.service.invalidate_timecard_store(self.current_view_date)
         threading.Thread(target=self._fetch_and_update_ui, daemon=True).start()
 
     def _poll_data_loop(self):
@@ -278,19 +287,51 @@ class TimecardView(ft.Container):
                  self.current_view_date = active_date_str
                  self.active_cycle_date = active_date_str
 
-            new_rows = []
-            for item in items:
-                new_rows.append(self._build_row(item))
-            
             if self._paused_polling: return
-
-            with self._ui_lock:
-                self.table.rows = new_rows
-                self.table.update()
+            self._reconcile_rows(items)
                 
         except Exception as e:
             pass
 
+    def _row_signature(self, item):
+        """Hash de los campos visibles de la fila (los que afectan _build_row)."""
+        return hash((
+            item.get('pc_number'), item.get('location'), str(item.get('status')).strip(),
+            bool(item.get('signed_off')), bool(item.get('Approval')), bool(item.get('report_uploaded')),
+            item.get('processed_by') or "", bool(item.get('reported_problems'))
+        ))
+
+    def _latest_item(self, item):
+        """Las filas reutilizadas pueden guardar un dict viejo; los handlers usan la versión más reciente."""
+        return self._items_by_id.get(item['id'], item)
+
+    def _reconcile_rows(self, items):
+        """Reconstruye solo las filas cuyo hash cambió; omite table.update() si nada cambió."""
+        self._items_by_id = {item['id']: item for item in items}
+        new_cache = {}
+        new_rows = []
+        rebuilt = 0
+        for item in items:
+            signature = self._row_signature(item)
+            cached = self._row_cache.get(item['id'])
+            if cached and cached[0] == signature:
+                row = cached[1]
+            else:
+                row = self._build_row(item)
+                rebuilt += 1
+            new_cache[item['id']] = (signature, row)
+            new_rows.append(row)
+
+        new_order = [item['id'] for item in items]
+        if rebuilt == 0 and new_order == self._row_order:
+            return
+
+        with self._ui_lock:
+            self._row_cache = new_cache
+            self._row_order = new_order
+            self.table.rows = new_rows
+            self.table.update()
+
     def _build_row(self, item):
         status = str(item['status']).strip()
         is_signed_off = item.get('signed_off', False)
@@ -311,14 +352,14 @@ class TimecardView(ft.Container):
                 "Resolve",
                 icon=ft.Icons.BUILD_CIRCLE,
                 style=ft.ButtonStyle(bgcolor=ft.Colors.RED_400, color=SSA_WHITE, padding=10),
-                on_click=lambda e, i=item: self.open_unlock_dialog(i)
+                on_click=lambda e, i=item: self.open_unlock_dialog(self._latest_item(i))
             )
         elif s_lower == 'not started':
             action_btn = ft.ElevatedButton(
                 "Start", 
                 icon=ft.Icons.PLAY_ARROW, 
                 style=ft.ButtonStyle(bgcolor=ft.Colors.BLUE, color=SSA_WHITE, padding=10),
-                on_click=lambda e, i=item: self.handle_start_click(i)
+                on_click=lambda e, i=item: self.handle_start_click(self._latest_item(i))
             )
         elif s_lower == 'in progress':
             if not is_signed_off:
@@ -326,7 +367,7 @@ class TimecardView(ft.Container):
                     "Sign Off", 
                     icon=ft.Icons.DRAW, 
                     style=ft.ButtonStyle(bgcolor=ft.Colors.ORANGE, color=SSA_WHITE, padding=10),
-                    on_click=lambda e, i=item: self.open_signoff_dialog(i)
+                    on_click=lambda e, i=item: self.open_signoff_dialog(self._latest_item(i))
                 )
             else:
                 action_btn = ft.ElevatedButton(
@@ -340,7 +381,7 @@ class TimecardView(ft.Container):
                 icon=ft.Icons.REPLAY,
                 icon_color=ft.Colors.GREY_500,
                 tooltip="Revoke Sign Off / Rework",
-                on_click=lambda e, i=item: self.open_revoke_dialog(i)
+                on_click=lambda e, i=item: self.open_revoke_dialog(self._latest_item(i))
             )
 
         review_btn = ft.Container()
@@ -349,7 +390,7 @@ class TimecardView(ft.Container):
                 icon=ft.Icons.RATE_REVIEW, 
                 icon_color=SSA_GREEN, 
                 tooltip="Run Bot Review (Smart Diff)",
-                on_click=lambda e, i=item: self.handle_review_click(i)
+                on_click=lambda e, i=item: self.handle_review_click(self._latest_item(i))
             )
 
         has_report = item['report_uploaded']
@@ -359,7 +400,7 @@ class TimecardView(ft.Container):
             icon_color=SSA_GREEN if has_report else ft.Colors.GREY_300, 
             disabled=not has_report,
             tooltip="Open Saved PDF Report",
-            on_click=lambda e, i=item: self.handle_open_pdf(i)
+            on_click=lambda e, i=item: self.handle_open_pdf(self._latest_item(i))
         )
         
         problems_txt = item.get('reported_problems')
@@ -370,7 +411,7 @@ class TimecardView(ft.Container):
             icon_color=ft.Colors.RED if has_problems else ft.Colors.TRANSPARENT,
             disabled=not has_problems,
             tooltip="View Problems / Notify Manager",
-            on_click=lambda e, i=item: self.open_problems_dialog(i)
+            on_click=lambda e, i=item: self.open_problems_dialog(self._latest_item(i))
         )
 
         return ft.DataRow(cells=[
@@ -635,7 +676,7 @@ class TimecardView(ft.Container):
                 else:
                     mail.HTMLBody = final_html
 
-                self.service.append_history(self.notif_active_item_id, None, "OUTLOOK_OPENED", {"manager": to})
+                self.service.append_history(self.notif_active_item_id, "OUTLOOK_OPENED", {"manager": to})
                 self.service.update_status(self.notif_active_item_id, {"NotificationStatus": "SentWrapper"})
 
             except Exception as ex:
@@ -667,7 +708,7 @@ class TimecardView(ft.Container):
         self.set_active_context(pc, loc, mode="review")
         self.show_snack(f"🤖 Connecting to ADP for {pc}...", ft.Colors.BLUE_900)
         
-        threading.Thread(target=self.service.append_history, args=(item['id'], item['history'], "REVIEW_RUN", {"status": "Started"}), daemon=True).start()
+        threading.Thread(target=self.service.append_history, args=(item['id'], "REVIEW_RUN", {"status": "Started"}), daemon=True).start()
         
         def task_wrapper():
             try:
@@ -684,7 +725,7 @@ class TimecardView(ft.Container):
                     self.show_snack(f"⚠️ {pc}: Found Critical Errors.", ft.Colors.RED)
                     final_problems = f"[{timestamp}]\n" + "\n".join(criticals)
                     self.service.update_status(item['id'], {"ReportedProblems": final_problems})
-                    self.service.append_history(item['id'], item['history'], "REVIEW_FAIL", {"reason": "Critical Errors", "count": len(criticals)})
+                    self.service.append_history(item['id'], "REVIEW_FAIL", {"reason": "Critical Errors", "count": len(criticals)})
                     self.force_refresh(None); self._paused_polling = False; return
 
                 cache_data = self._parse_bot_cache(item.get('bot_analysis_cache'))
@@ -709,7 +750,7 @@ class TimecardView(ft.Container):
                       cache_json = json.dumps(new_cache_struct)
                       update_payload = {"Status": "Not Started", "Approval": True, "ReportedProblems": "", "BotAnalysisCache": cache_json}
                       self.service.update_status(item['id'], update_payload)
-                      self.service.append_history(item['id'], item['history'], "REVIEW_SUCCESS", {"warnings_ignored": len(warnings_list)})
+                      self.service.append_history(item['id'], "REVIEW_SUCCESS", {"warnings_ignored": len(warnings_list)})
                       self.show_snack(f"✅ {pc}: Review Clean! (Ready for Start).", SSA_GREEN, duration=5000)
                       self.force_refresh(None); self._paused_polling = False
 
@@ -820,11 +861,11 @@ class TimecardView(ft.Container):
             if errors_confirmed:
                 timestamp = datetime.now().strftime('%H:%M'); msg = f"[{timestamp}] Check Required: " + ", ".join(errors_confirmed)
                 self.service.update_status(item['id'], {"ReportedProblems": msg, "BotAnalysisCache": cache_json})
-                self.service.append_history(item['id'], item['history'], "REVIEW_VERIF_FAIL", {"errors": errors_confirmed})
+                self.service.append_history(item['id'], "REVIEW_VERIF_FAIL", {"errors": errors_confirmed})
                 self.show_snack(f"❌ Verification finished with errors.", ft.Colors.RED)
             else:
                 self.service.update_status(item['id'], {"Status": "Not Started", "Approval": True, "ReportedProblems": "", "BotAnalysisCache": cache_json})
-                self.service.append_history(item['id'], item['history'], "REVIEW_VERIF_SUCCESS", {"manual_validations": len(self.pending_verifications)})
+                self.service.append_history(item['id'], "REVIEW_VERIF_SUCCESS", {"manual_validations": len(self.pending_verifications)})
                 self.show_snack(f"✅ All verified as Valid Absences.", SSA_GREEN)
             self.force_refresh(None)
         except Exception as e: print(f"Error saving verif: {e}")
@@ -835,7 +876,7 @@ class TimecardView(ft.Container):
         pc = item['pc_number']; loc = item['location']
         self.set_active_context(pc, loc, mode="posting")
         
-        threading.Thread(target=self.service.update_status, args=(item['id'], {"Status": "In Progress", "SOStartTime": datetime.now().isoformat(), "ProcessedBy": getpass.getuser().upper()}), daemon=True).start()
+        self.service.update_status(item['id'], {"Status": "In Progress", "SOStartTime": datetime.now().isoformat(), "ProcessedBy": getpass.getuser().upper()}, wait=False)
         
         cache_data = self._parse_bot_cache(item.get('bot_analysis_cache'))
         candidates = cache_data.get('compliance', [])
@@ -1018,7 +1059,7 @@ class TimecardView(ft.Container):
         
         def save_task():
             self.service.update_status(item['id'], updates)
-            self.service.append_history(item['id'], item['history'], "ITEM_UNBLOCKED", audit_details)
+            self.service.append_history(item['id'], "ITEM_UNBLOCKED", audit_details)
             self.force_refresh(None)
             self._paused_polling = False
             
@@ -1057,7 +1098,7 @@ class TimecardView(ft.Container):
             self.show_snack("Reverting Sign Off...", ft.Colors.RED)
             updates = {"Status": "In Progress", "SignedOff": False, "ReportUploaded": False, "SOFinishTime": None, "RUFinishTime": None}
             self.service.update_status(item['id'], updates)
-            self.service.append_history(item['id'], item['history'], "SIGNOFF_REVOKED", {"employees": selected})
+            self.service.append_history(item['id'], "SIGNOFF_REVOKED", {"employees": selected})
             self.force_refresh(None); self._paused_polling = False
 
         dialog = ft.AlertDialog(
@@ -1204,11 +1245,11 @@ class TimecardView(ft.Container):
                 final_problems = current_problems + ("\n" if current_problems else "") + "\n".join(error_lines)
                 
                 self.service.update_status(item['id'], {"Status": "Blocked", "ReportedProblems": final_problems})
-                self.service.append_history(item['id'], item['history'], "COMPLIANCE_BLOCK", {"errors": errors_found})
+                self.service.append_history(item['id'], "COMPLIANCE_BLOCK", {"errors": errors_found})
                 self.show_snack("🛑 Process Blocked due to Compliance Errors.", ft.Colors.RED, duration=5000)
             else:
                 self.show_snack("✅ Compliance Check Passed.", SSA_GREEN)
-                self.service.append_history(item['id'], item.get('history'), "COMPLIANCE_PASS")
+                self.service.append_history(item['id'], "COMPLIANCE_PASS")
                 
             self.pending_compliance_item = None
             self._fetch_and_update_ui()